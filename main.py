@@ -1,5 +1,8 @@
-from program_files import config, data_conversion, user_input, data_generator, analyzer, ollama_input
+from program_files import config, data_conversion, user_input, data_generator, analyzer, ollama_input, settings
+from program_files import pipeline as pipeline_runner
 from pathlib import Path
+import json
+import sys
 
 def print_new_section(title:str):
     print(f"\n"
@@ -40,25 +43,39 @@ def pipeline():
 
     else:
         system_description, system_description_path = ollama_input.ask_sys_desc()
+        if system_description_path is None:
+            print("No valid system description was generated; stopping the pipeline.")
+            return
+
+    # Stages 2-4 run as a cached DAG: unchanged inputs reuse the previous artifacts.
+    # Each step runs only its own stage, so the pauses come between the work.
+    pipe = pipeline_runner.build_pipeline([str(system_description_path)])
+    stem = Path(system_description_path).stem
 
-    queue_network = data_conversion.system_to_queue(str(system_description_path))
+    def run_stage(stage):
+        result = pipe.run(only=[f"{stage}/{stem}"])[f"{stage}/{stem}"]
+        if result.error:
+            print(f"{stage} failed: {result.error}")
+            return None
+        print(f"{'Reused cached' if result.cached else 'Computed'} {result.output} ({result.seconds:.2f}s)")
+        return result
 
     print_new_section("(2) Queue Network Generated Sucessfully")
-    print(f"Converted system description {system_description_path} to {queue_network}")
+    if run_stage("convert") is None: return
 
     pause()
 
     print_new_section("(3) Data Generation")
-
-    queue_data_name = data_generator.run(queue_network)
-
-    print(queue_data_name)
+    if run_stage("generate") is None: return
 
     pause()
 
     print_new_section("(4) Analyzer Output")
-
-    analyzer.run(queue_data_name)
+    analysis = run_stage("analyze")
+    if analysis is None: return
+    with open(analysis.output) as f:
+        print(json.dumps(json.load(f), indent=2, ensure_ascii=False))
+    analyzer.show_saved_plot(pipeline_runner.extra_path(analysis.output, pipeline_runner.PLOT_SUFFIX))
 
 
 def get_files_in_directory(relative_path: str) -> list[str]:
@@ -271,6 +288,13 @@ def test_analyzer():
     input("Press ENTER to continue")
 
 def main():
+    # Validate dev_config.ini (plus any STRESS_* env overrides) before doing any work
+    try:
+        settings.compile_settings(include_user=False)
+    except settings.SettingsError as e:
+        print(e)
+        return
+
     while True:
         print_new_section("IBM Stress Testing")
 
@@ -303,4 +327,8 @@ def main():
             break
 
 if __name__ == '__main__':
+    # With arguments, run the scriptable CLI (see program_files/cli.py); otherwise the menu
+    if len(sys.argv) > 1:
+        from program_files import cli
+        sys.exit(cli.main(sys.argv[1:]))
     main()
\ No newline at end of file
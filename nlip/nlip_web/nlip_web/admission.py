@@ -0,0 +1,201 @@
+'''
+Admission control for the chat servers.
+
+A model server can only work on a few requests at once; beyond that,
+every request slows down together until many time out. An
+AdmissionController bounds this in front of the NLIP routes:
+
+1. at most max_concurrent requests run at a time (match Ollama's
+OLLAMA_NUM_PARALLEL);
+
+2. up to max_queue more wait, each for at most queue_timeout seconds;
+one that is still waiting after that gets 503 Service Unavailable;
+
+3. when the queue is full, new requests get 429 Too Many Requests right
+away, without waiting.
+
+With priority on, requests that carry a conversation token (existing
+sessions) are admitted before new conversations. If the queue is full,
+an existing session's request takes the place of the newest waiting new
+one, which is rejected instead. Ongoing conversations keep working under
+overload, and new visitors are turned away quickly.
+
+AdmissionMiddleware applies a controller to the /nlip/ routes. Rejections
+carry a Retry-After header.
+
+Admission control is off unless ADMISSION_MAX_CONCURRENT is set, so
+existing deployments keep accepting every request.
+'''
+
+import asyncio
+import re
+import time
+from collections import deque
+from typing import Optional
+
+from nlip_web import env, metrics, telemetry
+
+# A conversation token submessage, not the same words inside (escaped) message text
+_CONVERSATION_TOKEN = re.compile(rb'(?<!\\)"subformat"\s*:\s*"conversation"')
+
+admitted_total = metrics.REGISTRY.register(
+    metrics.Counter("nlip_admission_admitted_total", "Requests admitted.", ("priority",))
+)
+rejected_total = metrics.REGISTRY.register(
+    metrics.Counter("nlip_admission_rejected_total", "Requests rejected by admission control.", ("reason",))
+)
+wait_seconds = metrics.REGISTRY.register(
+    metrics.Histogram("nlip_admission_wait_seconds", "Time admitted requests waited in the queue.")
+)
+
+
+class Rejected(Exception):
+    def __init__(self, status: int, reason: str, retry_after: int = 1):
+        super().__init__(reason)
+        self.status = status
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    def __init__(self, max_concurrent: int = 4, max_queue: int = 32, queue_timeout: float = 30.0, priority: bool = True):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.priority = priority
+        self.active = 0
+        self._waiting = {True: deque(), False: deque()}
+
+    @classmethod
+    def from_env(cls) -> Optional["AdmissionController"]:
+        """A controller configured from ADMISSION_* variables, or None unless ADMISSION_MAX_CONCURRENT is set."""
+        max_concurrent = env.read_digits("ADMISSION_MAX_CONCURRENT", 0)
+        if max_concurrent <= 0:
+            return None
+        return cls(
+            max_concurrent=max_concurrent,
+            max_queue=env.read_digits("ADMISSION_MAX_QUEUE", 32),
+            queue_timeout=env.read_float("ADMISSION_QUEUE_TIMEOUT", 30.0),
+            priority=env.read_string("ADMISSION_PRIORITY", "1").lower() in ("1", "true", "yes"),
+        )
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiting[True]) + len(self._waiting[False])
+
+    async def acquire(self, existing_session: bool = False):
+        """Wait for a slot; raises Rejected if the queue is full or the wait times out."""
+        priority = existing_session and self.priority
+        if self.active < self.max_concurrent and self.queued == 0:
+            self.active += 1
+            admitted_total.inc(priority=str(priority).lower())
+            return
+
+        if self.queued >= self.max_queue:
+            if not (priority and self._waiting[False]):
+                rejected_total.inc(reason="queue_full")
+                raise Rejected(429, "Too many requests are waiting; try again shortly")
+            # Make room by turning away the newest new-conversation request
+            self._waiting[False].pop().set_exception(Rejected(429, "Too many requests are waiting; try again shortly"))
+            rejected_total.inc(reason="displaced")
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiting[priority].append(waiter)
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), self.queue_timeout)
+        except asyncio.TimeoutError:
+            if waiter.done() and not waiter.exception():
+                # Granted just as the deadline passed: give the slot back
+                self.release()
+            else:
+                self._remove(waiter, priority)
+            rejected_total.inc(reason="timeout")
+            raise Rejected(503, "The model server is busy; try again later", retry_after=int(self.queue_timeout) or 1)
+        except asyncio.CancelledError:
+            # The client went away while waiting
+            if waiter.done() and not waiter.cancelled() and not waiter.exception():
+                self.release()
+            else:
+                self._remove(waiter, priority)
+            raise
+        wait_seconds.observe(time.perf_counter() - start)
+        admitted_total.inc(priority=str(priority).lower())
+
+    def _remove(self, waiter, priority: bool):
+        try:
+            self._waiting[priority].remove(waiter)
+        except ValueError:
+            pass
+        if not waiter.done():
+            waiter.cancel()
+
+    def release(self):
+        # Hand the slot straight to the next waiter, existing sessions first
+        for queue in (self._waiting[True], self._waiting[False]):
+            while queue:
+                waiter = queue.popleft()
+                if not waiter.done():
+                    waiter.set_result(None)
+                    return
+        self.active -= 1
+
+    def stats(self) -> dict:
+        return {"active": self.active, "queued": self.queued, "max_concurrent": self.max_concurrent,
+                "max_queue": self.max_queue}
+
+
+class AdmissionMiddleware:
+    """Apply an AdmissionController to POST requests under path_prefix."""
+
+    def __init__(self, app, controller: AdmissionController, path_prefix: str = "/nlip/"):
+        self.app = app
+        self.controller = controller
+        self.path_prefix = path_prefix
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST" or not scope["path"].startswith(self.path_prefix):
+            return await self.app(scope, receive, send)
+
+        # Read the body up front (it is parsed anyway) to see whether it continues a session
+        chunks, more = [], True
+        while more:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                return
+            chunks.append(message.get("body", b""))
+            more = message.get("more_body", False)
+        body = b"".join(chunks)
+
+        try:
+            await self.controller.acquire(existing_session=bool(_CONVERSATION_TOKEN.search(body)))
+        except Rejected as e:
+            return await self._reject(send, e)
+        telemetry.mark("admitted")
+
+        sent = False
+
+        async def replay():
+            nonlocal sent
+            if not sent:
+                sent = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            return await receive()
+
+        try:
+            await self.app(scope, replay, send)
+        finally:
+            self.controller.release()
+
+    async def _reject(self, send, rejected: Rejected):
+        body = ('{"detail": "%s"}' % rejected.reason).encode("utf-8")
+        await send({
+            "type": "http.response.start",
+            "status": rejected.status,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode("ascii")),
+                (b"retry-after", str(rejected.retry_after).encode("ascii")),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
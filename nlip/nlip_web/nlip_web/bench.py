@@ -0,0 +1,81 @@
+'''
+Benchmarks for the Ollama client layer, run against the in-process stub
+server so they need neither a GPU nor a network.
+
+    poetry run python nlip_web/bench.py --requests 500 --concurrency 16
+
+pool_benchmark compares a fresh connection per request (module-level
+httpx.post, the old behaviour) with the shared HttpPool.
+'''
+
+import argparse
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+
+from nlip_web.genai import HttpPool, OllamaClient
+from nlip_web.stub_ollama import start_stub
+
+
+def _percentile(values: list, pct: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def _measure(call, requests: int, concurrency: int) -> dict:
+    def timed(_):
+        start = time.perf_counter()
+        call()
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        latencies = list(pool.map(timed, range(requests)))
+    elapsed = time.perf_counter() - start
+    return {
+        "rps": requests / elapsed,
+        "mean_ms": statistics.mean(latencies) * 1000,
+        "p50_ms": _percentile(latencies, 50) * 1000,
+        "p99_ms": _percentile(latencies, 99) * 1000,
+    }
+
+
+def pool_benchmark(requests: int = 500, concurrency: int = 16, latency: float = 0.0) -> dict:
+    """Latency/throughput of unpooled vs pooled generate calls against the stub."""
+    server = start_stub(latency=latency)
+    port = server.server_address[1]
+    url = f"http://127.0.0.1:{port}/api/generate"
+    payload = {"model": "nlip-test-model", "prompt": "hello", "stream": False}
+
+    try:
+        unpooled = _measure(lambda: httpx.post(url, json=payload, timeout=120.0).raise_for_status(), requests, concurrency)
+
+        pool = HttpPool(max_connections=concurrency, max_keepalive_connections=concurrency)
+        client = OllamaClient(host="127.0.0.1", port=port, pool=pool)
+        client.generate("warm up")
+        pooled = _measure(lambda: client.generate("hello"), requests, concurrency)
+        pool.close()
+    finally:
+        server.shutdown()
+
+    return {"unpooled": unpooled, "pooled": pooled}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark pooled vs unpooled Ollama calls")
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--latency", type=float, default=0.0, help="stub model latency in seconds")
+    args = parser.parse_args()
+
+    results = pool_benchmark(args.requests, args.concurrency, args.latency)
+    for name, stats in results.items():
+        print(f"{name:<10} {stats['rps']:8.1f} req/s  mean {stats['mean_ms']:7.2f} ms  "
+              f"p50 {stats['p50_ms']:7.2f} ms  p99 {stats['p99_ms']:7.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,60 @@
 '''
 This file contains some handy utilities for reading environment variables
-In python, all environment variables are passed as strings. 
+In python, all environment variables are passed as strings.
 However, this causes an issue when we want to read an integer or floating point
-This provides checks for reading those types of environment variable. 
+This provides checks for reading those types of environment variable.
+
+The parse_* routines do the checking on any string (they return None for a
+malformed value) and the read_* routines apply them to an environment
+variable with a default. program_files uses the same routines for its
+STRESS_* variables and command-line overrides.
 
 '''
 import os
 import re
 
+_FLOAT_PATTERN = re.compile(r"^[+-]?(\d+(\.\d*)?|\.\d+)([eE][+-]?\d+)?$")
+
+'''
+The parsers. Each takes a string and returns the typed value, or None when
+the string is not of that type.
+
+'''
+
+def parse_string(value:str) -> str:
+    return value.strip()
+
+def parse_digits(value:str) -> int:
+    value = value.strip()
+    if value.isdigit():
+        return int(value)
+    return None
+
+def parse_int(value:str) -> int:
+    value = value.strip()
+    if value[:1] == '+' or value[:1] == '-':
+        if value[1:].isdigit():
+            return int(value)
+    if value.isdigit():
+        return int(value)
+    return None
+
+def parse_float(value:str) -> float:
+    value = value.strip()
+    if bool(_FLOAT_PATTERN.match(value)):
+        return float(value)
+    return None
+
+def _read(var_name:str, def_value, parse):
+    env_value = os.environ.get(var_name,None)
+    if env_value is None:
+        return def_value
+    parsed = parse(env_value)
+    return def_value if parsed is None else parsed
+
 '''
 The basic string variable reading. This may be superflous but
-keeps the same calling convention for functions. 
+keeps the same calling convention for functions.
 
 '''
 
@@ -18,47 +62,26 @@ def read_string(var_name:str, def_value:str) -> str:
     return os.environ.get(var_name, def_value).strip()
 
 '''
-A routine to read digits only from environment variable. 
-This will read the digital value such as port or positive unsigned int. 
+A routine to read digits only from environment variable.
+This will read the digital value such as port or positive unsigned int.
 
 '''
 
 def read_digits(var_name:str, def_value:int) -> int:
-    env_value = os.environ.get(var_name,None)
-    if env_value is None:
-        return def_value
-    if env_value.strip().isdigit():
-        return int(env_value.strip())
-    return def_value
+    return _read(var_name, def_value, parse_digits)
 
 '''
-A routine to read signed/unsigned int from environment variable. 
+A routine to read signed/unsigned int from environment variable.
 This will read values with +, - or nothing in front, followed by digits.
 
 '''
 
 def read_int(var_name:str, def_value:int) -> int:
-    env_value = os.environ.get(var_name,None)
-    if env_value is None:
-        return def_value
-    env_value = env_value.strip()
-    if env_value[0] == '+' or env_value[i]=='-':
-        if env_value[1:].isdigit():
-            return int(env_value)
-    if env_value.isdigit():
-        return int(env_value)
-    return def_value
+    return _read(var_name, def_value, parse_int)
 
 '''
-A routine to read a floating number from environment variable. 
+A routine to read a floating number from environment variable.
 
 '''
 def read_float(var_name:str, def_value:float) -> float:
-    env_value = os.environ.get(var_name,None)
-    if env_value is None:
-        return def_value
-    pattern = re.compile(r"^[+-]?(\d+(\.\d*)?|\.\d+)([eE][+-]?\d+)?$")
-    env_value=env_value.strip()
-    if bool(pattern.match(env_value)):
-        return float(env_value)
-    return def_value
\ No newline at end of file
+    return _read(var_name, def_value, parse_float)
@@ -6,16 +6,130 @@ GenAI models can support the following interfaces:
 1. Given a prompt template and a template value, return a
 response to that template prompt
 
-2. Given a prompt template, generate the embedding for that prompt.
+2. Given a prompt template, generate the embedding for that prompt
+(or, with embed, for many inputs in one request).
 
 3. An interactive chat interface --
 
+All clients talk to Ollama through an HttpPool, which owns long-lived
+httpx clients so that connections are kept alive and reused across
+requests, sessions and client objects instead of being opened per call.
+
+Each interface has an async twin (AsyncGenAI, AsyncOllamaClient,
+AsyncStatefulGenAI) built on httpx.AsyncClient, for use inside the
+FastAPI event loop where a blocking call would stall every other client.
+
+chat_stream asks Ollama for its NDJSON stream ("stream": true) and yields
+the reply piece by piece as it is generated, so a caller can forward
+tokens to the browser instead of waiting for the whole completion.
+
+Given keep_alive (e.g. "30m", or -1 for forever), the Ollama clients send
+it with every request, so the model stays loaded between requests instead
+of being unloaded after Ollama's default 5 minutes idle. load() and
+loaded() preload the model and check whether it is resident (see
+nlip_web/warmup.py).
+
 """
 
+import json
+import threading
+import time
 from typing import Literal
 
 import httpx
 from nlip_sdk import errors as err
+from nlip_web import env, metrics
+from nlip_web.history import ChatHistory
+from nlip_web.response_cache import ResponseCache, cache_key
+
+
+"""
+A shared, configurable pool of HTTP connections to the model server.
+The application should create one (or use the default) and pass it to every
+client; close() it on shutdown.
+"""
+
+
+class HttpPool:
+    def __init__(
+        self,
+        max_connections: int = 100,
+        max_keepalive_connections: int = 20,
+        keepalive_expiry: float = 30.0,
+        timeout: float = 120.0,
+        http2: bool = False,
+    ):
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self.timeout = httpx.Timeout(timeout)
+        self.http2 = http2
+        self._client = None
+        self._async_client = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "HttpPool":
+        return cls(
+            max_connections=env.read_digits("HTTP_MAX_CONNECTIONS", 100),
+            max_keepalive_connections=env.read_digits("HTTP_MAX_KEEPALIVE", 20),
+            keepalive_expiry=env.read_float("HTTP_KEEPALIVE_EXPIRY", 30.0),
+            timeout=env.read_float("HTTP_TIMEOUT", 120.0),
+            http2=env.read_string("HTTP_HTTP2", "0").lower() in ("1", "true", "yes"),
+        )
+
+    def client(self) -> httpx.Client:
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    self._client = httpx.Client(limits=self.limits, timeout=self.timeout, http2=self.http2)
+        return self._client
+
+    def async_client(self) -> httpx.AsyncClient:
+        # Created lazily so it binds to the event loop that first uses it
+        if self._async_client is None:
+            self._async_client = httpx.AsyncClient(limits=self.limits, timeout=self.timeout, http2=self.http2)
+        return self._async_client
+
+    def close(self):
+        with self._lock:
+            if self._client is not None:
+                self._client.close()
+                self._client = None
+
+    async def aclose(self):
+        self.close()
+        if self._async_client is not None:
+            await self._async_client.aclose()
+            self._async_client = None
+
+
+_default_pool = None
+_default_pool_lock = threading.Lock()
+
+
+def get_default_pool() -> HttpPool:
+    """The process-wide pool used by clients that are not given one explicitly."""
+    global _default_pool
+    if _default_pool is None:
+        with _default_pool_lock:
+            if _default_pool is None:
+                _default_pool = HttpPool.from_env()
+    return _default_pool
+
+
+def tagged_model(name: str) -> str:
+    """The model name with Ollama's implicit ':latest' tag spelled out, for comparing names."""
+    return name if ":" in name.rsplit("/", 1)[-1] else f"{name}:latest"
+
+
+def is_model_listed(model: str, models: list) -> bool:
+    """Whether an /api/ps or /api/tags entry names model, with or without its tag."""
+    model = tagged_model(model)
+    return any(tagged_model(m.get("name") or "") == model or tagged_model(m.get("model") or "") == model
+               for m in models)
 
 
 class GenAI:
@@ -32,27 +146,48 @@ class GenAI:
     def get_embeddings(self, prompt: str, **kwargs) -> list[float]:
         raise err.UnImplementedError("get_embeddings", self.__class__.__name__)
 
+    def embed(self, inputs: list[str], **kwargs) -> list[list[float]]:
+        raise err.UnImplementedError("embed", self.__class__.__name__)
+
+
+def _parse_chat_chunk(line: str):
+    """One NDJSON line of a streamed /api/chat reply -> (content piece, done)."""
+    if not line.strip():
+        return "", False
+    chunk = json.loads(line)
+    if "error" in chunk:
+        raise httpx.HTTPError(chunk["error"])
+    return chunk.get("message", {}).get("content", ""), chunk.get("done", False)
+
 
 class OllamaClient(GenAI):
-    def __init__(self, host: str = "localhost", port: int = 11434, model="nlip-test-model"):
+    def __init__(self, host: str = "localhost", port: int = 11434, model="nlip-test-model", pool: HttpPool = None,
+                 keep_alive=None):
         self.host = host
         self.port = port
         self.model = model
+        self.pool = pool if pool is not None else get_default_pool()
+        self.keep_alive = keep_alive
 
     def __str__(self):
         return f"{self.model} at http://{self.host}:{self.port}/  "
 
     def _base_httpx_call(
         self,
-        apicall: Literal["generate", "embeddings", "chat"],
+        apicall: Literal["generate", "embeddings", "embed", "chat"],
         priority_data: dict,
         **kwargs,
     ):
         url = f"http://{self.host}:{self.port}/api/{apicall}"
         data = kwargs
         data.update(priority_data)
-        resp = httpx.post(url, json=data, timeout=120.0)
-        return resp.raise_for_status().json()
+        if self.keep_alive is not None:
+            data.setdefault("keep_alive", self.keep_alive)
+        start = time.perf_counter()
+        resp = self.pool.client().post(url, json=data)
+        result = resp.raise_for_status().json()
+        metrics.record_model_call(apicall, time.perf_counter() - start, result)
+        return result
 
     def generate(self, prompt: str, **kwargs) -> str:
         data = {"model": self.model, "prompt": prompt, "stream": False}
@@ -70,70 +205,344 @@ class OllamaClient(GenAI):
         results = self._base_httpx_call("embeddings", data)
         return results["embedding"]
 
+    def embed(self, inputs: list[str], **kwargs) -> list[list[float]]:
+        """Embed many inputs in one request (Ollama's batch /api/embed), in input order."""
+        data = {"model": self.model, "input": list(inputs)}
+        results = self._base_httpx_call("embed", data, **kwargs)
+        return results["embeddings"]
+
     def chat(self, this_message, history=list(), **kwargs):
         llama_message = history + [this_message]
         data = {"model": self.model, "messages": llama_message, "stream": False}
         results = self._base_httpx_call("chat", data, **kwargs)
         return results.get("message", None)
 
+    def chat_stream(self, this_message, history=list(), **kwargs):
+        """Yield the assistant's reply in pieces as Ollama streams it."""
+        url = f"http://{self.host}:{self.port}/api/chat"
+        data = kwargs
+        data.update({"model": self.model, "messages": history + [this_message], "stream": True})
+        if self.keep_alive is not None:
+            data.setdefault("keep_alive", self.keep_alive)
+        start, final = time.perf_counter(), None
+        try:
+            with self.pool.client().stream("POST", url, json=data) as resp:
+                resp.raise_for_status()
+                for line in resp.iter_lines():
+                    piece, done = _parse_chat_chunk(line)
+                    if piece:
+                        yield piece
+                    if done:
+                        # The last chunk carries the token counts
+                        final = json.loads(line)
+                        break
+        finally:
+            metrics.record_model_call("chat", time.perf_counter() - start, final)
+
+    def load(self) -> dict:
+        """Load the model into memory without generating anything (a request with no prompt)."""
+        return self._base_httpx_call("generate", {"model": self.model, "stream": False})
+
+    def loaded(self) -> bool:
+        """Whether the model is currently resident on the server (/api/ps)."""
+        resp = self.pool.client().get(f"http://{self.host}:{self.port}/api/ps")
+        models = resp.raise_for_status().json().get("models", [])
+        return is_model_listed(self.model, models)
+
+
+class AsyncGenAI:
+
+    async def generate(self, prompt: str, **kwargs) -> str:
+        raise err.UnImplementedError("generate", self.__class__.__name__)
+
+    async def generate_templated(
+        self, prompt_template: str, prompt_args: dict, **kwargs
+    ) -> str:
+        prompt = prompt_template.format(**prompt_args)
+        return await self.generate(prompt, **kwargs)
+
+    async def get_embeddings(self, prompt: str, **kwargs) -> list[float]:
+        raise err.UnImplementedError("get_embeddings", self.__class__.__name__)
+
+    async def embed(self, inputs: list[str], **kwargs) -> list[list[float]]:
+        raise err.UnImplementedError("embed", self.__class__.__name__)
+
+
+class AsyncOllamaClient(AsyncGenAI):
+    def __init__(self, host: str = "localhost", port: int = 11434, model="nlip-test-model", pool: HttpPool = None,
+                 keep_alive=None):
+        self.host = host
+        self.port = port
+        self.model = model
+        self.pool = pool if pool is not None else get_default_pool()
+        self.keep_alive = keep_alive
+
+    def __str__(self):
+        return f"{self.model} at http://{self.host}:{self.port}/  "
+
+    async def _base_httpx_call(
+        self,
+        apicall: Literal["generate", "embeddings", "embed", "chat"],
+        priority_data: dict,
+        **kwargs,
+    ):
+        url = f"http://{self.host}:{self.port}/api/{apicall}"
+        data = kwargs
+        data.update(priority_data)
+        if self.keep_alive is not None:
+            data.setdefault("keep_alive", self.keep_alive)
+        start = time.perf_counter()
+        resp = await self.pool.async_client().post(url, json=data)
+        result = resp.raise_for_status().json()
+        metrics.record_model_call(apicall, time.perf_counter() - start, result)
+        return result
+
+    async def generate(self, prompt: str, **kwargs) -> str:
+        data = {"model": self.model, "prompt": prompt, "stream": False}
+        results = await self._base_httpx_call("generate", data, **kwargs)
+        return results["response"]
+
+    async def generate_with_image(self, prompt: str, images: list, **kwargs) -> str:
+        data = {"model": self.model, "prompt": prompt, "stream": False, "images": images}
+        results = await self._base_httpx_call("generate", data)
+        return results["response"]
+
+    async def get_embeddings(self, prompt: str, **kwargs) -> list[float]:
+        data = {"model": self.model, "prompt": prompt, "stream": False}
+        results = await self._base_httpx_call("embeddings", data)
+        return results["embedding"]
+
+    async def embed(self, inputs: list[str], **kwargs) -> list[list[float]]:
+        """Embed many inputs in one request (Ollama's batch /api/embed), in input order."""
+        data = {"model": self.model, "input": list(inputs)}
+        results = await self._base_httpx_call("embed", data, **kwargs)
+        return results["embeddings"]
+
+    async def chat(self, this_message, history=list(), **kwargs):
+        llama_message = history + [this_message]
+        data = {"model": self.model, "messages": llama_message, "stream": False}
+        results = await self._base_httpx_call("chat", data, **kwargs)
+        return results.get("message", None)
+
+    async def chat_stream(self, this_message, history=list(), **kwargs):
+        """Yield the assistant's reply in pieces as Ollama streams it."""
+        url = f"http://{self.host}:{self.port}/api/chat"
+        data = kwargs
+        data.update({"model": self.model, "messages": history + [this_message], "stream": True})
+        if self.keep_alive is not None:
+            data.setdefault("keep_alive", self.keep_alive)
+        start, final = time.perf_counter(), None
+        try:
+            async with self.pool.async_client().stream("POST", url, json=data) as resp:
+                resp.raise_for_status()
+                async for line in resp.aiter_lines():
+                    piece, done = _parse_chat_chunk(line)
+                    if piece:
+                        yield piece
+                    if done:
+                        # The last chunk carries the token counts
+                        final = json.loads(line)
+                        break
+        finally:
+            metrics.record_model_call("chat", time.perf_counter() - start, final)
+
+    async def load(self) -> dict:
+        """Load the model into memory without generating anything (a request with no prompt)."""
+        return await self._base_httpx_call("generate", {"model": self.model, "stream": False})
+
+    async def loaded(self) -> bool:
+        """Whether the model is currently resident on the server (/api/ps)."""
+        resp = await self.pool.async_client().get(f"http://{self.host}:{self.port}/api/ps")
+        models = resp.raise_for_status().json().get("models", [])
+        return is_model_listed(self.model, models)
+
 
 """
 A convenience class for single request-response interaction. 
-
+Given a ResponseCache (or RESPONSE_CACHE=1), identical generate calls are
+answered from the cache instead of the model.
 """
 
 
 class SimpleGenAI:
-    def __init__(self, host: str = "localhost", port: int = 11434):
+    def __init__(self, host: str = "localhost", port: int = 11434, pool: HttpPool = None,
+                 cache: ResponseCache = None):
         self.host = host
         self.port = port
-
-    def generate(self, model, prompt: str) -> str:
-        server = OllamaClient(host=self.host, port=self.port, model=model)
-        return server.generate(prompt)
+        self.pool = pool
+        self.cache = cache if cache is not None else ResponseCache.from_env()
+        self.servers = dict()
+
+    def get_server(self, model: str) -> OllamaClient:
+        # One client per model, all sharing the same connection pool
+        server = self.servers.get(model, None)
+        if server is None:
+            server = OllamaClient(host=self.host, port=self.port, model=model, pool=self.pool)
+            self.servers[model] = server
+        return server
+
+    def generate(self, model, prompt: str, **kwargs) -> str:
+        if self.cache is None:
+            return self.get_server(model).generate(prompt, **kwargs)
+        # Every extra request field (options, system, format, ...) can change the answer
+        options = kwargs.get("options", None) or {}
+        key = cache_key(model, prompt, kwargs, options.get("seed", None))
+        response = self.cache.get(key)
+        if response is None:
+            response = self.get_server(model).generate(prompt, **kwargs)
+            self.cache.put(key, response)
+        return response
 
     def generate_with_files(self, model: str, prompt: str, files: list) -> str:
-        server = OllamaClient(host=self.host, port=self.port, model=model)
-        return server.generate_with_image(prompt, files)
+        return self.get_server(model).generate_with_image(prompt, files)
 
     def generate_templated(
         self, model: str, prompt_template: str, prompt_args: dict, **kwargs
     ) -> str:
         prompt = prompt_template.format(**prompt_args)
-        return self.generate(model, prompt)
+        return self.generate(model, prompt, **kwargs)
 
     def get_embeddings(self, model: str, prompt: str) -> list[float]:
-        server = OllamaClient(host=self.host, port=self.port, model=model)
-        return server.get_embeddings(prompt)
+        return self.get_server(model).get_embeddings(prompt)
+
+    def embed(self, model: str, inputs: list[str], batch_size: int = 64) -> list[list[float]]:
+        """Embeddings for every input, sent batch_size inputs per request."""
+        server = self.get_server(model)
+        vectors = []
+        for start in range(0, len(inputs), batch_size):
+            vectors.extend(server.embed(inputs[start:start + batch_size]))
+        return vectors
 
 
 """
 A Convenience class which remembers previous interactions as context.
+The history is a ChatHistory, which bounds what is kept and sent (see
+nlip_web/history.py); older turns are dropped or summarized.
+
+Summarizing is a model call of its own, so it is kept out of the reply's
+latency: StatefulGenAI runs it on a background thread once a reply has
+been returned (the next chat waits for it), and AsyncStatefulGenAI leaves
+it to the caller to await summarize() after the reply has been sent.
 """
 
 
 class StatefulGenAI:
     def __init__(
-        self, host: str = "localhost", port: int = 11434, model: str = "nlip-test-model"
+        self, host: str = "localhost", port: int = 11434, model: str = "nlip-test-model", pool: HttpPool = None,
+        history: ChatHistory = None, keep_alive=None,
     ):
-        self.server = OllamaClient(host=host, port=port, model=model)
-        self.history = list()
+        self.server = OllamaClient(host=host, port=port, model=model, pool=pool, keep_alive=keep_alive)
+        self.history = history if history is not None else ChatHistory.from_env()
+        self._summary_thread = None
+
+    def summarize(self):
+        """Fold the evicted turns into the history's summary (one model call), if enough are waiting."""
+        if not self.history.needs_summary():
+            return
+        summarized = len(self.history.evicted)
+        try:
+            summary = self.server.generate(self.history.summary_prompt())
+        except httpx.HTTPError:
+            # A failed summary only loses older context; the chat itself succeeded
+            summary = ""
+        self.history.set_summary(summary, summarized)
+
+    def _summarize_later(self):
+        # A thread does not inherit the request's context, so its model time is not charged to the reply
+        if self.history.needs_summary():
+            self._summary_thread = threading.Thread(target=self.summarize, daemon=True)
+            self._summary_thread.start()
+
+    def _wait_for_summary(self):
+        if self._summary_thread is not None:
+            self._summary_thread.join()
+            self._summary_thread = None
 
     def chat(self, message: str):
-        this_message = {"role": "user", "content": message}
-        response = self.server.chat(this_message, history=self.history)
-        self.history.append(this_message)
-        self.history.append(response)
-        return response.get("content")
+        return self.chat_multimodal(message)
     
     def chat_multimodal(self, message:str, **kwargs):
+        self._wait_for_summary()
         this_message = {"role": "user", "content": message}
         for key in kwargs.keys(): 
             this_message[key] = kwargs.get(key)
-        response = self.server.chat(this_message, history=self.history)
-        self.history.append(this_message)
-        self.history.append(response)
+        response = self.server.chat(this_message, history=self.history.messages())
+        self.history.append(this_message, response)
+        self._summarize_later()
         return response.get("content")
-        
 
-    
+    def chat_stream(self, message: str, **kwargs):
+        """
+        Like chat_multimodal, but yields the reply in pieces. The exchange is
+        added to the history only once the stream has completed.
+        """
+        self._wait_for_summary()
+        this_message = {"role": "user", "content": message}
+        this_message.update(kwargs)
+        pieces = []
+        for piece in self.server.chat_stream(this_message, history=self.history.messages()):
+            pieces.append(piece)
+            yield piece
+        self.history.append(this_message, {"role": "assistant", "content": "".join(pieces)})
+        self._summarize_later()
+
+
+"""
+The async version of StatefulGenAI, for chat sessions running inside the
+web server's event loop.
+"""
+
+
+class AsyncStatefulGenAI:
+    def __init__(
+        self, host: str = "localhost", port: int = 11434, model: str = "nlip-test-model", pool: HttpPool = None,
+        history: ChatHistory = None, keep_alive=None,
+    ):
+        self.server = AsyncOllamaClient(host=host, port=port, model=model, pool=pool, keep_alive=keep_alive)
+        self.history = history if history is not None else ChatHistory.from_env()
+        self._summarizing = False
+
+    def needs_summary(self) -> bool:
+        return not self._summarizing and self.history.needs_summary()
+
+    async def summarize(self):
+        """
+        Fold the evicted turns into the history's summary (one model call), if
+        enough are waiting. Await it after the reply has been sent; turns
+        evicted meanwhile stay queued for the next summary.
+        """
+        if not self.needs_summary():
+            return
+        self._summarizing = True
+        summarized = len(self.history.evicted)
+        try:
+            summary = await self.server.generate(self.history.summary_prompt())
+        except httpx.HTTPError:
+            summary = ""
+        finally:
+            self._summarizing = False
+        self.history.set_summary(summary, summarized)
+
+    async def chat(self, message: str):
+        return await self.chat_multimodal(message)
+
+    async def chat_multimodal(self, message: str, **kwargs):
+        this_message = {"role": "user", "content": message}
+        for key in kwargs.keys():
+            this_message[key] = kwargs.get(key)
+        response = await self.server.chat(this_message, history=self.history.messages())
+        self.history.append(this_message, response)
+        return response.get("content")
+
+    async def chat_stream(self, message: str, **kwargs):
+        """
+        Like chat_multimodal, but yields the reply in pieces. The exchange is
+        added to the history only once the stream has completed.
+        """
+        this_message = {"role": "user", "content": message}
+        this_message.update(kwargs)
+        pieces = []
+        async for piece in self.server.chat_stream(this_message, history=self.history.messages()):
+            pieces.append(piece)
+            yield piece
+        self.history.append(this_message, {"role": "assistant", "content": "".join(pieces)})
@@ -0,0 +1,188 @@
+'''
+Bounded conversation history for the stateful chat clients.
+
+A ChatHistory keeps a sliding window of chat messages under a token and/or
+byte budget, so the request sent to the model (and the memory held per
+session) stays flat however long a conversation runs:
+
+1. Base64 images are kept only on the most recent keep_images user
+messages; older ones are stripped, since they dominate the request size.
+
+2. When the window is over budget the oldest messages are evicted, but the
+latest exchange is always kept.
+
+3. If summarize is set, evicted messages are queued and the owning client
+periodically asks the model to fold them into a running summary, which is
+sent ahead of the window as a system message. The summary is made after a
+reply has gone out, never while the user waits (see
+StatefulGenAI.summarize).
+
+to_bytes / from_bytes give a compact (zlib-compressed JSON) form of the
+conversation state, for session backends shared between worker processes;
+the limits themselves are configuration and are not stored.
+
+Token counts are estimated (about 4 characters per token) rather than
+computed with the model's tokenizer; the budget is a bound on cost, not an
+exact fit to the context window.
+'''
+
+from collections import deque
+import json
+import zlib
+
+from nlip_web import env
+
+CHARS_PER_TOKEN = 4
+# Rough prompt cost of one attached image, and per-message framing
+IMAGE_TOKENS = 768
+MESSAGE_TOKENS = 4
+
+SUMMARY_PROMPT = (
+    "Summarize the conversation below in at most {words} words, keeping names, "
+    "facts, decisions and open questions that later replies may depend on.\n\n"
+    "{previous}Conversation:\n{transcript}\n\nSummary:"
+)
+
+
+def estimate_tokens(message: dict) -> int:
+    text = message.get("content") or ""
+    images = message.get("images") or []
+    return MESSAGE_TOKENS + (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN + IMAGE_TOKENS * len(images)
+
+
+def estimate_bytes(message: dict) -> int:
+    text = message.get("content") or ""
+    images = message.get("images") or []
+    return len(text.encode("utf-8")) + sum(len(image) for image in images)
+
+
+class ChatHistory:
+    def __init__(
+        self,
+        max_tokens: int = 3000,
+        max_bytes: int = 0,
+        keep_images: int = 1,
+        summarize: bool = False,
+        summarize_after: int = 4,
+        summary_words: int = 150,
+    ):
+        # A limit of 0 means unbounded
+        self.max_tokens = max_tokens
+        self.max_bytes = max_bytes
+        self.keep_images = keep_images
+        self.summarize = summarize
+        self.summarize_after = summarize_after
+        self.summary_words = summary_words
+
+        self.summary = None
+        self.evicted = list()
+        self.evicted_count = 0
+        self._messages = deque()
+        self._tokens = 0
+        self._bytes = 0
+
+    @classmethod
+    def from_env(cls) -> "ChatHistory":
+        return cls(
+            max_tokens=env.read_digits("CHAT_HISTORY_MAX_TOKENS", 3000),
+            max_bytes=env.read_digits("CHAT_HISTORY_MAX_BYTES", 0),
+            keep_images=env.read_digits("CHAT_HISTORY_KEEP_IMAGES", 1),
+            summarize=env.read_string("CHAT_HISTORY_SUMMARIZE", "0").lower() in ("1", "true", "yes"),
+        )
+
+    def __len__(self):
+        return len(self._messages)
+
+    def __iter__(self):
+        return iter(self._messages)
+
+    @property
+    def tokens(self) -> int:
+        return self._tokens
+
+    @property
+    def bytes(self) -> int:
+        return self._bytes
+
+    def messages(self) -> list:
+        """The messages to send ahead of a new one: the summary (if any), then the window."""
+        window = list(self._messages)
+        if self.summary:
+            return [{"role": "system", "content": f"Summary of the earlier conversation: {self.summary}"}] + window
+        return window
+
+    def append(self, *messages: dict):
+        for message in messages:
+            self._messages.append(message)
+            self._tokens += estimate_tokens(message)
+            self._bytes += estimate_bytes(message)
+        self._strip_images()
+        self._trim()
+
+    def clear(self):
+        self._messages.clear()
+        self._tokens = 0
+        self._bytes = 0
+        self.summary = None
+        self.evicted = list()
+        self.evicted_count = 0
+
+    def _over_budget(self) -> bool:
+        return (self.max_tokens > 0 and self._tokens > self.max_tokens) or (
+            self.max_bytes > 0 and self._bytes > self.max_bytes
+        )
+
+    def _strip_images(self):
+        # Walk back from the newest message; only the latest keep_images image turns keep their images
+        seen = 0
+        for i in range(len(self._messages) - 1, -1, -1):
+            message = self._messages[i]
+            if not message.get("images"):
+                continue
+            seen += 1
+            if seen > self.keep_images:
+                stripped = {k: v for k, v in message.items() if k != "images"}
+                self._tokens += estimate_tokens(stripped) - estimate_tokens(message)
+                self._bytes += estimate_bytes(stripped) - estimate_bytes(message)
+                self._messages[i] = stripped
+
+    def _trim(self):
+        # Never evict the latest exchange (user message + reply)
+        while len(self._messages) > 2 and self._over_budget():
+            message = self._messages.popleft()
+            self._tokens -= estimate_tokens(message)
+            self._bytes -= estimate_bytes(message)
+            self.evicted_count += 1
+            if self.summarize:
+                self.evicted.append({k: v for k, v in message.items() if k != "images"})
+
+    def to_bytes(self) -> bytes:
+        state = {"messages": list(self._messages), "summary": self.summary,
+                 "evicted": self.evicted, "evicted_count": self.evicted_count}
+        return zlib.compress(json.dumps(state, separators=(",", ":")).encode("utf-8"))
+
+    @classmethod
+    def from_bytes(cls, data: bytes, history: "ChatHistory" = None) -> "ChatHistory":
+        """Restore a conversation into history (by default a new one configured from the environment)."""
+        history = history if history is not None else cls.from_env()
+        state = json.loads(zlib.decompress(data))
+        history.clear()
+        history.summary = state.get("summary")
+        history.evicted = state.get("evicted", [])
+        history.evicted_count = state.get("evicted_count", 0)
+        history.append(*state.get("messages", []))
+        return history
+
+    def needs_summary(self) -> bool:
+        return self.summarize and len(self.evicted) >= self.summarize_after
+
+    def summary_prompt(self) -> str:
+        """The prompt asking the model to fold the evicted messages into the summary."""
+        transcript = "\n".join(f"{m.get('role', 'user')}: {m.get('content') or ''}" for m in self.evicted)
+        previous = f"Summary so far: {self.summary}\n\n" if self.summary else ""
+        return SUMMARY_PROMPT.format(words=self.summary_words, previous=previous, transcript=transcript)
+
+    def set_summary(self, summary: str, summarized: int = None):
+        """Replace the summary and drop the first `summarized` evicted messages (all by default)."""
+        self.summary = summary.strip() or self.summary
+        self.evicted = self.evicted[summarized:] if summarized is not None else list()
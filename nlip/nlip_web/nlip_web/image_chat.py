@@ -1,8 +1,12 @@
-from nlip_web.genai import StatefulGenAI
+from nlip_web.genai import AsyncOllamaClient, AsyncStatefulGenAI, HttpPool
+from nlip_web.history import ChatHistory
+from nlip_web.images import ImagePipeline
 from nlip_web  import nlip_ext as nlip_ext 
 from nlip_web.env import read_digits, read_string
+from nlip_web.warmup import ModelWarmer, read_keep_alive
 from nlip_server import server
 from nlip_sdk import nlip
+import asyncio
 
 
 class ChatApplication(nlip_ext.SafeStatefulApplication):
@@ -12,38 +16,93 @@ class ChatApplication(nlip_ext.SafeStatefulApplication):
         self.model = read_string("CHAT_MODEL", "nlip-test-model")
         self.host = read_string("CHAT_HOST", "localhost")
         self.port = read_digits("CHAT_PORT", 11434)
-    
+        # One connection pool to Ollama shared by every session of this app
+        self.http_pool = HttpPool.from_env()
+        # Uploaded images are shrunk to the model's input size once, then reused
+        self.image_pipeline = ImagePipeline.from_env()
+        # Keep the model loaded between chats, and load it before the first one
+        self.keep_alive = read_keep_alive()
+        self.warmer = ModelWarmer.from_env(
+            AsyncOllamaClient(self.host, self.port, self.model, pool=self.http_pool, keep_alive=self.keep_alive)
+        )
+
+    async def startup(self):
+        await super().startup()
+        await self.warmer.start()
+
+    async def shutdown(self):
+        await self.warmer.stop()
+        await self.http_pool.aclose()
+        await super().shutdown()
 
     def create_stateful_session(self) -> server.NLIP_Session:
-        genAI = StatefulGenAI(self.host, self.port,self.model)
+        genAI = AsyncStatefulGenAI(self.host, self.port,self.model, pool=self.http_pool, keep_alive=self.keep_alive)
         session = ChatSession()
         session.set_correlator()
-        self.store_session_data(session.get_correlator(), genAI)
+        # Saved to the session backend after the first execute
+        session.set_session_data(genAI)
         return session
 
+    def serialize_session_data(self, session_data: AsyncStatefulGenAI) -> bytes:
+        return session_data.history.to_bytes()
+
+    def deserialize_session_data(self, data: bytes) -> AsyncStatefulGenAI:
+        history = ChatHistory.from_bytes(data)
+        return AsyncStatefulGenAI(self.host, self.port, self.model, pool=self.http_pool, history=history,
+                                  keep_alive=self.keep_alive)
+
     
 
 
 class ChatSession(nlip_ext.StatefulSession):
 
-    def execute(
-        self, msg: nlip.NLIP_Message
-    ) -> nlip.NLIP_Message:
+    async def prepare_images(self, msg: nlip.NLIP_Message, chat_server: AsyncStatefulGenAI):
+        """The message text and the images to send: resized, without ones the history already holds."""
         text = msg.extract_text()
+        pipeline = self.nlip_app.image_pipeline
         images = list()
-        binary_contents = msg.extract_field_list("binary")
-        for base64_content in binary_contents:
-            images.append(base64_content)
+        for base64_content in msg.extract_field_list("binary"):
+            # Decoding and resizing is CPU work; keep it off the event loop
+            images.append(await asyncio.to_thread(pipeline.prepare, base64_content))
+        images, repeated = pipeline.dedupe(images, chat_server.history)
+        if repeated:
+            text = f"{text}\n(Attached again: {repeated} image(s) already shown earlier in this conversation.)"
+        return text, images
 
-        chat_server = self.nlip_app.retrieve_session_data(self.get_correlator())
+    async def execute(
+        self, msg: nlip.NLIP_Message
+    ) -> nlip.NLIP_Message:
+        chat_server = self.get_session_data()
         if chat_server is None: 
             return nlip.NLIP_Factory.create_text("Error: Can't find my chat server")
 
+        text, images = await self.prepare_images(msg, chat_server)
         # print(f'Received text {text[0:10]}...')
-        response = chat_server.chat_multimodal(text, images = images)
+        response = await chat_server.chat_multimodal(text, images = images)
         # print(f'Received response {response[0:10]}...')
         return nlip.NLIP_Factory.create_text(response)
 
+    async def execute_stream(self, msg: nlip.NLIP_Message):
+        chat_server = self.get_session_data()
+        if chat_server is None: 
+            yield "Error: Can't find my chat server"
+            return
+
+        text, images = await self.prepare_images(msg, chat_server)
+        async for piece in chat_server.chat_stream(text, images = images):
+            yield piece
+
+    def background_work(self):
+        chat_server = self.get_session_data()
+        if chat_server is None or not chat_server.needs_summary():
+            return None
+
+        async def summarize():
+            # After the reply has gone out: fold evicted turns into the summary and keep it
+            await chat_server.summarize()
+            await self.save_session()
+        return summarize
+
 
 
 if __name__ == "__main__":
@@ -0,0 +1,118 @@
+'''
+Image preprocessing for the image chat server.
+
+Browsers upload photos as they come off the camera, often several
+megabytes of base64, while vision models work at a fixed input resolution
+(a few hundred pixels a side). An ImagePipeline:
+
+1. decodes each uploaded image once, shrinks it to fit max_side pixels and
+re-encodes it as JPEG (or PNG, if it has transparency), keeping the
+original whenever that would not be smaller;
+
+2. remembers the result by a hash of the upload, so an image sent again
+(by this or any other session) is not decoded again.
+
+ImagePipeline.dedupe then drops images the conversation window already
+holds, leaving a short note in the text, so repeating an image does not
+resend it.
+
+Resizing needs Pillow (pip install pillow). Without it images are passed
+through unchanged, though still hashed and de-duplicated.
+'''
+
+from collections import OrderedDict
+import base64
+import binascii
+import hashlib
+import io
+import threading
+
+from nlip_web import env
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # pragma: no cover - optional dependency
+    Image = None
+
+
+def image_digest(data: str) -> str:
+    return hashlib.sha256(data.encode("ascii", "replace")).hexdigest()
+
+
+class ImagePipeline:
+    def __init__(self, max_side: int = 672, quality: int = 85, cache_size: int = 256):
+        # max_side of 0 disables resizing
+        self.max_side = max_side
+        self.quality = quality
+        self.cache_size = cache_size
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.hits = 0
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "ImagePipeline":
+        return cls(
+            max_side=env.read_digits("IMAGE_MAX_SIDE", 672),
+            quality=env.read_digits("IMAGE_QUALITY", 85),
+            cache_size=env.read_digits("IMAGE_CACHE_SIZE", 256),
+        )
+
+    def prepare(self, data: str) -> str:
+        """The base64 image to send to the model in place of the uploaded base64 data."""
+        key = image_digest(data)
+        with self._lock:
+            cached = self._cache.get(key, None)
+            if cached is not None:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return cached
+
+        prepared = self._shrink(data)
+        with self._lock:
+            self.bytes_in += len(data)
+            self.bytes_out += len(prepared)
+            self._cache[key] = prepared
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return prepared
+
+    def _shrink(self, data: str) -> str:
+        if Image is None or self.max_side <= 0:
+            return data
+        try:
+            raw = base64.b64decode(data, validate=False)
+            image = Image.open(io.BytesIO(raw))
+            image = ImageOps.exif_transpose(image)
+        except (binascii.Error, OSError, ValueError):
+            # Not an image Pillow can read: let the model server decide
+            return data
+
+        image.thumbnail((self.max_side, self.max_side))
+        out = io.BytesIO()
+        has_alpha = image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info)
+        if has_alpha:
+            image.save(out, format="PNG", optimize=True)
+        else:
+            image.convert("RGB").save(out, format="JPEG", quality=self.quality, optimize=True)
+        encoded = base64.b64encode(out.getvalue()).decode("ascii")
+        return encoded if len(encoded) < len(data) else data
+
+    def dedupe(self, images: list, history) -> tuple:
+        """
+        Split images into those to send and the number already in history,
+        which the model still sees and so need not be sent again.
+        """
+        held = {image for message in history for image in (message.get("images") or [])}
+        fresh, repeated = [], 0
+        for image in images:
+            if image in held:
+                repeated += 1
+            else:
+                held.add(image)
+                fresh.append(image)
+        return fresh, repeated
+
+    def stats(self) -> dict:
+        return {"bytes_in": self.bytes_in, "bytes_out": self.bytes_out, "hits": self.hits, "cached": len(self._cache)}
@@ -0,0 +1,226 @@
+'''
+Load test for the chat servers, fully offline on one machine.
+
+The text or image chat application is built exactly as text_chat.py /
+image_chat.py build it (WebApplication.setup_webserver, all middleware
+included) but is driven in-process through httpx.ASGITransport, against
+the stub Ollama server (stub_ollama.py) instead of a real model:
+
+    poetry run python nlip_web/loadtest.py --app text --conversations 32 --turns 4 --latency 0.2
+    poetry run python nlip_web/loadtest.py --app image --stream --token-latency 0.01
+
+Each of the N conversations runs concurrently and sends its turns one
+after another, the later ones with the conversation's correlator, so
+sessions are created, stored and restored as in real use. The report
+gives requests per second and p50/p95/p99 latency over all turns (to the
+last byte, for streams), then the memory each new session keeps: N more
+one-turn conversations are run under tracemalloc (separately, so its
+overhead does not skew the latencies) and the retained growth is divided
+by their number.
+
+Server settings come from the environment as usual (ADMISSION_*,
+SESSION_*, ...); the harness only points the app at the stub and turns
+off model warm-up and probes.
+'''
+
+import argparse
+import asyncio
+import base64
+import gc
+import io
+import json
+import os
+import statistics
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+import httpx
+from nlip_sdk import nlip
+
+from nlip_web import image_chat, nlip_ext, text_chat
+from nlip_web.bench import _percentile
+from nlip_web.stub_ollama import start_stub
+
+try:
+    from PIL import Image
+except ImportError:  # pragma: no cover - optional dependency
+    Image = None
+
+_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APPS = {
+    "text": (text_chat, "text_chat.html"),
+    "image": (image_chat, "image_chat.html"),
+}
+# A 1x1 PNG, sent when Pillow is not there to draw a larger image
+_TINY_PNG = "iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mNk+M9QDwADhgGAWjR9awAAAABJRU5ErkJggg=="
+
+
+class InProcessWebApplication(nlip_ext.WebApplication):
+    """A WebApplication whose server is driven by the caller instead of uvicorn."""
+
+    def start_server(self, port, host="localhost"):
+        pass
+
+
+@contextmanager
+def _environ(**values):
+    saved = {key: os.environ.get(key, None) for key in values}
+    os.environ.update({key: str(value) for key, value in values.items()})
+    try:
+        yield
+    finally:
+        for key, value in saved.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+
+
+def make_image(side: int = 1024) -> str:
+    """A base64 JPEG of random-looking pixels (what a camera upload costs), or a tiny PNG without Pillow."""
+    if Image is None:
+        return _TINY_PNG
+    image = Image.frombytes("RGB", (side, side), os.urandom(side * side * 3))
+    out = io.BytesIO()
+    image.save(out, format="JPEG", quality=90)
+    return base64.b64encode(out.getvalue()).decode("ascii")
+
+
+def build_app(app: str = "text"):
+    """The FastAPI app and its NLIP application, configured from the current environment."""
+    module, index = APPS[app]
+    chatapp = module.ChatApplication()
+    webapp = InProcessWebApplication(indexFile=os.path.join(_ROOT, "static", index),
+                                     static_dir=os.path.join(_ROOT, "static"))
+    return webapp.setup_webserver(chatapp, port=chatapp.local_port), chatapp
+
+
+async def _turn(client: httpx.AsyncClient, text: str, token: str, image: str, stream: bool) -> tuple:
+    msg = nlip.NLIP_Factory.create_text(text)
+    if image is not None:
+        msg.add_binary(image, "image", "jpeg")
+    if token is not None:
+        msg.add_conversation_token(token)
+    body = msg.model_dump(mode="json", exclude_none=True)
+
+    start = time.perf_counter()
+    rsp = await client.post("/nlip/stream/" if stream else "/nlip/", json=body)
+    latency = time.perf_counter() - start
+    if rsp.status_code != 200:
+        return latency, False, token
+    if stream:
+        last = json.loads(rsp.text.strip().splitlines()[-1])
+        if last.get("type") != "done":
+            return latency, False, token
+        reply = nlip.NLIP_Message(**last["message"])
+    else:
+        reply = nlip.NLIP_Message(**rsp.json())
+    return latency, True, reply.extract_conversation_token() or token
+
+
+async def _conversation(client, turns: int, image: str, stream: bool, results: list):
+    token = None
+    for i in range(turns):
+        # The image goes with the first turn, as when a user uploads then asks follow-ups
+        latency, ok, token = await _turn(client, f"question {i + 1}", token, image if i == 0 else None, stream)
+        results.append((latency, ok))
+
+
+async def _drive(app, conversations: int, turns: int, image: str, stream: bool) -> tuple:
+    results = []
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://loadtest", timeout=600.0) as client:
+        start = time.perf_counter()
+        await asyncio.gather(*(_conversation(client, turns, image, stream, results) for _ in range(conversations)))
+        return results, time.perf_counter() - start
+
+
+async def _run(app, chatapp, conversations: int, turns: int, image: str, stream: bool, memory_sessions: int) -> dict:
+    async with app.router.lifespan_context(app):
+        results, seconds = await _drive(app, conversations, turns, image, stream)
+        latencies = [latency for latency, _ in results]
+        report = {
+            "requests": len(results),
+            "errors": sum(1 for _, ok in results if not ok),
+            "seconds": seconds,
+            "rps": len(results) / seconds if seconds > 0 else 0.0,
+            "mean_ms": statistics.mean(latencies) * 1000,
+            "p50_ms": _percentile(latencies, 50) * 1000,
+            "p95_ms": _percentile(latencies, 95) * 1000,
+            "p99_ms": _percentile(latencies, 99) * 1000,
+            "sessions": chatapp.session_stats().get("live", None),
+        }
+
+        if memory_sessions > 0:
+            gc.collect()
+            tracemalloc.start()
+            try:
+                before = tracemalloc.get_traced_memory()[0]
+                await _drive(app, memory_sessions, 1, image, stream)
+                gc.collect()
+                after = tracemalloc.get_traced_memory()[0]
+            finally:
+                tracemalloc.stop()
+            report["bytes_per_session"] = max(after - before, 0) / memory_sessions
+        return report
+
+
+def run_load_test(app: str = "text", conversations: int = 16, turns: int = 4, stream: bool = False,
+                  latency: float = 0.05, token_latency: float = 0.0, reply_words: int = 20,
+                  image_side: int = 1024, memory_sessions: int = None) -> dict:
+    """
+    Start a stub model server, drive the chat app with concurrent conversations and report
+    throughput, latency percentiles and memory per session.
+    """
+    memory_sessions = conversations if memory_sessions is None else memory_sessions
+    server = start_stub(latency=latency, token_latency=token_latency,
+                        reply=" ".join(f"word{i}" for i in range(max(reply_words, 1))))
+    image = make_image(image_side) if app == "image" else None
+    try:
+        with _environ(CHAT_HOST="127.0.0.1", CHAT_PORT=server.server_address[1], CHAT_WARMUP="0",
+                      CHAT_PROBE_INTERVAL="0"):
+            fastapi_app, chatapp = build_app(app)
+            report = asyncio.run(_run(fastapi_app, chatapp, conversations, turns, image, stream, memory_sessions))
+    finally:
+        server.shutdown()
+    report.update(app=app, conversations=conversations, turns=turns, stream=stream, model_requests=server.requests)
+    return report
+
+
+def format_report(report: dict) -> str:
+    lines = [
+        f"{report['app']} chat: {report['conversations']} conversations x {report['turns']} turns"
+        f"{' (streamed)' if report['stream'] else ''}",
+        f"  {report['requests']} requests in {report['seconds']:.2f}s, {report['rps']:.1f} req/s, "
+        f"{report['errors']} errors",
+        f"  latency mean {report['mean_ms']:.1f} ms  p50 {report['p50_ms']:.1f} ms  "
+        f"p95 {report['p95_ms']:.1f} ms  p99 {report['p99_ms']:.1f} ms",
+    ]
+    if report.get("bytes_per_session") is not None:
+        lines.append(f"  memory per session {report['bytes_per_session'] / 1024:.1f} KiB")
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test a chat server against a stub Ollama")
+    parser.add_argument("--app", choices=sorted(APPS), default="text")
+    parser.add_argument("--conversations", type=int, default=16, help="concurrent conversations")
+    parser.add_argument("--turns", type=int, default=4, help="requests per conversation")
+    parser.add_argument("--stream", action="store_true", help="use /nlip/stream/ instead of /nlip/")
+    parser.add_argument("--latency", type=float, default=0.05, help="stub time to first token, in seconds")
+    parser.add_argument("--token-latency", type=float, default=0.0, help="stub time per further token, in seconds")
+    parser.add_argument("--reply-words", type=int, default=20, help="words in each stub reply")
+    parser.add_argument("--image-side", type=int, default=1024, help="pixels a side of the uploaded test image")
+    parser.add_argument("--memory-sessions", type=int, default=None,
+                        help="sessions created to measure memory per session (default: --conversations; 0 = skip)")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args()
+
+    report = run_load_test(args.app, args.conversations, args.turns, args.stream, args.latency,
+                           args.token_latency, args.reply_words, args.image_side, args.memory_sessions)
+    print(json.dumps(report, indent=2) if args.json else format_report(report))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,242 @@
+'''
+Metrics for the NLIP web servers, in the Prometheus text format.
+
+A small, dependency-free registry of counters, gauges and histograms,
+exposed by WebApplication.setup_webserver at GET /metrics:
+
+    nlip_requests_total{route,status}       requests served
+    nlip_requests_in_flight                 requests being handled now
+    nlip_request_seconds{route}             whole request latency (histogram)
+    nlip_model_seconds{route}               time spent waiting on the model
+    nlip_overhead_seconds{route}            the rest: NLIP parsing, sessions, serialization
+    nlip_model_calls_total{api}             calls to the model server
+    nlip_tokens_total{kind}                 prompt and completion tokens reported by Ollama
+    nlip_sessions                           live sessions in the session backend
+
+Model time is attributed to a request through a context variable:
+MetricsMiddleware starts a ModelTimer per request and the Ollama clients
+add the duration of every call they make to it (see record_model_call).
+'''
+
+from bisect import bisect_left
+from contextvars import ContextVar
+import threading
+import time
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _format_labels(names: tuple, values: tuple) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(f'{n}="{str(v)}"'.replace("\n", " ") for n, v in zip(names, values))
+    return "{" + pairs + "}"
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str, labels: tuple = ()):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self._values = dict()
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(labels.get(n, "") for n in self.label_names)
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in items:
+            lines.append(f"{self.name}{_format_labels(self.label_names, key)} {value}")
+        return lines
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, labels: tuple = (), callback=None):
+        # With a callback, the value is read when the metrics are rendered
+        super().__init__(name, help, labels)
+        self.callback = callback
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def render(self) -> list:
+        if self.callback is not None:
+            value = self.callback()
+            if value is not None:
+                self.set(value)
+        return super().render()
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: tuple = (), buckets: tuple = DEFAULT_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key, None)
+            if state is None:
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            # Counts per bucket are stored non-cumulative and summed when rendered
+            state[0][bisect_left(self.buckets, value)] += 1
+            state[1] += value
+            state[2] += 1
+
+    def count(self, **labels) -> int:
+        state = self._values.get(self._key(labels), None)
+        return state[2] if state else 0
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = [(key, (list(s[0]), s[1], s[2])) for key, s in self._values.items()]
+        names = self.label_names + ("le",)
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float("inf"),), counts):
+                cumulative += n
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f"{self.name}_bucket{_format_labels(names, key + (le,))} {cumulative}")
+            labels = _format_labels(self.label_names, key)
+            lines.append(f"{self.name}_sum{labels} {total}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = dict()
+
+    def register(self, metric: _Metric) -> _Metric:
+        # Re-registering a name returns the existing metric, so apps can share one registry
+        return self.metrics.setdefault(metric.name, metric)
+
+    def render(self) -> str:
+        lines = []
+        for metric in list(self.metrics.values()):
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+requests_total = REGISTRY.register(Counter("nlip_requests_total", "Requests served.", ("route", "status")))
+requests_in_flight = REGISTRY.register(Gauge("nlip_requests_in_flight", "Requests being handled."))
+request_seconds = REGISTRY.register(Histogram("nlip_request_seconds", "Request latency in seconds.", ("route",)))
+model_seconds = REGISTRY.register(Histogram("nlip_model_seconds", "Time per request spent waiting on the model.", ("route",)))
+overhead_seconds = REGISTRY.register(
+    Histogram("nlip_overhead_seconds", "Time per request not spent waiting on the model.", ("route",))
+)
+model_calls_total = REGISTRY.register(Counter("nlip_model_calls_total", "Calls to the model server.", ("api",)))
+tokens_total = REGISTRY.register(Counter("nlip_tokens_total", "Tokens reported by the model server.", ("kind",)))
+
+
+class ModelTimer:
+    def __init__(self):
+        self.seconds = 0.0
+
+
+_request_timer = ContextVar("nlip_model_timer", default=None)
+
+
+def current_model_timer() -> ModelTimer:
+    """The ModelTimer of the request being handled, or None outside MetricsMiddleware."""
+    return _request_timer.get()
+
+
+def record_model_call(api: str, seconds: float, result: dict = None):
+    """Count a model call, charge its time to the current request and add its token counts."""
+    model_calls_total.inc(api=api)
+    timer = _request_timer.get()
+    if timer is not None:
+        timer.seconds += seconds
+    if result:
+        if result.get("prompt_eval_count"):
+            tokens_total.inc(result["prompt_eval_count"], kind="prompt")
+        if result.get("eval_count"):
+            tokens_total.inc(result["eval_count"], kind="completion")
+
+
+def track_sessions(app, registry: Registry = REGISTRY):
+    """Export app.session_stats()["live"] as nlip_sessions."""
+    def live():
+        return app.session_stats().get("live", None)
+
+    metric = registry.register(Gauge("nlip_sessions", "Live sessions in the session backend.", callback=live))
+    metric.callback = live
+    return metric
+
+
+def _route_label(scope) -> str:
+    # The route template for paths with parameters, so labels stay few
+    route = scope.get("route", None)
+    if route is None:
+        return "unmatched"
+    template = getattr(route, "path", "")
+    return template if "{" in template else scope.get("path", template)
+
+
+class MetricsMiddleware:
+    """ASGI middleware timing each HTTP request until its last body byte is sent (streams included)."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        timer = ModelTimer()
+        token = _request_timer.set(timer)
+        status = 500
+        start = time.perf_counter()
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        requests_in_flight.inc()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            requests_in_flight.dec()
+            _request_timer.reset(token)
+            total = time.perf_counter() - start
+            path = _route_label(scope)
+            requests_total.inc(route=path, status=status)
+            request_seconds.observe(total, route=path)
+            model_seconds.observe(timer.seconds, route=path)
+            overhead_seconds.observe(max(total - timer.seconds, 0.0), route=path)
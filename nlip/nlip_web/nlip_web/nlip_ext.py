@@ -4,45 +4,97 @@ Extensions to NLIP Server Library that should eventually be folded in.
 
 import os
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import HTMLResponse, FileResponse
-from fastapi import FastAPI
-import time
+from fastapi.responses import HTMLResponse, FileResponse, PlainTextResponse, StreamingResponse
+from fastapi import FastAPI, HTTPException, Request
 from nlip_server import server
 from nlip_sdk import errors as err 
 from nlip_sdk import nlip
-from nlip_web import env
-from dataclasses import dataclass
+from nlip_web import env, metrics, telemetry
+from nlip_web.session_store import SessionBackend, create_backend
+from nlip_web.static_cache import StaticCache
+from nlip_web.admission import AdmissionController, AdmissionMiddleware, Rejected
+from nlip_web.telemetry import Telemetry, TelemetryMiddleware
 import uvicorn
 import logging
 import inspect
+import json
+import asyncio
+import contextvars
+import random
+
+async def _maybe_await(result):
+    if inspect.isawaitable(result):
+        return await result
+    return result
+
+
+# Fraction of responses whose full payload is logged at INFO (all of them at DEBUG)
+LOG_PAYLOAD_SAMPLE = env.read_float("LOG_PAYLOAD_SAMPLE", 0.0)
+
+
+def _log_response(logger: logging.Logger, rsp: nlip.NLIP_Message, correlator):
+    # Serializing a long answer is real work, so only do it when it will be written
+    if logger.isEnabledFor(logging.DEBUG) or (
+        LOG_PAYLOAD_SAMPLE > 0 and logger.isEnabledFor(logging.INFO) and random.random() < LOG_PAYLOAD_SAMPLE
+    ):
+        logger.log(logging.INFO, "sending back %s", rsp.to_json())
+    else:
+        logger.info("sending back response for %s", correlator)
 
-@dataclass 
-class SessionState: 
-    session_data: any
-    touched: time.time
 
 '''
 A session which can retrieve previous state based on correlators. 
 The child class should call set_session_data to store data that will 
-be reused across different calls from the client.  
+be reused across different calls from the client. The data is written
+back to the application's session backend after every execute.
+
+Work that can wait until the response has gone out (such as summarizing
+the chat history) is returned by background_work; the application runs it
+after the response, and the conversation's next request waits for it.
 '''
 class StatefulSession(server.NLIP_Session):
-    
-    async def correlated_execute(self, msg: nlip.NLIP_Message) -> nlip.NLIP_Message:
+
+    async def restore_session(self, msg: nlip.NLIP_Message):
+        telemetry.mark("lookup")
         # Check if the other side has sent a correlator 
-        
         other_correlator =  msg.extract_conversation_token()
         session_data = None
+        if self.nlip_app is not None and other_correlator is not None:
+            # Let the previous turn's background work finish (and save) first
+            await self.nlip_app.wait_background(other_correlator)
         if self.nlip_app is not None and other_correlator is not None: 
-            session_data = self.nlip_app.retrieve_session_data(other_correlator)
+            session_data = await self.nlip_app.retrieve_session_data(other_correlator)
         
         if session_data is not None:
             self.set_session_data(session_data)
+        if other_correlator is not None:
+            # An unknown (e.g. expired) correlator keeps its name, so the
+            # new state is saved where the client will look for it
             self.correlator = other_correlator
+        telemetry.mark("restored")
+        return other_correlator, session_data
 
-        rsp_or_coro = self.execute(msg)
-        rsp = await rsp_or_coro if inspect.isawaitable(rsp_or_coro) else rsp_or_coro
-        
+    async def save_session(self):
+        if self.nlip_app is None or self.get_correlator() is None:
+            return
+        session_data = self.get_session_data()
+        if session_data is not None:
+            await self.nlip_app.store_session_data(self.get_correlator(), session_data)
+
+    def background_work(self):
+        """
+        An async function to run once the response has been sent, or None.
+        Subclasses override this; the function should save_session() itself
+        if it changes the session data.
+        """
+        return None
+
+    def schedule_background_work(self):
+        work = self.background_work()
+        if work is not None and self.nlip_app is not None and self.get_correlator() is not None:
+            self.nlip_app.run_in_background(self.get_correlator(), work)
+
+    def add_correlator(self, rsp: nlip.NLIP_Message, other_correlator, session_data) -> nlip.NLIP_Message:
         # On the response, we need to add the correlator 
         # There are three cases: 
         #  The other side has sent a correlator -- which is the one to send back
@@ -57,9 +109,56 @@ class StatefulSession(server.NLIP_Session):
                 local_correlator = self.get_correlator()
                 if local_correlator is not None: 
                     rsp.add_conversation_token(local_correlator)
-        self.get_logger().log(logging.INFO, f"sending back {rsp.to_json()}")
         return rsp
     
+    async def correlated_execute(self, msg: nlip.NLIP_Message) -> nlip.NLIP_Message:
+        other_correlator, session_data = await self.restore_session(msg)
+
+        rsp_or_coro = self.execute(msg)
+        rsp = await rsp_or_coro if inspect.isawaitable(rsp_or_coro) else rsp_or_coro
+        await self.save_session()
+        self.schedule_background_work()
+        
+        rsp = self.add_correlator(rsp, other_correlator, session_data)
+        _log_response(self.get_logger(), rsp, self.get_correlator())
+        return rsp
+
+    async def execute_stream(self, msg: nlip.NLIP_Message):
+        """
+        Yield the text of the response in pieces. Sessions that can stream
+        override this; the default runs execute and yields its text at once.
+        """
+        rsp_or_coro = self.execute(msg)
+        rsp = await rsp_or_coro if inspect.isawaitable(rsp_or_coro) else rsp_or_coro
+        text = rsp.extract_text()
+        if text:
+            yield text
+
+    async def correlated_execute_stream(self, msg: nlip.NLIP_Message):
+        """
+        The streaming form of correlated_execute. Yields events (dicts):
+        {"type": "token", "content": piece} for each piece of text, then
+        {"type": "done", "message": ...} carrying the full response with its
+        correlator, or {"type": "error", "content": ...} if execution fails.
+        """
+        other_correlator, session_data = await self.restore_session(msg)
+        pieces = []
+        try:
+            async for piece in self.execute_stream(msg):
+                pieces.append(piece)
+                yield {"type": "token", "content": piece}
+        except Exception as e:
+            self.get_logger().log(logging.ERROR, f"stream failed: {e}")
+            yield {"type": "error", "content": str(e)}
+            return
+        await self.save_session()
+        self.schedule_background_work()
+
+        rsp = nlip.NLIP_Factory.create_text("".join(pieces))
+        rsp = self.add_correlator(rsp, other_correlator, session_data)
+        self.get_logger().info("streamed %d pieces", len(pieces))
+        yield {"type": "done", "message": rsp.model_dump(mode="json", exclude_none=True)}
+    
     def set_session_data(self, session_data:any):
         self.session_data = session_data
      
@@ -72,29 +171,125 @@ class StatefulSession(server.NLIP_Session):
 A subclass of SafeStatefulApplication should implement 
 create_stateful_session in order to maintain session state. 
 
+Session data is kept by a SessionBackend (see nlip_web/session_store.py),
+chosen with SESSION_BACKEND. The external backends store bytes: a subclass
+using them implements serialize_session_data / deserialize_session_data.
 '''
 
 class SafeStatefulApplication(server.SafeApplication):
     def __init__(self):
-        self.session_dict = dict()
-        self.purge_period = 3600
-
-    def retrieve_session_data(self, correlator):
-        answer = self.session_dict.get(correlator, None)
-        if answer is not None: 
-            answer.touched = time.time()
-            return answer.session_data
-        return None
+        # SESSION_TTL: seconds an untouched session is kept (default 1 hour)
+        # SESSION_MAX: most sessions kept; the least recently used go first (0 = unbounded)
+        # SESSION_PURGE_INTERVAL: seconds between background purges of expired sessions
+        # SESSION_BACKEND: memory, sqlite:///<path> or redis://<host>:<port>/<db>
+        self.purge_period = env.read_digits("SESSION_TTL", 3600)
+        self.purge_interval = env.read_digits("SESSION_PURGE_INTERVAL", 60)
+        self.session_backend = env.read_string("SESSION_BACKEND", "memory")
+        self.session_max = env.read_digits("SESSION_MAX", 100000)
+        self._sessions = None
+        self._purge_task = None
+        # Set by WebApplication.setup_webserver; background work takes a slot like a request
+        self.admission = None
+        # correlator -> task running that conversation's background work
+        self._background = dict()
+        self._background_started = set()
+
+    @property
+    def sessions(self) -> SessionBackend:
+        # Opened on first use, so an application that never keeps sessions
+        # (such as WebApplication) has no connection or purge loop of its own
+        if self._sessions is None:
+            self._sessions = create_backend(self.session_backend, ttl=self.purge_period, max_size=self.session_max)
+        return self._sessions
+
+    async def startup(self):
+        await super().startup()
+        self._purge_task = asyncio.create_task(self._purge_loop())
+
+    async def shutdown(self):
+        if self._purge_task is not None:
+            self._purge_task.cancel()
+            self._purge_task = None
+        tasks = list(self._background.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        if self._sessions is not None:
+            await self._sessions.close()
+        await super().shutdown()
+
+    async def _purge_loop(self):
+        while True:
+            await asyncio.sleep(self.purge_interval)
+            try:
+                await self.sessions.purge_expired()
+            except Exception as e:
+                self.get_logger().error(f'Exception {e} while purging sessions -- Ignored')
 
-    def store_session_data(self, correlator, session_data:any):
-        self.session_dict[correlator] = SessionState(session_data, time.time())
+    def run_in_background(self, correlator, work):
+        """
+        Run work() for a conversation after its response has gone out. It is
+        not part of any request: its model calls are counted but not charged
+        to a request, and it waits for an admission slot like one.
+        """
+        if correlator in self._background:
+            return
+        # An empty context, so the finished request's timer and trace are not carried over
+        task = contextvars.Context().run(asyncio.ensure_future, self._run_background(correlator, work))
+        self._background[correlator] = task
 
-    def purge_old(self):
-        now = time.time()
-        for x in self.session_dict.keys():
-            if now - self.session_dict[x].touched > self.purge_period:
-                # Data has not been touched for an hour - can be removed.
-                self.session_dict.pop(x, None)
+    async def _run_background(self, correlator, work):
+        try:
+            if self.admission is not None:
+                try:
+                    await self.admission.acquire(existing_session=True)
+                except Rejected:
+                    # Busy: the work is still due and is scheduled again after the next turn
+                    return
+            try:
+                self._background_started.add(correlator)
+                await work()
+            except Exception as e:
+                self.get_logger().error(f'Exception {e} in background work for {correlator} -- Ignored')
+            finally:
+                if self.admission is not None:
+                    self.admission.release()
+        finally:
+            self._background_started.discard(correlator)
+            self._background.pop(correlator, None)
+
+    async def wait_background(self, correlator):
+        """Wait for a conversation's background work, so its next turn sees (and keeps) the result."""
+        task = self._background.get(correlator, None)
+        if task is None:
+            return
+        if correlator not in self._background_started:
+            # Still waiting for a slot the new request may be holding: drop it, it is rescheduled
+            task.cancel()
+        await asyncio.wait({task})
+        # A task cancelled before it ever ran has not removed itself
+        if self._background.get(correlator, None) is task:
+            del self._background[correlator]
+
+    def serialize_session_data(self, session_data:any) -> bytes:
+        raise err.UnImplementedError("serialize_session_data", self.__class__.__name__)
+
+    def deserialize_session_data(self, data:bytes) -> any:
+        raise err.UnImplementedError("deserialize_session_data", self.__class__.__name__)
+
+    async def retrieve_session_data(self, correlator):
+        answer = await self.sessions.get(correlator)
+        if answer is not None and self.sessions.serializes:
+            answer = self.deserialize_session_data(answer)
+        return answer
+
+    async def store_session_data(self, correlator, session_data:any):
+        if self.sessions.serializes:
+            session_data = self.serialize_session_data(session_data)
+        await self.sessions.put(correlator, session_data)
+
+    async def purge_old(self) -> int:
+        return await self.sessions.purge_expired()
 
     '''
     The session state is purged after the purge_period in seconds expires
@@ -102,22 +297,23 @@ class SafeStatefulApplication(server.SafeApplication):
     '''
     def set_purge_period(self, purge_period:int):
         self.purge_period = purge_period
+        if self._sessions is not None:
+            self._sessions.set_ttl(purge_period)
 
+    def session_stats(self) -> dict:
+        return self.sessions.stats()
 
-    def check_existing(self, request:nlip.NLIP_Message) -> any:
+    async def check_existing(self, request:nlip.NLIP_Message) -> any:
         if request is not None:
             correlator =  request.extract_conversation_token()
-            mydata = self.session_dict.get(correlator, None) 
-            if mydata is not None:
-                return mydata.session_data
+            if correlator is not None:
+                return await self.retrieve_session_data(correlator)
         return None
 
-    def remove_session_data(self,session:server.NLIP_Session):
+    async def remove_session_data(self,session:server.NLIP_Session):
         correlator = session.get_correlator()
         if correlator is not None: 
-            entry = self.session_dict.get(correlator,None) 
-            if entry is not None:
-                self.session_dict[correlator] = None
+            await self.sessions.remove(correlator)
 
     def create_session(self) -> server.NLIP_Session:
         session = self.create_stateful_session()
@@ -135,25 +331,106 @@ class WebApplication(SafeStatefulApplication):
         self.favicon_path = favicon_path
         self.indexFile = indexFile
         self.pathname = pathname
-
+        self.telemetry = None
 
     def setup_webserver(self, thisapp:server.NLIP_Application, port, host="localhost") -> FastAPI:
             app = server.setup_server(thisapp)
-            app.mount(self.pathname, StaticFiles(directory=self.static_dir))
-        
-            @app.get("/", response_class=HTMLResponse)
-            async def read_root():
-                with open(self.indexFile, "r") as f:
-                    html_content = f.read()
-                return HTMLResponse(content=html_content)
+            # STATIC_CACHE=0 serves the UI straight from disk (e.g. while editing it)
+            if env.read_string("STATIC_CACHE", "1").lower() in ("1", "true", "yes"):
+                self.setup_static_cache(app)
+            else:
+                self.setup_static_files(app)
+
+            # Bounded concurrency and queueing in front of the model (see nlip_web/admission.py)
+            self.admission = AdmissionController.from_env()
+            thisapp.admission = self.admission
+            if self.admission is not None:
+                app.add_middleware(AdmissionMiddleware, controller=self.admission)
+                admission = self.admission
+                metrics.REGISTRY.register(metrics.Gauge(
+                    "nlip_admission_active", "Requests holding an admission slot.")).callback = lambda: admission.active
+                metrics.REGISTRY.register(metrics.Gauge(
+                    "nlip_admission_queued", "Requests waiting for an admission slot.")).callback = lambda: admission.queued
+
+            # Per-stage arrival rates and delays for program_files.analyzer (see nlip_web/telemetry.py).
+            # Inside metrics, whose timer supplies the model time, and outside admission, to see the wait
+            self.telemetry = Telemetry.from_env(type(thisapp).__name__)
+            if self.telemetry is not None:
+                app.add_middleware(TelemetryMiddleware, telemetry=self.telemetry)
+
+            # Request latency (model vs NLIP overhead), tokens and sessions, for Prometheus.
+            # Added last so it is the outermost layer and also sees rejected requests
+            app.add_middleware(metrics.MetricsMiddleware)
+            metrics.track_sessions(thisapp)
+
+            @app.get("/metrics", include_in_schema=False)
+            async def get_metrics():
+                return PlainTextResponse(metrics.REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+            if getattr(thisapp, "warmer", None) is not None:
+                @app.get("/health/model")
+                async def model_health():
+                    # Cold vs warm probe latencies (see nlip_web/warmup.py)
+                    return thisapp.warmer.stats()
+
+            @app.post("/nlip/stream/")
+            async def chat_stream(msg: nlip.NLIP_Message):
+                # Sent as NDJSON, one event per line, as the model produces them
+                return StreamingResponse(stream_events(msg), media_type="application/x-ndjson")
 
-            @app.get("/favicon.ico", include_in_schema=False)
-            async def get_favicon():
-                return FileResponse(self.favicon_path)
+            async def stream_events(msg: nlip.NLIP_Message):
+                session = thisapp.create_session()
+                if inspect.isawaitable(session):
+                    session = await session
+                await _maybe_await(session.start())
+                thisapp.add_session(session)
+                try:
+                    async for event in session.correlated_execute_stream(msg):
+                        yield json.dumps(event) + "\n"
+                finally:
+                    thisapp.remove_session(session)
+                    await _maybe_await(session.stop())
 
             self.fastapi_app = app
             self.start_server(port,host=host)
             return app
 
+    def setup_static_cache(self, app: FastAPI):
+        # Index and static files are read and compressed once, then served from memory
+        cache = StaticCache.from_env(self.static_dir, self.indexFile)
+        self.static_cache = cache
+        favicon = self.favicon_path.removeprefix(self.pathname).lstrip("/")
+
+        @app.api_route("/", methods=["GET", "HEAD"], response_class=HTMLResponse)
+        async def read_root(request: Request):
+            return cache.index.response(request)
+
+        @app.api_route(self.pathname + "/{path:path}", methods=["GET", "HEAD"], include_in_schema=False)
+        async def read_static(path: str, request: Request):
+            asset = cache.get(path)
+            if asset is None:
+                raise HTTPException(status_code=404)
+            return asset.response(request)
+
+        @app.get("/favicon.ico", include_in_schema=False)
+        async def get_favicon(request: Request):
+            asset = cache.get(favicon)
+            if asset is None:
+                raise HTTPException(status_code=404)
+            return asset.response(request)
+
+    def setup_static_files(self, app: FastAPI):
+        app.mount(self.pathname, StaticFiles(directory=self.static_dir))
+
+        @app.get("/", response_class=HTMLResponse)
+        async def read_root():
+            with open(self.indexFile, "r") as f:
+                html_content = f.read()
+            return HTMLResponse(content=html_content)
+
+        @app.get("/favicon.ico", include_in_schema=False)
+        async def get_favicon():
+            return FileResponse(self.favicon_path)
+
     def start_server(self, port, host="localhost"):
         uvicorn.run(self.fastapi_app, port=port, host=host)
\ No newline at end of file
@@ -0,0 +1,160 @@
+'''
+An opt-in cache for model responses, used by SimpleGenAI and by the
+program_files pipeline (program_files/response_cache.py).
+
+Requests with the same model, prompt, options and seed are answered from
+an in-memory LRU and, if a directory is given, from JSON files on disk that
+outlive the process. Entries can expire after a TTL and the disk tier is
+trimmed (oldest first) when it grows past its size budget.
+
+The cache itself takes its limits as arguments; each user builds it from
+its own configuration. Here that is ResponseCache.from_env (RESPONSE_CACHE=1
+plus RESPONSE_CACHE_* variables); the pipeline uses its dev_config.ini
+[response_cache] section. Only use it where identical prompts should get
+identical answers, e.g. with a fixed seed or temperature 0.
+'''
+
+from collections import OrderedDict
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from nlip_web import env
+
+
+def cache_key(model: str, prompt, options: dict = None, seed: int = None) -> str:
+    """Hex sha256 of the canonical JSON request: prompt may be a string or chat messages."""
+    payload = {"model": model, "prompt": prompt, "options": options or {}, "seed": seed}
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    def __init__(self, cache_dir: str = None, max_entries: int = 1024, max_disk_bytes: int = 0, ttl: float = 0):
+        # No cache_dir keeps the cache in memory only; max_disk_bytes and ttl of 0 mean unbounded
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+        self.max_entries = max_entries
+        self.max_disk_bytes = max_disk_bytes
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._memory = OrderedDict()
+        self._disk_bytes = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "ResponseCache":
+        """A cache configured from RESPONSE_CACHE_* variables, or None unless RESPONSE_CACHE is set."""
+        if env.read_string("RESPONSE_CACHE", "0").lower() not in ("1", "true", "yes"):
+            return None
+        return cls(
+            cache_dir=env.read_string("RESPONSE_CACHE_DIR", "") or None,
+            max_entries=env.read_digits("RESPONSE_CACHE_MAX_ENTRIES", 1024),
+            max_disk_bytes=env.read_digits("RESPONSE_CACHE_MAX_DISK_MB", 256) * 1024 * 1024,
+            ttl=env.read_float("RESPONSE_CACHE_TTL", 0.0),
+        )
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / f"{key}.json"
+
+    def _expired(self, created: float) -> bool:
+        return self.ttl > 0 and time.time() - created > self.ttl
+
+    def get(self, key: str):
+        """The cached value for key, or None on a miss or an expired entry."""
+        with self._lock:
+            entry = self._memory.get(key, None)
+            if entry is not None and not self._expired(entry[0]):
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self._memory.pop(key, None)
+
+        if self.cache_dir is not None:
+            try:
+                with open(self._path(key), encoding="utf-8") as f:
+                    entry = json.load(f)
+            except (OSError, ValueError):
+                entry = None
+            if entry is not None and not self._expired(entry["created"]):
+                with self._lock:
+                    self._remember(key, entry["created"], entry["value"])
+                    self.hits += 1
+                return entry["value"]
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key: str, value):
+        """Store a JSON-serializable value in both tiers."""
+        created = time.time()
+        with self._lock:
+            self._remember(key, created, value)
+        if self.cache_dir is not None:
+            self._write(key, {"created": created, "value": value})
+
+    def _remember(self, key: str, created: float, value):
+        self._memory[key] = (created, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _entries(self) -> list:
+        return list(self.cache_dir.glob("*/*.json"))
+
+    def _write(self, key: str, entry: dict):
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Write beside the final path and rename, so readers never see a partial entry
+        fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(entry, f)
+            # Overwriting a key replaces its old file rather than adding to the total
+            try:
+                replaced = path.stat().st_size
+            except OSError:
+                replaced = 0
+            os.replace(tmp, path)
+        finally:
+            if os.path.exists(tmp):
+                os.unlink(tmp)
+        self._trim_disk(path.stat().st_size - replaced)
+
+    def _trim_disk(self, added: int):
+        if self.max_disk_bytes <= 0:
+            return
+        with self._lock:
+            if self._disk_bytes is None:
+                # First write of this process: measure what earlier runs left behind
+                self._disk_bytes = sum(p.stat().st_size for p in self._entries())
+            else:
+                self._disk_bytes += added
+            if self._disk_bytes <= self.max_disk_bytes:
+                return
+            # Over budget: drop the oldest entries until under 90% of it
+            for path in sorted(self._entries(), key=lambda p: p.stat().st_mtime):
+                if self._disk_bytes <= 0.9 * self.max_disk_bytes:
+                    break
+                try:
+                    size = path.stat().st_size
+                    path.unlink()
+                    self._disk_bytes -= size
+                except OSError:
+                    pass
+
+    def clear(self):
+        """Drop every entry from both tiers."""
+        with self._lock:
+            self._memory.clear()
+            if self.cache_dir is not None:
+                for path in self._entries():
+                    path.unlink(missing_ok=True)
+            self._disk_bytes = None
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses, "memory_entries": len(self._memory)}
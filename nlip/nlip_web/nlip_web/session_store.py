@@ -0,0 +1,344 @@
+'''
+Session storage for SafeStatefulApplication.
+
+A SessionBackend maps correlators to session data. Three are provided,
+selected with SESSION_BACKEND (see create_backend):
+
+    memory                     MemoryBackend: live objects in this process
+    sqlite:///path/sessions.db SqliteBackend: shared by the workers of one host
+    redis://host:6379/0        RedisBackend: shared by every worker and node
+
+The external backends store bytes, so the application serializes its
+session data (see SafeStatefulApplication.serialize_session_data); with
+them any worker can continue any conversation, and text_chat / image_chat
+can run with several uvicorn workers or behind a load balancer.
+
+In memory (SessionStore), sessions are kept in an OrderedDict in
+least-recently-used order, so the max_size bound evicts the coldest session
+in O(1). Expiry uses a min-heap of deadlines: touching a session only
+updates its timestamp, and when its heap entry comes due it is either
+expired or pushed back with the new deadline. Purging therefore costs
+O(log n) per expired session instead of a scan of every session; the
+application runs it periodically on the event loop.
+'''
+
+from collections import OrderedDict
+from dataclasses import dataclass
+from urllib.parse import urlparse
+import asyncio
+import heapq
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+from nlip_sdk import errors as err
+
+logger = logging.getLogger('uvicorn.error')
+
+
+@dataclass
+class SessionState:
+    session_data: any
+    touched: float
+
+
+class SessionStore:
+    def __init__(self, ttl: float = 3600, max_size: int = 0):
+        # A max_size of 0 means unbounded
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._heap = []
+        self.created = 0
+        self.expired = 0
+        self.evicted = 0
+        self.removed = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def get(self, key, now: float = None) -> any:
+        """The session data for key, marking it as recently used; None if absent or expired."""
+        now = time.time() if now is None else now
+        entry = self._entries.get(key, None)
+        if entry is None:
+            return None
+        if entry.touched + self.ttl <= now:
+            # Past its TTL but not purged yet: expire it now rather than revive it
+            del self._entries[key]
+            self.expired += 1
+            self._maybe_compact()
+            return None
+        entry.touched = now
+        self._entries.move_to_end(key)
+        return entry.session_data
+
+    def peek(self, key, now: float = None) -> any:
+        """The session data for key without touching it; None if absent or expired."""
+        now = time.time() if now is None else now
+        entry = self._entries.get(key, None)
+        if entry is None or entry.touched + self.ttl <= now:
+            return None
+        return entry.session_data
+
+    def put(self, key, session_data: any, now: float = None):
+        now = time.time() if now is None else now
+        if key in self._entries:
+            self._entries[key] = SessionState(session_data, now)
+            self._entries.move_to_end(key)
+            return
+        self._entries[key] = SessionState(session_data, now)
+        heapq.heappush(self._heap, (now + self.ttl, key))
+        self.created += 1
+
+        while self.max_size > 0 and len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evicted += 1
+        self._maybe_compact()
+
+    def remove(self, key) -> bool:
+        if self._entries.pop(key, None) is None:
+            return False
+        self.removed += 1
+        self._maybe_compact()
+        return True
+
+    def set_ttl(self, ttl: float):
+        self.ttl = ttl
+        self._rebuild_heap()
+
+    def purge_expired(self, now: float = None, limit: int = 0) -> int:
+        """
+        Remove sessions untouched for ttl seconds. Stops after limit removals
+        (0 = no limit) so a large backlog can be purged in slices.
+        Returns the number of sessions removed.
+        """
+        now = time.time() if now is None else now
+        count = 0
+        while self._heap and self._heap[0][0] <= now:
+            if limit > 0 and count >= limit:
+                break
+            _, key = heapq.heappop(self._heap)
+            entry = self._entries.get(key, None)
+            if entry is None:
+                # Already removed or evicted
+                continue
+            deadline = entry.touched + self.ttl
+            if deadline > now:
+                # Touched since this deadline was pushed
+                heapq.heappush(self._heap, (deadline, key))
+                continue
+            del self._entries[key]
+            self.expired += 1
+            count += 1
+        return count
+
+    def stats(self) -> dict:
+        return {
+            "live": len(self._entries),
+            "created": self.created,
+            "expired": self.expired,
+            "evicted": self.evicted,
+            "removed": self.removed,
+        }
+
+    def _rebuild_heap(self):
+        self._heap = [(entry.touched + self.ttl, key) for key, entry in self._entries.items()]
+        heapq.heapify(self._heap)
+
+    def _maybe_compact(self):
+        # Removed and evicted sessions leave stale heap entries behind; drop them once they dominate
+        if len(self._heap) > 2 * len(self._entries) + 1024:
+            self._rebuild_heap()
+
+
+"""
+The interface every backend implements. Methods are async so that network
+backends never block the event loop. serializes is True when values must
+be bytes (the application converts its session data).
+"""
+
+
+class SessionBackend:
+    serializes = True
+
+    async def get(self, key) -> any:
+        raise err.UnImplementedError("get", self.__class__.__name__)
+
+    async def put(self, key, value: any):
+        raise err.UnImplementedError("put", self.__class__.__name__)
+
+    async def remove(self, key) -> bool:
+        raise err.UnImplementedError("remove", self.__class__.__name__)
+
+    async def purge_expired(self) -> int:
+        return 0
+
+    def set_ttl(self, ttl: float):
+        self.ttl = ttl
+
+    def stats(self) -> dict:
+        return {}
+
+    async def close(self):
+        pass
+
+
+class MemoryBackend(SessionBackend):
+    serializes = False
+
+    def __init__(self, ttl: float = 3600, max_size: int = 0, batch: int = 10000):
+        self.store = SessionStore(ttl=ttl, max_size=max_size)
+        self.batch = batch
+
+    async def get(self, key) -> any:
+        return self.store.get(key)
+
+    async def put(self, key, value: any):
+        self.store.put(key, value)
+
+    async def remove(self, key) -> bool:
+        return self.store.remove(key)
+
+    async def purge_expired(self) -> int:
+        # Purge in slices so a large backlog does not stall other requests
+        total = 0
+        while True:
+            count = self.store.purge_expired(limit=self.batch)
+            total += count
+            if count < self.batch:
+                return total
+            await asyncio.sleep(0)
+
+    def set_ttl(self, ttl: float):
+        self.store.set_ttl(ttl)
+
+    def stats(self) -> dict:
+        return self.store.stats()
+
+
+class SqliteBackend(SessionBackend):
+    """
+    Sessions in a SQLite file (WAL mode), shared by every worker process on
+    one host. Expiry is an indexed range delete; max_size evicts the least
+    recently used rows when purging. The live count in stats() is taken at
+    each purge, so reading it (e.g. from /metrics) never queries the
+    database on the event loop.
+    """
+
+    def __init__(self, path: str, ttl: float = 3600, max_size: int = 0):
+        self.path = path
+        self.ttl = ttl
+        self.max_size = max_size
+        self.expired = 0
+        self.evicted = 0
+        self._lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, timeout=30, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS sessions (key TEXT PRIMARY KEY, data BLOB NOT NULL, touched REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS sessions_touched ON sessions (touched)")
+        (self.live,) = self._db.execute("SELECT COUNT(*) FROM sessions").fetchone()
+
+    def _run(self, sql: str, args: tuple = ()):
+        with self._lock:
+            return self._db.execute(sql, args)
+
+    async def _call(self, fn, *args):
+        return await asyncio.to_thread(fn, *args)
+
+    def _get(self, key):
+        now = time.time()
+        row = self._run("SELECT data FROM sessions WHERE key = ? AND touched > ?", (key, now - self.ttl)).fetchone()
+        if row is None:
+            return None
+        self._run("UPDATE sessions SET touched = ? WHERE key = ?", (now, key))
+        return row[0]
+
+    def _purge(self) -> int:
+        """Delete expired rows (then the least recently used, over max_size); returns the number expired."""
+        cursor = self._run("DELETE FROM sessions WHERE touched <= ?", (time.time() - self.ttl,))
+        expired = cursor.rowcount
+        self.expired += expired
+        (live,) = self._run("SELECT COUNT(*) FROM sessions").fetchone()
+        if self.max_size > 0 and live > self.max_size:
+            cursor = self._run(
+                "DELETE FROM sessions WHERE key IN (SELECT key FROM sessions ORDER BY touched LIMIT ?)",
+                (live - self.max_size,),
+            )
+            self.evicted += cursor.rowcount
+            live -= cursor.rowcount
+        self.live = live
+        return expired
+
+    async def get(self, key) -> any:
+        return await self._call(self._get, key)
+
+    async def put(self, key, value: bytes):
+        await self._call(self._run, "INSERT OR REPLACE INTO sessions (key, data, touched) VALUES (?, ?, ?)",
+                         (key, value, time.time()))
+
+    async def remove(self, key) -> bool:
+        cursor = await self._call(self._run, "DELETE FROM sessions WHERE key = ?", (key,))
+        return cursor.rowcount > 0
+
+    async def purge_expired(self) -> int:
+        return await self._call(self._purge)
+
+    def stats(self) -> dict:
+        return {"live": self.live, "expired": self.expired, "evicted": self.evicted}
+
+    async def close(self):
+        with self._lock:
+            self._db.close()
+
+
+class RedisBackend(SessionBackend):
+    """
+    Sessions in Redis (or any server speaking its protocol), using the
+    optional redis package. Redis expires keys itself; reads refresh the
+    TTL with GETEX. Bound memory with the server's maxmemory and an
+    allkeys-lru policy rather than max_size.
+    """
+
+    def __init__(self, url: str, ttl: float = 3600, prefix: str = "nlip:session:"):
+        try:
+            import redis.asyncio as redis
+        except ImportError:
+            raise ImportError("The redis session backend needs the redis package: pip install redis") from None
+        self.client = redis.Redis.from_url(url)
+        self.ttl = ttl
+        self.prefix = prefix
+
+    async def get(self, key) -> any:
+        return await self.client.getex(self.prefix + key, ex=int(self.ttl))
+
+    async def put(self, key, value: bytes):
+        await self.client.set(self.prefix + key, value, ex=int(self.ttl))
+
+    async def remove(self, key) -> bool:
+        return await self.client.delete(self.prefix + key) > 0
+
+    async def close(self):
+        await self.client.aclose()
+
+
+def create_backend(url: str = "memory", ttl: float = 3600, max_size: int = 0) -> SessionBackend:
+    """A backend from a SESSION_BACKEND value: memory, sqlite:///<path> or redis://..."""
+    scheme = urlparse(url).scheme if "://" in url else url
+    if scheme == "memory":
+        return MemoryBackend(ttl=ttl, max_size=max_size)
+    if scheme == "sqlite":
+        return SqliteBackend(url[len("sqlite:///"):], ttl=ttl, max_size=max_size)
+    if scheme in ("redis", "rediss", "unix"):
+        return RedisBackend(url, ttl=ttl)
+    raise ValueError(f"Unknown session backend {url!r}; use memory, sqlite:///<path> or redis://<host>")
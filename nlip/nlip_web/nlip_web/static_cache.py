@@ -0,0 +1,117 @@
+'''
+In-memory, precompressed serving of the web UI's files.
+
+A StaticCache reads every file of the static directory (and the index page)
+once, when the web server is set up, and keeps:
+
+1. the body, a gzip copy and, if the brotli package is installed, a brotli
+copy of each compressible file (text, JS, CSS, JSON, SVG) whose compressed
+form is actually smaller;
+
+2. a strong ETag (a hash of the content) for conditional requests.
+
+Each request is then answered from memory. The client gets the smallest
+encoding its Accept-Encoding allows, or 304 Not Modified when its
+If-None-Match still matches. Files are cached with Cache-Control max-age
+STATIC_MAX_AGE; the index page is always revalidated (no-cache), so a
+changed page is picked up on the next load at the cost of a 304 round trip.
+
+The cache is a snapshot: restart the server to serve changed files.
+'''
+
+import gzip
+import hashlib
+import mimetypes
+import os
+
+from fastapi import Request
+from fastapi.responses import Response
+
+from nlip_web import env
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional dependency
+    brotli = None
+
+COMPRESSIBLE_TYPES = ("text/", "application/javascript", "application/json", "image/svg+xml")
+# Smaller files gain less from compression than the encoding costs
+MIN_COMPRESS_BYTES = 256
+
+
+class StaticAsset:
+    def __init__(self, body: bytes, content_type: str, cache_control: str):
+        self.content_type = content_type
+        self.cache_control = cache_control
+        self.etag = '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+        self.encodings = {"identity": body}
+        if len(body) >= MIN_COMPRESS_BYTES and content_type.startswith(COMPRESSIBLE_TYPES):
+            if brotli is not None:
+                self._add("br", brotli.compress(body, quality=11))
+            self._add("gzip", gzip.compress(body, compresslevel=9, mtime=0))
+
+    def _add(self, encoding: str, data: bytes):
+        if len(data) < len(self.encodings["identity"]):
+            self.encodings[encoding] = data
+
+    def choose_encoding(self, accept_encoding: str) -> str:
+        accepted = set()
+        for part in accept_encoding.split(","):
+            name, _, params = part.strip().partition(";")
+            if params.replace(" ", "") not in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+                accepted.add(name.strip().lower())
+        for encoding in ("br", "gzip"):
+            if encoding in self.encodings and (encoding in accepted or "*" in accepted):
+                return encoding
+        return "identity"
+
+    def response(self, request: Request) -> Response:
+        headers = {"ETag": self.etag, "Cache-Control": self.cache_control, "Vary": "Accept-Encoding"}
+        if_none_match = request.headers.get("if-none-match", "")
+        if if_none_match.strip() == "*" or self.etag in [t.strip().removeprefix("W/") for t in if_none_match.split(",")]:
+            return Response(status_code=304, headers=headers)
+
+        encoding = self.choose_encoding(request.headers.get("accept-encoding", ""))
+        if encoding != "identity":
+            headers["Content-Encoding"] = encoding
+        body = b"" if request.method == "HEAD" else self.encodings[encoding]
+        response = Response(content=body, media_type=self.content_type, headers=headers)
+        if request.method == "HEAD":
+            response.headers["Content-Length"] = str(len(self.encodings[encoding]))
+        return response
+
+
+class StaticCache:
+    def __init__(self, static_dir: str, index_file: str = None, max_age: int = 3600):
+        self.static_dir = static_dir
+        self.max_age = max_age
+        self.assets = dict()
+        self.index = self._load(index_file, "no-cache") if index_file else None
+        for root, _, files in os.walk(static_dir):
+            for name in files:
+                path = os.path.join(root, name)
+                relative = os.path.relpath(path, static_dir).replace(os.sep, "/")
+                self.assets[relative] = self._load(path, f"public, max-age={max_age}")
+
+    @classmethod
+    def from_env(cls, static_dir: str, index_file: str = None) -> "StaticCache":
+        return cls(static_dir, index_file, max_age=env.read_digits("STATIC_MAX_AGE", 3600))
+
+    def _load(self, path: str, cache_control: str) -> StaticAsset:
+        with open(path, "rb") as f:
+            body = f.read()
+        content_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+        if content_type.startswith("text/") or content_type == "application/javascript":
+            content_type += "; charset=utf-8"
+        return StaticAsset(body, content_type, cache_control)
+
+    def get(self, relative_path: str) -> StaticAsset:
+        return self.assets.get(relative_path, None)
+
+    def stats(self) -> dict:
+        assets = list(self.assets.values()) + ([self.index] if self.index else [])
+        return {
+            "files": len(assets),
+            "bytes": sum(len(a.encodings["identity"]) for a in assets),
+            "compressed_bytes": sum(min(len(b) for b in a.encodings.values()) for a in assets),
+        }
@@ -0,0 +1,193 @@
+'''
+A small in-process stand-in for the Ollama HTTP API, for benchmarks and
+offline testing. It answers /api/generate, /api/chat, /api/embeddings,
+/api/embed, /api/tags and /api/ps with canned responses after a
+configurable delay, and speaks HTTP/1.1 so clients can keep connections
+alive. Like Ollama, /api/generate and /api/chat stream NDJSON (one word per
+line, chunked) unless the request sets "stream": false. latency is the
+time to the first word; with token_latency set, each further word takes
+that long too (a non-streamed reply is sent once all of them are done).
+
+With load_time set, the model starts unloaded: the first request pays
+load_time extra, and the model is unloaded again after keep_alive seconds
+idle (the request's keep_alive, else 5 minutes; negative keeps it loaded).
+A /api/generate request without a prompt only loads the model.
+
+    server = start_stub(latency=0.05)
+    client = OllamaClient(port=server.server_address[1])
+    ...
+    server.shutdown()
+
+'''
+
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+DEFAULT_KEEP_ALIVE = 300.0
+_DURATION_UNITS = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+
+
+def parse_keep_alive(value) -> float:
+    """Seconds for an Ollama keep_alive value (a number of seconds or e.g. "30m", "-1")."""
+    if value is None:
+        return DEFAULT_KEEP_ALIVE
+    if isinstance(value, (int, float)):
+        return float(value)
+    value = str(value).strip()
+    for unit in ("ms", "s", "m", "h"):
+        if value.endswith(unit):
+            return float(value[:-len(unit)]) * _DURATION_UNITS[unit]
+    return float(value)
+
+
+class StubOllamaHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, payload: dict, status: int = 200):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_ndjson(self, chunks):
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for i, chunk in enumerate(chunks):
+            if i and self.server.token_latency:
+                time.sleep(self.server.token_latency)
+            line = json.dumps(chunk).encode("utf-8") + b"\n"
+            self.wfile.write(f"{len(line):x}\r\n".encode("ascii") + line + b"\r\n")
+            self.wfile.flush()
+        self.wfile.write(b"0\r\n\r\n")
+
+    def _read_json(self) -> dict:
+        length = int(self.headers.get("Content-Length", 0))
+        raw = self.rfile.read(length) if length else b"{}"
+        return json.loads(raw or b"{}")
+
+    def do_GET(self):
+        if self.path == "/api/tags":
+            self._send_json({"models": [{"name": self.server.tagged_model, "model": self.server.tagged_model}]})
+        elif self.path == "/api/ps":
+            # Like Ollama, list models with their tag (an untagged name means ':latest')
+            tagged = self.server.tagged_model
+            loaded = [{"name": tagged, "model": tagged}] if self.server.is_loaded() else []
+            self._send_json({"models": loaded})
+        else:
+            self._send_json({"error": "not found"}, 404)
+
+    def do_POST(self):
+        request = self._read_json()
+        self.server.requests += 1
+        load_duration = self.server.touch(request.get("keep_alive"))
+        model = request.get("model")
+        if self.path == "/api/generate" and not request.get("prompt") and not request.get("images"):
+            # No prompt: Ollama just loads the model
+            self._send_json({"model": model, "response": "", "done": True, "done_reason": "load",
+                             "load_duration": int(load_duration * 1e9)})
+            return
+
+        time.sleep(self.server.latency)
+        reply = self.server.reply
+        stream = request.get("stream", True)
+        if not stream and self.path in ("/api/generate", "/api/chat"):
+            # The whole reply is generated before it is sent
+            time.sleep(self.server.token_latency * len(self.server.pieces(reply)))
+        # Token counts as Ollama reports them, counting words as tokens
+        prompt_text = request.get("prompt") or " ".join(m.get("content") or "" for m in request.get("messages", []))
+        counts = {"load_duration": int(load_duration * 1e9),
+                  "prompt_eval_count": len(prompt_text.split()), "eval_count": len(self.server.pieces(reply))}
+
+        if stream and self.path == "/api/generate":
+            pieces = self.server.pieces(reply)
+            self._send_ndjson([{"model": model, "response": p, "done": False} for p in pieces]
+                              + [{"model": model, "response": "", "done": True, **counts}])
+        elif stream and self.path == "/api/chat":
+            pieces = self.server.pieces(reply)
+            self._send_ndjson([{"model": model, "message": {"role": "assistant", "content": p}, "done": False} for p in pieces]
+                              + [{"model": model, "message": {"role": "assistant", "content": ""}, "done": True, **counts}])
+        elif self.path == "/api/generate":
+            self._send_json({"model": request.get("model"), "response": reply, "done": True, **counts})
+        elif self.path == "/api/chat":
+            message = {"role": "assistant", "content": reply}
+            self._send_json({"model": request.get("model"), "message": message, "done": True, **counts})
+        elif self.path == "/api/embeddings":
+            self._send_json({"embedding": self.server.embed(request.get("prompt", ""))})
+        elif self.path == "/api/embed":
+            inputs = request.get("input", [])
+            inputs = [inputs] if isinstance(inputs, str) else inputs
+            self._send_json({"model": request.get("model"), "embeddings": [self.server.embed(x) for x in inputs]})
+        else:
+            self._send_json({"error": "not found"}, 404)
+
+
+class StubOllamaServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024
+
+    def __init__(self, address, latency: float = 0.0, reply: str = "stub reply", model: str = "nlip-test-model", dims: int = 8,
+                 load_time: float = 0.0, token_latency: float = 0.0):
+        super().__init__(address, StubOllamaHandler)
+        self.latency = latency
+        self.token_latency = token_latency
+        self.reply = reply
+        self.model = model
+        self.dims = dims
+        self.load_time = load_time
+        self.requests = 0
+        self.loads = 0
+        # With no load_time the model is always resident
+        self._expires = None if load_time > 0 else float("inf")
+        self._load_lock = threading.Lock()
+
+    @property
+    def tagged_model(self) -> str:
+        return self.model if ":" in self.model else f"{self.model}:latest"
+
+    def is_loaded(self) -> bool:
+        return self._expires is not None and time.monotonic() < self._expires
+
+    def unload(self):
+        with self._load_lock:
+            self._expires = None if self.load_time > 0 else float("inf")
+
+    def touch(self, keep_alive) -> float:
+        """Load the model if needed and extend its residency; returns the load time paid."""
+        with self._load_lock:
+            paid = 0.0
+            if not self.is_loaded():
+                # Concurrent requests wait for the same load, as with Ollama
+                time.sleep(self.load_time)
+                self.loads += 1
+                paid = self.load_time
+            seconds = parse_keep_alive(keep_alive)
+            self._expires = float("inf") if seconds < 0 else time.monotonic() + seconds
+            return paid
+
+    def pieces(self, text: str) -> list:
+        # Split a reply into word-sized pieces (keeping the spaces) for streaming
+        words = text.split(" ")
+        return [w + " " for w in words[:-1]] + words[-1:]
+
+    def embed(self, text: str) -> list:
+        # Deterministic, cheap pseudo-embedding so identical inputs match
+        seed = sum(text.encode("utf-8")) or 1
+        return [((seed * (i + 1)) % 97) / 97.0 for i in range(self.dims)]
+
+
+def start_stub(host: str = "127.0.0.1", port: int = 0, **kwargs) -> StubOllamaServer:
+    """Start a stub server on a background thread; port 0 picks a free port."""
+    server = StubOllamaServer((host, port), **kwargs)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
@@ -0,0 +1,188 @@
+'''
+Self-measurement of an NLIP web server as a queueing network.
+
+Each NLIP request passes through four stages, which are treated as a
+serial chain of queues:
+
+    Parse    reading the body, validating the NLIP message, creating the session
+    Session  looking up the conversation's saved state (restore_session)
+    Model    waiting for an admission slot and for the model server
+    Build    everything else: prompt and history handling, saving the
+             session, adding the correlator, serializing the response
+
+Marks set while a request is handled (by AdmissionMiddleware and
+StatefulSession) split its time between the stages; model time comes
+from the request's metrics.ModelTimer. A Telemetry recorder groups the
+finished requests into windows of `window` seconds and, as each window
+closes, appends one row to <dir>/<name>.csv:
+
+    time, lambda_main, queue_lambdas.<Q>..., delays.<Q>...
+
+time is the window number, the lambdas are requests per second and the
+delays are mean seconds per stage: the layout program_files.analyzer.run
+reads to fit each stage's service rate μ and the maximum safe arrival
+rate. The chain itself is written to <dir>/<name>.json in the
+queueing-network format of data/queueing-network, with the observed mean
+arrival rate (lambda) and response time (beta) filled in.
+
+Telemetry is off unless TELEMETRY_DIR is set; windows with no finished
+requests are not written.
+'''
+
+from contextvars import ContextVar
+import json
+import os
+import time
+
+from nlip_web import env, metrics
+
+STAGES = ("Parse", "Session", "Model", "Build")
+
+
+class RequestTrace:
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.marks = dict()
+
+
+_current_trace = ContextVar("nlip_request_trace", default=None)
+
+
+def mark(name: str):
+    """Note that the current request reached point `name` (no-op outside a traced request)."""
+    trace = _current_trace.get()
+    if trace is not None and name not in trace.marks:
+        trace.marks[name] = time.perf_counter()
+
+
+def stage_delays(trace: RequestTrace, end: float, model_seconds: float) -> dict:
+    """Seconds the request spent in each stage, or None if it did not reach a session."""
+    lookup, restored = trace.marks.get("lookup", None), trace.marks.get("restored", None)
+    if lookup is None or restored is None:
+        return None
+    admitted = trace.marks.get("admitted", trace.start)
+    # Waiting for an admission slot is waiting for the model
+    queued = admitted - trace.start
+    return {
+        "Parse": lookup - admitted,
+        "Session": restored - lookup,
+        "Model": queued + model_seconds,
+        "Build": max(end - restored - model_seconds, 0.0),
+    }
+
+
+class Telemetry:
+    def __init__(self, out_dir: str, name: str = "nlip_web", window: float = 10.0):
+        self.out_dir = out_dir
+        self.name = name
+        self.window = window
+        self.csv_path = os.path.join(out_dir, name + ".csv")
+        self.network_path = os.path.join(out_dir, name + ".json")
+        self.windows_written = 0
+        self._window_start = time.time()
+        self._count = 0
+        self._sums = {stage: 0.0 for stage in STAGES}
+        # Totals over all windows, for the network file
+        self._total_requests = 0
+        self._total_seconds = 0.0
+        self._total_response = 0.0
+
+    @classmethod
+    def from_env(cls, name: str = "nlip_web") -> "Telemetry":
+        """A recorder writing to TELEMETRY_DIR, or None if it is not set."""
+        out_dir = env.read_string("TELEMETRY_DIR", "")
+        if not out_dir:
+            return None
+        return cls(out_dir, name, window=env.read_float("TELEMETRY_WINDOW", 10.0))
+
+    def record(self, delays: dict):
+        now = time.time()
+        if now - self._window_start >= self.window:
+            self.flush(now)
+        self._count += 1
+        for stage in STAGES:
+            self._sums[stage] += delays[stage]
+
+    def row(self, seconds: float) -> dict:
+        rate = self._count / seconds
+        row = {"time": self.windows_written + 1, "lambda_main": rate}
+        for stage in STAGES:
+            row[f"queue_lambdas.{stage}"] = rate
+        for stage in STAGES:
+            row[f"delays.{stage}"] = self._sums[stage] / self._count
+        return row
+
+    def flush(self, now: float = None):
+        """Close the current window, writing its row if it saw any requests."""
+        now = time.time() if now is None else now
+        seconds = now - self._window_start
+        if self._count and seconds > 0:
+            row = self.row(seconds)
+            os.makedirs(self.out_dir, exist_ok=True)
+            new_file = self.windows_written == 0 or not os.path.exists(self.csv_path)
+            with open(self.csv_path, "w" if new_file else "a", encoding="utf-8") as f:
+                if new_file:
+                    f.write(",".join(row) + "\n")
+                f.write(",".join(str(v) for v in row.values()) + "\n")
+            self.windows_written += 1
+            self._total_requests += self._count
+            self._total_seconds += seconds
+            self._total_response += sum(self._sums.values())
+            self.write_network()
+        self._window_start = now
+        self._count = 0
+        self._sums = {stage: 0.0 for stage in STAGES}
+
+    def network(self) -> dict:
+        queues = []
+        for i, stage in enumerate(STAGES):
+            next_id = STAGES[i + 1] if i + 1 < len(STAGES) else "External"
+            queues.append({"id": stage, "service_rate": None, "next_queue": [{"id": next_id, "probability": 100.0}]})
+        observed = self._total_requests > 0
+        return {"system": {
+            "lambda": self._total_requests / self._total_seconds if observed else None,
+            "beta": self._total_response / self._total_requests if observed else None,
+            "entry_points": STAGES[0],
+            "constraint": {"service_rate_sum": 1.0},
+            "queues": queues,
+        }}
+
+    def write_network(self):
+        os.makedirs(self.out_dir, exist_ok=True)
+        with open(self.network_path, "w", encoding="utf-8") as f:
+            json.dump(self.network(), f, indent=2)
+
+
+class TelemetryMiddleware:
+    """Trace POST requests under path_prefix and record their stage delays."""
+
+    def __init__(self, app, telemetry: Telemetry, path_prefix: str = "/nlip/"):
+        self.app = app
+        self.telemetry = telemetry
+        self.path_prefix = path_prefix
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            return await self.app(scope, receive, self._flush_on_shutdown(send))
+        if scope["type"] != "http" or scope["method"] != "POST" or not scope["path"].startswith(self.path_prefix):
+            return await self.app(scope, receive, send)
+
+        trace = RequestTrace()
+        token = _current_trace.set(trace)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _current_trace.reset(token)
+            # Streams included: the app returns after the last body byte is sent
+            timer = metrics.current_model_timer()
+            delays = stage_delays(trace, time.perf_counter(), timer.seconds if timer is not None else 0.0)
+            if delays is not None:
+                self.telemetry.record(delays)
+
+    def _flush_on_shutdown(self, send):
+        async def wrapped(message):
+            if message["type"] == "lifespan.shutdown.complete":
+                # Write the last, partial window
+                self.telemetry.flush()
+            await send(message)
+        return wrapped
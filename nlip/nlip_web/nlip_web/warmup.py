@@ -0,0 +1,125 @@
+'''
+Model warm-up and keep-alive for the chat servers.
+
+Ollama loads a model on its first request and unloads it after keep_alive
+idle time, so without help the first chat after startup (or after a quiet
+spell) waits seconds for the load. A ModelWarmer:
+
+1. preloads the model when the application starts (a generate request
+with no prompt, which only loads it), and
+
+2. probes the server every probe_interval seconds: it asks /api/ps whether
+the model is resident, reloads it if not, and times the round trip. As a
+side effect each probe renews the model's keep_alive.
+
+Probe latencies are kept separately for cold probes (the model had been
+unloaded) and warm ones, so the cost of a cold start is visible in
+stats() and on the app's /health/model endpoint.
+'''
+
+import asyncio
+import time
+
+import httpx
+
+from nlip_web import env
+from nlip_web.genai import AsyncOllamaClient
+
+
+def read_keep_alive(var_name: str = "CHAT_KEEP_ALIVE", def_value: str = "30m"):
+    """A keep_alive from the environment: a duration such as "30m", or whole seconds (-1 = forever)."""
+    value = env.read_string(var_name, def_value)
+    if value.lstrip("+-").isdigit():
+        return int(value)
+    return value
+
+
+class LatencyStats:
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.last = None
+
+    def record(self, seconds: float):
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        self.last = seconds
+
+    def as_dict(self) -> dict:
+        mean = self.total / self.count if self.count else None
+        return {"count": self.count, "mean": mean, "max": self.max if self.count else None, "last": self.last}
+
+
+class ModelWarmer:
+    def __init__(self, client: AsyncOllamaClient, warm_on_start: bool = True, probe_interval: float = 60.0):
+        # probe_interval of 0 disables the periodic probe
+        self.client = client
+        self.warm_on_start = warm_on_start
+        self.probe_interval = probe_interval
+        self.cold = LatencyStats()
+        self.warm = LatencyStats()
+        self.failures = 0
+        self.last_error = None
+        self.healthy = None
+        self._task = None
+
+    @classmethod
+    def from_env(cls, client: AsyncOllamaClient) -> "ModelWarmer":
+        return cls(
+            client,
+            warm_on_start=env.read_string("CHAT_WARMUP", "1").lower() in ("1", "true", "yes"),
+            probe_interval=env.read_float("CHAT_PROBE_INTERVAL", 60.0),
+        )
+
+    async def probe(self) -> float:
+        """Make sure the model is loaded, timing the check (and the load, if one was needed)."""
+        start = time.perf_counter()
+        try:
+            resident = await self.client.loaded()
+            await self.client.load()
+        except httpx.HTTPError as e:
+            self.failures += 1
+            self.healthy = False
+            self.last_error = str(e) or type(e).__name__
+            raise
+        seconds = time.perf_counter() - start
+        (self.warm if resident else self.cold).record(seconds)
+        self.healthy = True
+        return seconds
+
+    async def start(self):
+        """Start warming in the background, so the server accepts connections meanwhile."""
+        if self._task is None and (self.warm_on_start or self.probe_interval > 0):
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self):
+        if self.warm_on_start:
+            await self._probe_quietly()
+        while self.probe_interval > 0:
+            await asyncio.sleep(self.probe_interval)
+            await self._probe_quietly()
+
+    async def _probe_quietly(self):
+        try:
+            await self.probe()
+        except httpx.HTTPError:
+            # Recorded in failures/last_error; the next probe tries again
+            pass
+
+    def stats(self) -> dict:
+        return {
+            "model": self.client.model,
+            "keep_alive": self.client.keep_alive,
+            "healthy": self.healthy,
+            "cold": self.cold.as_dict(),
+            "warm": self.warm.as_dict(),
+            "failures": self.failures,
+            "last_error": self.last_error,
+        }
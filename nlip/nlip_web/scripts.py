@@ -34,4 +34,18 @@ def start_image():
     """
     my_env = get_env(local_port=8020, chat_model="nlip-test-model")
     command = f"poetry run python nlip_web/image_chat.py"
-    run_command(command, my_env)
\ No newline at end of file
+    run_command(command, my_env)
+
+def bench_pool():
+    """
+    Compare pooled and unpooled Ollama calls against the stub server
+    """
+    command = f"poetry run python nlip_web/bench.py"
+    run_command(command, os.environ.copy())
+
+def load_test():
+    """
+    Load test the text chat server against the stub server
+    """
+    command = f"poetry run python nlip_web/loadtest.py"
+    run_command(command, os.environ.copy())
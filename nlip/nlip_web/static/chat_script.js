@@ -31,8 +31,11 @@ form.addEventListener('submit', async (e) => {
   input.value = '';
 
   try {
-    let data = null;
-    data = await client.sendMessage(message);
+    // Render the reply as it streams in
+    const data = await client.streamMessage(message, (piece, textSoFar) => {
+      botBox.textContent = textSoFar;
+      chatBox.scrollTop = chatBox.scrollHeight;
+    });
     botBox.textContent =  data || 'No response';
   } catch (error) {
     botBox.textContent = 'Error connecting to chat engine.';
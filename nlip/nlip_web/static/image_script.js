@@ -42,14 +42,18 @@ form.addEventListener('submit', async (e) => {
   input.value = '';
 
   try {
+    // Render the reply as it streams in
+    const render = (piece, textSoFar) => {
+      botBox.textContent = textSoFar;
+      chatBox.scrollTop = chatBox.scrollHeight;
+    };
     let data = null;
     if (file.files.length > 0) {
-      data = await client.sendWithImage(message, file.files[0]);
-      botBox.textContent =  data.content || 'No response';
+      data = await client.streamWithImage(message, file.files[0], render);
     } else {
-      data = await client.sendMessage(message);
-      botBox.textContent =  data || 'No response';
+      data = await client.streamMessage(message, render);
     }
+    botBox.textContent =  data || 'No response';
     
   } catch (error) {
     botBox.textContent = 'Error connecting to chat engine.';
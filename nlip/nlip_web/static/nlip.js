@@ -376,6 +376,66 @@ class NLIPClient {
     return this.send(message);
   }
 
+  // Streaming variants: onToken(piece, textSoFar) is called as the reply is
+  // generated; the promise resolves with the full text once it is complete.
+  async streamMessage(text, onToken) {
+    const message = NLIPFactory.createText(text);
+    if (this.correlator != null) {
+      message.addConversationToken(this.correlator)
+    }
+    return this.stream(message, onToken);
+  }
+
+  async streamWithImage(text, imageFile, onToken) {
+    const base64 = await this.fileToBase64(imageFile);
+    const message = NLIPFactory.createText(text);
+    if (this.correlator != null) {
+      message.addConversationToken(this.correlator)
+    }
+    message.addImage(base64, this.getFileExtension(imageFile));
+    return this.stream(message, onToken);
+  }
+
+  async stream(nlipMessage, onToken = () => {}) {
+    const response = await fetch(`${this.baseUrl}/nlip/stream/`, {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: nlipMessage.toJSON()
+    });
+    if (!response.ok) throw new Error(`HTTP ${response.status}`);
+
+    // The server sends one JSON event per line (NDJSON)
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffered = '';
+    let text = '';
+    const handle = (line) => {
+      if (!line.trim()) return;
+      const event = JSON.parse(line);
+      if (event.type === 'token') {
+        text += event.content;
+        onToken(event.content, text);
+      } else if (event.type === 'done') {
+        const nlipMessage = NLIPFactory.createMessageFromJSON(event.message);
+        this.correlator = nlipMessage.extractToken(ReservedTokens.conv);
+        text = nlipMessage.extractText() ?? text;
+      } else if (event.type === 'error') {
+        throw new Error(event.content);
+      }
+    };
+
+    for (;;) {
+      const { done, value } = await reader.read();
+      if (done) break;
+      buffered += decoder.decode(value, { stream: true });
+      const lines = buffered.split('\n');
+      buffered = lines.pop();
+      lines.forEach(handle);
+    }
+    handle(buffered + decoder.decode());
+    return text;
+  }
+
   async uploadFile(file) {
     const formData = new FormData();
     formData.append('contents', file);
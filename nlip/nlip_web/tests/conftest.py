@@ -0,0 +1,24 @@
+import pytest
+
+from nlip_web.stub_ollama import start_stub
+
+
+@pytest.fixture
+def stub():
+    server = start_stub(reply="stub reply from the model")
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def chat_env(monkeypatch, stub):
+    """Point the chat apps at the stub, with warm-up, probes and opt-in features off."""
+    monkeypatch.setenv("CHAT_HOST", "127.0.0.1")
+    monkeypatch.setenv("CHAT_PORT", str(stub.server_address[1]))
+    monkeypatch.setenv("CHAT_WARMUP", "0")
+    monkeypatch.setenv("CHAT_PROBE_INTERVAL", "0")
+    for name in ("SESSION_BACKEND", "SESSION_TTL", "SESSION_MAX", "ADMISSION_MAX_CONCURRENT", "RESPONSE_CACHE",
+                 "TELEMETRY_DIR", "CHAT_HISTORY_MAX_TOKENS", "CHAT_HISTORY_MAX_BYTES", "CHAT_HISTORY_SUMMARIZE"):
+        monkeypatch.delenv(name, raising=False)
+    return monkeypatch
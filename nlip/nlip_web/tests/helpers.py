@@ -0,0 +1,61 @@
+'''
+Drive the chat applications in-process for tests: the app is built as
+text_chat.py / image_chat.py build it (every middleware included) and
+called through httpx.ASGITransport, against the stub Ollama server, so no
+model or network is needed.
+'''
+
+import asyncio
+import contextlib
+import json
+
+import httpx
+from nlip_sdk import nlip
+
+from nlip_web import loadtest
+
+
+@contextlib.asynccontextmanager
+async def chat_client(app: str = "text"):
+    """(client, chatapp) for the chat app configured from the current environment, started and stopped."""
+    fastapi_app, chatapp = loadtest.build_app(app)
+    async with fastapi_app.router.lifespan_context(fastapi_app):
+        transport = httpx.ASGITransport(app=fastapi_app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test", timeout=30.0) as client:
+            yield client, chatapp
+
+
+def make_message(text: str, token: str = None) -> dict:
+    msg = nlip.NLIP_Factory.create_text(text)
+    if token is not None:
+        msg.add_conversation_token(token)
+    return msg.model_dump(mode="json", exclude_none=True)
+
+
+async def send(client: httpx.AsyncClient, text: str, token: str = None) -> httpx.Response:
+    return await client.post("/nlip/", json=make_message(text, token))
+
+
+async def chat(client: httpx.AsyncClient, text: str, token: str = None) -> tuple:
+    """One /nlip/ turn; returns (reply text, conversation token)."""
+    rsp = await send(client, text, token)
+    assert rsp.status_code == 200, rsp.text
+    reply = nlip.NLIP_Message(**rsp.json())
+    return reply.extract_text(), reply.extract_conversation_token()
+
+
+async def stream(client: httpx.AsyncClient, text: str, token: str = None) -> list:
+    """One /nlip/stream/ turn; returns its NDJSON events."""
+    rsp = await client.post("/nlip/stream/", json=make_message(text, token))
+    assert rsp.status_code == 200, rsp.text
+    assert rsp.headers["content-type"].startswith("application/x-ndjson")
+    return [json.loads(line) for line in rsp.text.splitlines() if line.strip()]
+
+
+async def settle(chatapp, token: str, timeout: float = 5.0):
+    """Let a conversation's background work (started after its last reply) run to the end."""
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    while token in chatapp._background:
+        assert loop.time() < deadline, "background work did not finish"
+        await asyncio.sleep(0.01)
@@ -0,0 +1,95 @@
+import asyncio
+
+import pytest
+
+from nlip_web.admission import AdmissionController, Rejected
+
+from tests.helpers import chat, chat_client, send
+
+
+def test_controller_is_opt_in(monkeypatch):
+    monkeypatch.delenv("ADMISSION_MAX_CONCURRENT", raising=False)
+    assert AdmissionController.from_env() is None
+    monkeypatch.setenv("ADMISSION_MAX_CONCURRENT", "2")
+    assert AdmissionController.from_env().max_concurrent == 2
+
+
+def test_controller_serves_existing_sessions_first():
+    async def scenario():
+        controller = AdmissionController(max_concurrent=1, max_queue=4, queue_timeout=5)
+        await controller.acquire()
+        order = []
+
+        async def wait(name, existing):
+            await controller.acquire(existing_session=existing)
+            order.append(name)
+            controller.release()
+
+        new = asyncio.ensure_future(wait("new", False))
+        await asyncio.sleep(0)
+        old = asyncio.ensure_future(wait("existing", True))
+        await asyncio.sleep(0)
+        assert controller.queued == 2
+        controller.release()
+        await asyncio.gather(new, old)
+        assert order == ["existing", "new"]
+        assert controller.stats()["active"] == 0
+
+    asyncio.run(scenario())
+
+
+def test_controller_rejects_when_queue_is_full_or_wait_times_out():
+    async def scenario():
+        controller = AdmissionController(max_concurrent=1, max_queue=0, queue_timeout=0.05)
+        await controller.acquire()
+        with pytest.raises(Rejected) as full:
+            await controller.acquire()
+        assert full.value.status == 429
+
+        controller.max_queue = 1
+        with pytest.raises(Rejected) as timeout:
+            await controller.acquire()
+        assert timeout.value.status == 503
+        assert controller.queued == 0 and controller.active == 1
+
+    asyncio.run(scenario())
+
+
+def test_full_queue_gets_429(chat_env, stub):
+    chat_env.setenv("ADMISSION_MAX_CONCURRENT", "1")
+    chat_env.setenv("ADMISSION_MAX_QUEUE", "0")
+
+    async def scenario():
+        async with chat_client() as (client, chatapp):
+            stub.latency = 0.5
+            first = asyncio.ensure_future(send(client, "slow"))
+            await asyncio.sleep(0.1)
+            second = await send(client, "turned away")
+            assert second.status_code == 429
+            assert "retry-after" in second.headers
+            assert (await first).status_code == 200
+
+            stub.latency = 0
+            # The slot is free again
+            await chat(client, "next")
+
+    asyncio.run(scenario())
+
+
+def test_queue_timeout_gets_503(chat_env, stub):
+    chat_env.setenv("ADMISSION_MAX_CONCURRENT", "1")
+    chat_env.setenv("ADMISSION_MAX_QUEUE", "1")
+    chat_env.setenv("ADMISSION_QUEUE_TIMEOUT", "0.1")
+
+    async def scenario():
+        async with chat_client() as (client, chatapp):
+            stub.latency = 0.5
+            first = asyncio.ensure_future(send(client, "slow"))
+            await asyncio.sleep(0.1)
+            second = await send(client, "waits too long")
+            assert second.status_code == 503
+            assert second.headers["retry-after"] == "1"
+            assert (await first).status_code == 200
+            assert chatapp.admission.stats()["queued"] == 0
+
+    asyncio.run(scenario())
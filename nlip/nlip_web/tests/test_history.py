@@ -0,0 +1,116 @@
+import asyncio
+
+from nlip_web.history import ChatHistory, estimate_tokens
+
+from tests.helpers import chat, chat_client, settle
+
+
+def exchange(i: int, images: list = None) -> list:
+    user = {"role": "user", "content": f"question {i} " + "word " * 20}
+    if images:
+        user["images"] = images
+    return [user, {"role": "assistant", "content": f"answer {i} " + "word " * 20}]
+
+
+def test_token_budget_drops_the_oldest_messages():
+    history = ChatHistory(max_tokens=100)
+    for i in range(10):
+        history.append(*exchange(i))
+    assert history.tokens <= 100
+    assert history.evicted_count == 20 - len(history)
+    assert list(history)[-1]["content"].startswith("answer 9")
+    assert history.tokens == sum(estimate_tokens(m) for m in history)
+
+
+def test_latest_exchange_is_kept_over_budget():
+    history = ChatHistory(max_tokens=1)
+    history.append(*exchange(0))
+    history.append(*exchange(1))
+    assert [m["content"].split()[1] for m in history] == ["1", "1"]
+
+
+def test_byte_budget():
+    history = ChatHistory(max_tokens=0, max_bytes=400)
+    for i in range(10):
+        history.append(*exchange(i))
+    assert 0 < history.bytes <= 400 or len(history) == 2
+
+
+def test_only_the_latest_images_are_kept():
+    history = ChatHistory(max_tokens=0, keep_images=1)
+    history.append(*exchange(0, images=["aaaa"]))
+    history.append(*exchange(1, images=["bbbb"]))
+    images = [m.get("images") for m in history if m["role"] == "user"]
+    assert images == [None, ["bbbb"]]
+
+
+def test_evicted_messages_wait_for_a_summary():
+    history = ChatHistory(max_tokens=100, summarize=True, summarize_after=4)
+    for i in range(4):
+        history.append(*exchange(i))
+    assert history.needs_summary()
+    assert "question 0" in history.summary_prompt()
+
+    pending = len(history.evicted)
+    history.append(*exchange(4))
+    # Messages evicted while the summary was being made stay for the next one
+    history.set_summary("they talked", summarized=pending)
+    assert history.summary == "they talked"
+    assert len(history.evicted) == history.evicted_count - pending
+    assert history.messages()[0]["role"] == "system"
+
+
+def test_clear_forgets_evictions():
+    history = ChatHistory(max_tokens=100, summarize=True)
+    for i in range(5):
+        history.append(*exchange(i))
+    assert history.evicted_count > 0
+    history.clear()
+    assert len(history) == 0 and history.tokens == 0
+    assert history.evicted_count == 0 and history.evicted == []
+
+
+def test_round_trip_through_bytes():
+    history = ChatHistory(max_tokens=100, summarize=True)
+    for i in range(5):
+        history.append(*exchange(i))
+    history.set_summary("so far")
+    restored = ChatHistory.from_bytes(history.to_bytes(), ChatHistory(max_tokens=100, summarize=True))
+    assert list(restored) == list(history)
+    assert restored.summary == "so far"
+    assert restored.evicted_count == history.evicted_count
+
+
+def test_history_stays_within_budget_across_turns(chat_env):
+    chat_env.setenv("CHAT_HISTORY_MAX_TOKENS", "40")
+
+    async def scenario():
+        async with chat_client() as (client, chatapp):
+            _, token = await chat(client, "hello " * 20)
+            for i in range(5):
+                await chat(client, f"turn {i} " + "more " * 20, token)
+            genai = await chatapp.retrieve_session_data(token)
+            assert len(genai.history) == 2
+            assert genai.history.evicted_count == 10
+
+    asyncio.run(scenario())
+
+
+def test_summary_is_made_after_the_reply(chat_env, stub):
+    chat_env.setenv("CHAT_HISTORY_MAX_TOKENS", "40")
+    chat_env.setenv("CHAT_HISTORY_SUMMARIZE", "1")
+
+    async def scenario():
+        async with chat_client() as (client, chatapp):
+            _, token = await chat(client, "hello " * 20)
+            await chat(client, "turn 0 " + "more " * 20, token)
+            requests = stub.requests
+            await chat(client, "turn 1 " + "more " * 20, token)
+            await settle(chatapp, token)
+            genai = await chatapp.retrieve_session_data(token)
+            assert genai.history.summary == "stub reply from the model"
+            assert genai.history.evicted == []
+            # The turn's own model call, then the summary's after the reply went out
+            assert stub.requests == requests + 2
+
+    asyncio.run(scenario())
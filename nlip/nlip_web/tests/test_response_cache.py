@@ -0,0 +1,70 @@
+import os
+
+from nlip_web.genai import SimpleGenAI
+from nlip_web.response_cache import ResponseCache, cache_key
+
+
+def test_key_depends_on_every_input():
+    key = cache_key("m", "prompt", {"temperature": 0}, seed=1)
+    assert key == cache_key("m", "prompt", {"temperature": 0}, seed=1)
+    assert key != cache_key("m", "prompt", {"temperature": 0}, seed=2)
+    assert key != cache_key("other", "prompt", {"temperature": 0}, seed=1)
+    assert key != cache_key("m", [{"role": "user", "content": "prompt"}], {"temperature": 0}, seed=1)
+
+
+def test_memory_tier_is_lru():
+    cache = ResponseCache(max_entries=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    cache.get("a")
+    cache.put("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1 and cache.get("c") == 3
+    assert cache.stats() == {"hits": 3, "misses": 1, "memory_entries": 2}
+
+
+def test_disk_tier_survives_a_new_process(tmp_path):
+    ResponseCache(cache_dir=tmp_path).put("k" * 64, {"text": "saved"})
+    fresh = ResponseCache(cache_dir=tmp_path)
+    assert fresh.get("k" * 64) == {"text": "saved"}
+    fresh.clear()
+    assert ResponseCache(cache_dir=tmp_path).get("k" * 64) is None
+
+
+def test_entries_expire(tmp_path):
+    cache = ResponseCache(cache_dir=tmp_path, ttl=60)
+    cache.put("a" * 64, "value")
+    assert cache.get("a" * 64) == "value"
+    # Both tiers now hold an entry created long ago
+    cache._memory["a" * 64] = (0, "value")
+    cache._path("a" * 64).write_text('{"created": 0, "value": "value"}', encoding="utf-8")
+    assert cache.get("a" * 64) is None
+
+
+def test_disk_tier_is_trimmed_oldest_first(tmp_path):
+    cache = ResponseCache(cache_dir=tmp_path, max_disk_bytes=1000)
+    keys = [f"{i:02d}" + "0" * 62 for i in range(20)]
+    for i, key in enumerate(keys):
+        cache.put(key, "x" * 100)
+        os.utime(cache._path(key), (i, i))
+    on_disk = {p.stem for p in tmp_path.glob("*/*.json")}
+    assert sum(p.stat().st_size for p in tmp_path.glob("*/*.json")) <= 1000
+    assert keys[-1] in on_disk and keys[0] not in on_disk
+
+
+def test_overwriting_a_key_does_not_grow_the_disk_total(tmp_path):
+    cache = ResponseCache(cache_dir=tmp_path, max_disk_bytes=1000)
+    for _ in range(20):
+        cache.put("a" * 64, "x" * 100)
+    # One file on disk, and the total counts it once
+    assert cache._disk_bytes == cache._path("a" * 64).stat().st_size
+
+
+def test_repeated_generate_is_answered_from_the_cache(stub, tmp_path):
+    genai = SimpleGenAI(host="127.0.0.1", port=stub.server_address[1], cache=ResponseCache(cache_dir=tmp_path))
+    first = genai.generate("nlip-test-model", "same question", options={"seed": 1})
+    requests = stub.requests
+    assert genai.generate("nlip-test-model", "same question", options={"seed": 1}) == first
+    assert stub.requests == requests
+    genai.generate("nlip-test-model", "same question", options={"seed": 2})
+    assert stub.requests == requests + 1
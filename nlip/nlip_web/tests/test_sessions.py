@@ -0,0 +1,139 @@
+import asyncio
+import time
+
+from nlip_web.session_store import SessionStore, SqliteBackend
+
+from tests.helpers import chat, chat_client
+
+
+def test_store_expires_untouched_sessions():
+    store = SessionStore(ttl=10)
+    store.put("a", 1, now=0)
+    store.put("b", 2, now=0)
+    assert store.get("a", now=5) == 1  # touched: a now lives until 15
+
+    assert store.purge_expired(now=12) == 1
+    assert "a" in store and "b" not in store
+    assert store.purge_expired(now=20) == 1
+    assert len(store) == 0
+    assert store.stats()["expired"] == 2
+
+
+def test_store_get_treats_expired_session_as_miss():
+    store = SessionStore(ttl=10)
+    store.put("a", 1, now=0)
+    # No purge has run, but the TTL still holds on reads
+    assert store.get("a", now=11) is None
+    assert store.peek("a", now=11) is None
+    assert "a" not in store
+    assert store.stats()["expired"] == 1
+
+
+def test_store_evicts_least_recently_used():
+    store = SessionStore(ttl=100, max_size=2)
+    store.put("a", 1, now=0)
+    store.put("b", 2, now=1)
+    store.get("a", now=2)
+    store.put("c", 3, now=3)
+    assert "b" not in store
+    assert store.get("a", now=4) == 1 and store.get("c", now=4) == 3
+    assert store.stats()["evicted"] == 1
+
+
+def test_store_purges_in_slices():
+    store = SessionStore(ttl=1)
+    for i in range(10):
+        store.put(i, i, now=0)
+    assert store.purge_expired(now=5, limit=4) == 4
+    assert store.purge_expired(now=5) == 6
+
+
+def test_sqlite_backend_expiry_and_stats(tmp_path):
+    async def scenario():
+        backend = SqliteBackend(str(tmp_path / "sessions.db"), ttl=0.2)
+        try:
+            await backend.put("a", b"state")
+            assert await backend.get("a") == b"state"
+            await asyncio.sleep(0.3)
+            assert await backend.get("a") is None
+            assert await backend.purge_expired() == 1
+            assert await backend.purge_expired() == 0
+            assert backend.stats() == {"live": 0, "expired": 1, "evicted": 0}
+        finally:
+            await backend.close()
+
+    asyncio.run(scenario())
+
+
+def test_sqlite_backend_evicts_over_max_size(tmp_path):
+    async def scenario():
+        backend = SqliteBackend(str(tmp_path / "sessions.db"), ttl=3600, max_size=2)
+        try:
+            for key in ("a", "b", "c"):
+                await backend.put(key, key.encode())
+                time.sleep(0.01)
+            assert await backend.purge_expired() == 0
+            assert await backend.get("a") is None
+            assert backend.stats()["live"] == 2 and backend.stats()["evicted"] == 1
+        finally:
+            await backend.close()
+
+    asyncio.run(scenario())
+
+
+def test_conversation_continues_with_its_token(chat_env):
+    async def scenario():
+        async with chat_client() as (client, chatapp):
+            reply, token = await chat(client, "hello")
+            assert reply == "stub reply from the model"
+            assert token is not None
+            _, same = await chat(client, "and again", token)
+            assert same == token
+            genai = await chatapp.retrieve_session_data(token)
+            assert len(genai.history) == 4
+
+    asyncio.run(scenario())
+
+
+def test_expired_session_starts_a_new_history(chat_env):
+    chat_env.setenv("SESSION_TTL", "1")
+
+    async def scenario():
+        async with chat_client() as (client, chatapp):
+            _, token = await chat(client, "remember this")
+            await asyncio.sleep(1.1)
+            _, same = await chat(client, "what did I say?", token)
+            # The client's token is kept, but the old history is gone
+            assert same == token
+            genai = await chatapp.retrieve_session_data(token)
+            assert [m["content"] for m in genai.history if m["role"] == "user"] == ["what did I say?"]
+            assert chatapp.session_stats()["expired"] == 1
+
+    asyncio.run(scenario())
+
+
+def test_session_max_evicts_the_coldest_conversation(chat_env):
+    chat_env.setenv("SESSION_MAX", "2")
+
+    async def scenario():
+        async with chat_client() as (client, chatapp):
+            tokens = [(await chat(client, f"conversation {i}"))[1] for i in range(3)]
+            assert await chatapp.retrieve_session_data(tokens[0]) is None
+            assert await chatapp.retrieve_session_data(tokens[2]) is not None
+            assert chatapp.session_stats()["evicted"] == 1
+
+    asyncio.run(scenario())
+
+
+def test_sqlite_backend_serves_the_app(chat_env, tmp_path):
+    chat_env.setenv("SESSION_BACKEND", f"sqlite:///{tmp_path / 'sessions.db'}")
+
+    async def scenario():
+        async with chat_client() as (client, chatapp):
+            _, token = await chat(client, "hello")
+            await chat(client, "again", token)
+            genai = await chatapp.retrieve_session_data(token)
+            # Restored from bytes: a fresh client around the saved history
+            assert len(genai.history) == 4
+
+    asyncio.run(scenario())
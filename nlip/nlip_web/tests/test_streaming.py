@@ -0,0 +1,30 @@
+import asyncio
+
+from nlip_sdk import nlip
+
+from tests.helpers import chat_client, stream
+
+
+def test_stream_sends_tokens_then_the_full_message(chat_env, stub):
+    stub.token_latency = 0.01
+
+    async def scenario():
+        async with chat_client() as (client, chatapp):
+            events = await stream(client, "hello")
+            tokens = [e for e in events if e["type"] == "token"]
+            assert len(tokens) > 1
+            assert "".join(e["content"] for e in tokens) == "stub reply from the model"
+
+            assert events[-1]["type"] == "done"
+            done = nlip.NLIP_Message(**events[-1]["message"])
+            assert done.extract_text() == "stub reply from the model"
+            token = done.extract_conversation_token()
+            assert token is not None
+
+            # A second streamed turn continues the same conversation
+            events = await stream(client, "and again", token)
+            assert events[-1]["type"] == "done"
+            genai = await chatapp.retrieve_session_data(token)
+            assert len(genai.history) == 4
+
+    asyncio.run(scenario())
@@ -0,0 +1,54 @@
+import asyncio
+
+import pytest
+
+from nlip_web.genai import AsyncOllamaClient, HttpPool, OllamaClient, is_model_listed
+from nlip_web.stub_ollama import start_stub
+from nlip_web.warmup import ModelWarmer
+
+
+@pytest.fixture
+def cold_stub():
+    # With a load time the model starts unloaded, as after an Ollama restart
+    server = start_stub(load_time=0.05)
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_model_names_match_with_or_without_the_latest_tag():
+    listed = [{"name": "llama3:latest", "model": "llama3:latest"}]
+    assert is_model_listed("llama3", listed)
+    assert is_model_listed("llama3:latest", listed)
+    assert not is_model_listed("llama3:8b", listed)
+    assert is_model_listed("registry.local:5000/team/llama3", [{"name": "registry.local:5000/team/llama3:latest"}])
+
+
+def test_loaded_sees_the_tagged_name_on_api_ps(cold_stub):
+    pool = HttpPool()
+    try:
+        client = OllamaClient(host="127.0.0.1", port=cold_stub.server_address[1], model="nlip-test-model", pool=pool)
+        assert not client.loaded()
+        client.load()
+        assert client.loaded()
+        client.model = "nlip-test-model:latest"
+        assert client.loaded()
+    finally:
+        pool.close()
+
+
+def test_probes_count_cold_then_warm(cold_stub):
+    async def scenario():
+        pool = HttpPool()
+        client = AsyncOllamaClient(host="127.0.0.1", port=cold_stub.server_address[1], model="nlip-test-model",
+                                   pool=pool)
+        warmer = ModelWarmer(client, warm_on_start=False, probe_interval=0)
+        try:
+            await warmer.probe()
+            await warmer.probe()
+        finally:
+            await pool.aclose()
+        assert warmer.cold.count == 1 and warmer.warm.count == 1
+        assert cold_stub.loads == 1
+
+    asyncio.run(scenario())
@@ -3,6 +3,7 @@ import pandas as pd
 import matplotlib.pyplot as plt
 from scipy.optimize import curve_fit
 from program_files import config
+from pathlib import Path
 
 # --------------------------------------------------
 # Step 2: Define delay model with μ sum constraint
@@ -94,12 +95,40 @@ def find_max_capacity(mu_dict, routing, source_queue, step=0.01, max_search=100)
 THIS IS THE MAIN FUNCTION WHERE EVERYTHING UIS STARTING FROM AND THE HELPER FUNCTIONS FROM ABOVE WILL 
 BE CALLED HERE AND USED.
 '''
-def run(csv_file_name:str):
+def initial_mu(lmbda, W) -> float:
+    """
+    Starting point for a queue's μ in the fit: the largest λ + 1/W over its
+    rows. Rows with a zero (sub-resolution or empty window) or missing delay
+    are skipped; with none left, or a non-finite result, it falls back to 1.0.
+    """
+    lmbda, W = np.asarray(lmbda, dtype=float), np.asarray(W, dtype=float)
+    usable = np.isfinite(lmbda) & np.isfinite(W) & (W > 0)
+    if not usable.any():
+        return 1.0
+    with np.errstate(over="ignore"):
+        mu = float(np.max(lmbda[usable] + 1.0 / W[usable]))
+    return mu if np.isfinite(mu) else 1.0
+
+
+def run(csv_file_name:str, show_plot:bool=True, plot_path:str=None) -> dict:
+    """
+    Fit μ per queue from a processed CSV and print baseline, what-if and
+    capacity analysis.
+
+    Args:
+        csv_file_name (str): CSV name inside processed_data_dir, or a full path.
+        show_plot (bool): Open the fit plot window (blocks until closed).
+        plot_path (str): Optionally save the fit plot to this file.
+
+    Returns:
+        summary (dict): Estimated μ per queue, baseline/what-if ρ, and the
+        maximum safe λ_main with its bottleneck queue.
+    """
     # --------------------------------------------------
     # Step 1: Load CSV Data
     # --------------------------------------------------
     cfg = config.get_config("dev_config.ini")
-    data_path = cfg.get("paths","processed_data_dir")+"/"+csv_file_name
+    data_path = Path(cfg.get("paths","processed_data_dir")) / csv_file_name
     df = pd.read_csv(data_path)
 
     # Dynamically detect queues from CSV
@@ -126,7 +155,9 @@ def run(csv_file_name:str):
     # Step 3: Fit μ values
     # --------------------------------------------------
 
-    p0 = [1.0] * N  # initial guess per queue
+    # Initial guess per queue from M/M/1 (W = 1/(μ-λ), so μ = λ + 1/W), so
+    # the fit also starts below overload for measured, unnormalized rates
+    p0 = [initial_mu(lam, W) for lam, W in zip(lambda_arrays, delay_arrays)]
 
     popt, _ = curve_fit(
         combined_delay,
@@ -174,14 +205,18 @@ def run(csv_file_name:str):
     plt.title("Curve Fit for μ Estimation")
     plt.legend()
     plt.grid(True)
-    plt.show()
+    if plot_path is not None:
+        plt.savefig(plot_path)
+    if show_plot:
+        plt.show()
+    else:
+        plt.close()
 
     # NEW: Define routing 
-    # Q1 -> Q2 -> Q3
+    # Q1 -> Q2 -> ... -> QN, in CSV column order
     routing = {
-        queue_names[0]: {queue_names[1]: 1.0} if N > 1 else {},
-        queue_names[1]: {queue_names[2]: 1.0} if N > 2 else {},
-        queue_names[2]: {} if N > 2 else {}
+        q: {queue_names[i + 1]: 1.0} if i + 1 < N else {}
+        for i, q in enumerate(queue_names)
     }
 
 
@@ -244,4 +279,24 @@ def run(csv_file_name:str):
     #printing out evrything
     print("\n--- Maximum System Capacity ---")
     print(f"Maximum safe λ_main: {max_lambda:.4f}")
-    print(f"System Bottleneck at Capacity: {bottleneck_queue}")
\ No newline at end of file
+    print(f"System Bottleneck at Capacity: {bottleneck_queue}")
+
+    return {
+        "mu": {q: float(mu) for q, mu in mu_dict.items()},
+        "baseline_rho": {q: float(r) for q, r in baseline["rho"].items()},
+        "what_if_rho": {q: float(r) for q, r in what_if["rho"].items()},
+        "max_lambda": float(max_lambda),
+        "bottleneck": bottleneck_queue,
+    }
+
+def show_saved_plot(plot_path:str) -> None:
+    """
+    Open a fit plot saved by run(plot_path=...) in a window (blocks until closed).
+    Call from the main thread; matplotlib windows are not thread-safe.
+    """
+    image = plt.imread(plot_path)
+    plt.figure(figsize=(image.shape[1] / 100, image.shape[0] / 100))
+    plt.imshow(image)
+    plt.axis("off")
+    plt.tight_layout()
+    plt.show()
@@ -0,0 +1,396 @@
+'''
+Benchmarks for the hot paths of program_files, with results kept per commit.
+
+Each benchmark times one function over synthetic inputs of growing size:
+    generate_data          data_generator.generate_data       queues x time points
+    compute_queue_lambdas  data_generator.compute_queue_lambdas   queues
+    combined_delay         analyzer.combined_delay            time points (3 queues)
+    curve_fit              analyzer's μ fit (scipy curve_fit)  time points (3 queues)
+    find_max_capacity      analyzer.find_max_capacity         queues
+    validate_json          data_conversion.validate_json      queues
+    enforce                validation.enforce                 queues
+    csv_roundtrip          convert_data_to_csv + read_csv     time points (3 queues)
+
+The synthetic networks are feed-forward: every queue routes half of its
+traffic to each of the next two, and the last one to External, so they
+pass validation and every queue carries traffic.
+
+A preset gives the sizes to try: "quick" (10-1000 queues, 100-10k time
+points) for a check before committing, "full" (10-100k queues, 100-10M
+time points) for the whole range. Each benchmark estimates the work of a
+case in units of about a microsecond; cases over the preset's budget are
+recorded as skipped rather than run, since e.g. generate_data over 100k
+queues and 10M time points would take days.
+
+Results are JSON: machine metadata (platform, CPU, Python and library
+versions, git commit) and the median/min seconds per case. They are
+written to benchmark_dir as <commit>.json; compare() matches the cases of
+two result files and flags those that slowed down by more than a
+threshold. Timings are only comparable on the same machine, so a
+metadata mismatch is reported too.
+
+    python main.py bench --preset quick
+    python main.py bench-compare data/benchmarks/<old>.json data/benchmarks/<new>.json
+'''
+
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+import copy
+import json
+import os
+import platform
+import statistics
+import subprocess
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+from scipy.optimize import curve_fit
+
+from program_files import analyzer, data_conversion, data_generator, settings, validation
+
+PRESETS = {
+    "quick": {"queues": (10, 100, 1000), "time_points": (100, 1000, 10000), "budget": 2e6},  # ~2 s per case
+    "full": {"queues": (10, 100, 1000, 10000, 100000),
+             "time_points": (100, 1000, 10000, 100000, 1000000, 10000000), "budget": 1e8},  # ~2 min per case
+}
+# Queues in the benchmarks that only scale with time points (the analyzer's usual three)
+FIXED_QUEUES = 3
+# Metadata that must match for timings to be comparable
+MACHINE_KEYS = ("machine", "processor", "cpu_count", "python")
+
+
+@dataclass
+class Benchmark:
+    name: str
+    axes: Tuple[str, ...]
+    # Estimated work for (queues, time_points), in ~microseconds, checked against the preset's budget
+    cost: Callable[[int, int], float]
+    # Build the inputs for (queues, time_points, scratch dir) and return the call to time
+    setup: Callable[[int, int, Path], Callable[[], object]]
+
+
+# ----------------------------
+# Helpers
+# ----------------------------
+def synthetic_network(n_queues: int, seed: int = 42) -> dict:
+    """A valid feed-forward queueing network with service rates summing to 1."""
+    queues = []
+    for i in range(n_queues):
+        if i + 2 < n_queues:
+            next_queue = [{"id": f"Q{i + 2}", "probability": 50.0}, {"id": f"Q{i + 3}", "probability": 50.0}]
+        elif i + 1 < n_queues:
+            next_queue = [{"id": f"Q{i + 2}", "probability": 100.0}]
+        else:
+            next_queue = [{"id": "External", "probability": 100.0}]
+        queues.append({"id": f"Q{i + 1}", "service_rate": None, "next_queue": next_queue})
+    network = {"system": {"lambda": None, "beta": None, "entry_points": "Q1",
+                          "constraint": {"service_rate_sum": 1.0}, "queues": queues}}
+    return data_generator.assign_service_rates(network, np.random.default_rng(seed))
+
+
+def _routing(network: dict) -> Dict[str, Dict[str, float]]:
+    # The analyzer's routing form: probabilities as fractions, External left out
+    return {q["id"]: {n["id"]: n["probability"] / 100.0 for n in q["next_queue"] if n["id"] != "External"}
+            for q in network["system"]["queues"]}
+
+
+def _timeline(time_points: int, n_queues: int = FIXED_QUEUES, seed: int = 42) -> List[dict]:
+    """Rows in generate_data's shape, built with numpy so large sizes are cheap to set up."""
+    rng = np.random.default_rng(seed)
+    lambdas = rng.uniform(0.05, 0.15, time_points)
+    ids = [f"Q{i + 1}" for i in range(n_queues)]
+    delays = rng.uniform(1.0, 10.0, (time_points, n_queues))
+    return [{"time": t + 1, "lambda_main": float(lambdas[t]),
+             "queue_lambdas": {q: float(lambdas[t]) for q in ids},
+             "delays": {q: float(delays[t, j]) for j, q in enumerate(ids)}}
+            for t in range(time_points)]
+
+
+def _fit_data(time_points: int, seed: int = 42):
+    """Arrival rates and M/M/1 delays (with noise) for FIXED_QUEUES queues, as analyzer.run stacks them."""
+    rng = np.random.default_rng(seed)
+    mu = np.array([0.2, 0.45, 0.35])[:FIXED_QUEUES]
+    lam = np.tile(rng.uniform(0.02, 0.15, time_points), FIXED_QUEUES)
+    idx = np.repeat(np.arange(FIXED_QUEUES), time_points)
+    delays = 1.0 / (mu[idx] - lam) * rng.normal(1.0, 0.01, lam.size)
+    return lam, idx, delays
+
+
+def _setup_generate_data(queues: int, time_points: int, scratch: Path):
+    network = synthetic_network(queues)
+    p = settings.get_dev_settings().data_generation
+
+    def run():
+        return data_generator.generate_data(network, time_points, p.starting_main_lambda, p.k, p.alpha, p.C,
+                                            p.gaussian_mean, p.gaussian_std, verbose=False,
+                                            rng=np.random.default_rng(0))
+    return run
+
+
+def _setup_compute_queue_lambdas(queues: int, time_points: int, scratch: Path):
+    network = synthetic_network(queues)
+    return lambda: data_generator.compute_queue_lambdas(0.1, network["system"]["queues"], "Q1")
+
+
+def _setup_combined_delay(queues: int, time_points: int, scratch: Path):
+    lam, idx, _ = _fit_data(time_points)
+    return lambda: analyzer.combined_delay((lam, idx), 0.2, 0.45, 0.35)
+
+
+def _setup_curve_fit(queues: int, time_points: int, scratch: Path):
+    lam, idx, delays = _fit_data(time_points)
+    p0 = [float(np.max(lam + 1.0 / delays))] * FIXED_QUEUES
+    return lambda: curve_fit(analyzer.combined_delay, (lam, idx), delays, p0=p0, maxfev=20000)
+
+
+def _setup_find_max_capacity(queues: int, time_points: int, scratch: Path):
+    network = synthetic_network(queues)
+    mu = {q["id"]: 1.0 for q in network["system"]["queues"]}
+    routing = _routing(network)
+    return lambda: analyzer.find_max_capacity(mu, routing, "Q1")
+
+
+def _setup_validate_json(queues: int, time_points: int, scratch: Path):
+    path = scratch / f"network_{queues}.json"
+    with open(path, "w") as f:
+        json.dump(synthetic_network(queues), f)
+    schema = settings.get_dev_settings().paths.queueing_network_schema
+    data_conversion.get_validator(schema)  # compile outside the timing, as in a long-running process
+    return lambda: data_conversion.validate_json(path, schema)
+
+
+def _setup_enforce(queues: int, time_points: int, scratch: Path):
+    network = synthetic_network(queues)
+    # enforce may fill in defaults, so each run gets a fresh copy (the copy is timed too)
+    return lambda: validation.enforce(copy.deepcopy(network))
+
+
+def _setup_csv_roundtrip(queues: int, time_points: int, scratch: Path):
+    timeline = _timeline(time_points)
+    path = scratch / f"timeline_{time_points}.csv"
+
+    def run():
+        data_generator.convert_data_to_csv(timeline, path)
+        return pd.read_csv(path)
+    return run
+
+
+BENCHMARKS = [
+    Benchmark("generate_data", ("queues", "time_points"), lambda q, t: 2 * q * t, _setup_generate_data),
+    Benchmark("compute_queue_lambdas", ("queues",), lambda q, t: q, _setup_compute_queue_lambdas),
+    Benchmark("combined_delay", ("time_points",), lambda q, t: FIXED_QUEUES * t, _setup_combined_delay),
+    # Each fit evaluates combined_delay a few dozen times
+    Benchmark("curve_fit", ("time_points",), lambda q, t: 50 * FIXED_QUEUES * t, _setup_curve_fit),
+    # About 1/0.01 capacity steps, each propagating through every queue
+    Benchmark("find_max_capacity", ("queues",), lambda q, t: 200 * q, _setup_find_max_capacity),
+    Benchmark("validate_json", ("queues",), lambda q, t: 80 * q, _setup_validate_json),
+    Benchmark("enforce", ("queues",), lambda q, t: 10 * q, _setup_enforce),
+    Benchmark("csv_roundtrip", ("time_points",), lambda q, t: 10 * FIXED_QUEUES * t, _setup_csv_roundtrip),
+]
+
+
+def _cases(benchmark: Benchmark, preset: dict) -> Iterable[Tuple[int, int]]:
+    queues = preset["queues"] if "queues" in benchmark.axes else (FIXED_QUEUES,)
+    time_points = preset["time_points"] if "time_points" in benchmark.axes else (None,)
+    for q in queues:
+        for t in time_points:
+            yield q, t
+
+
+def _params(queues: int, time_points: Optional[int]) -> dict:
+    params = {"queues": queues}
+    if time_points is not None:
+        params["time_points"] = time_points
+    return params
+
+
+def _case_key(result: dict) -> Tuple:
+    return (result["benchmark"],) + tuple(sorted(result["params"].items()))
+
+
+def _time(call: Callable[[], object], repeat: int, max_seconds: float) -> List[float]:
+    """Run call up to `repeat` times, stopping early once max_seconds have been spent."""
+    times = []
+    while len(times) < repeat:
+        start = time.perf_counter()
+        call()
+        times.append(time.perf_counter() - start)
+        if sum(times) >= max_seconds:
+            break
+    return times
+
+
+def _git(*args: str) -> Optional[str]:
+    try:
+        out = subprocess.run(["git", *args], cwd=Path(__file__).resolve().parent.parent,
+                             capture_output=True, text=True, timeout=30)
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return out.stdout.strip() if out.returncode == 0 else None
+
+
+# ----------------------------
+# Public
+# ----------------------------
+def machine_metadata() -> dict:
+    """Where and on what code the benchmarks ran."""
+    import jsonschema
+    import scipy
+
+    status = _git("status", "--porcelain", "--untracked-files=no")
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "commit": _git("rev-parse", "HEAD"),
+        "dirty": bool(status) if status is not None else None,
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "processor": platform.processor() or platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "python": platform.python_version(),
+        "libraries": {"numpy": np.__version__, "pandas": pd.__version__, "scipy": scipy.__version__,
+                      "jsonschema": getattr(jsonschema, "__version__", None)},
+    }
+
+
+def run_suite(preset: str = "quick", only: Optional[List[str]] = None, repeat: int = 5,
+              max_seconds: float = 10.0, verbose: bool = True) -> dict:
+    """
+    Time every benchmark over the sizes of a preset.
+
+    Args:
+        preset (str): "quick" or "full" (see PRESETS).
+        only (list[str]): Benchmark names to run (default: all).
+        repeat (int): Runs per case; the median and minimum are kept.
+        max_seconds (float): Stop repeating a case once this much time has been spent on it.
+        verbose (bool): Print each case as it finishes.
+
+    Returns:
+        dict: {"metadata": ..., "results": [{"benchmark", "params", "median_s", "min_s", "runs"}
+        or {"benchmark", "params", "skipped"}, ...]}
+
+    Raises:
+        ValueError: If the preset or a benchmark name is unknown.
+    """
+    if preset not in PRESETS:
+        raise ValueError(f"unknown preset {preset!r} (choose from {', '.join(PRESETS)})")
+    names = [b.name for b in BENCHMARKS]
+    unknown = sorted(set(only or []) - set(names))
+    if unknown:
+        raise ValueError(f"unknown benchmark(s): {', '.join(unknown)} (choose from {', '.join(names)})")
+
+    sizes = PRESETS[preset]
+    metadata = machine_metadata()
+    metadata.update(preset=preset, repeat=repeat)
+    results = []
+    with tempfile.TemporaryDirectory() as scratch:
+        for benchmark in BENCHMARKS:
+            if only and benchmark.name not in only:
+                continue
+            for queues, time_points in _cases(benchmark, sizes):
+                params = _params(queues, time_points)
+                cost = benchmark.cost(queues, time_points or 1)
+                if cost > sizes["budget"]:
+                    results.append({"benchmark": benchmark.name, "params": params,
+                                    "skipped": f"estimated work {cost:.0e} over budget {sizes['budget']:.0e}"})
+                    continue
+                call = benchmark.setup(queues, time_points or 1, Path(scratch))
+                times = _time(call, repeat, max_seconds)
+                result = {"benchmark": benchmark.name, "params": params, "median_s": statistics.median(times),
+                          "min_s": min(times), "runs": len(times)}
+                results.append(result)
+                if verbose:
+                    print(format_result(result), flush=True)
+    return {"metadata": metadata, "results": results}
+
+
+def format_result(result: dict) -> str:
+    params = " ".join(f"{k}={v}" for k, v in result["params"].items())
+    if "skipped" in result:
+        return f"{result['benchmark']:<22} {params:<32} skipped ({result['skipped']})"
+    return (f"{result['benchmark']:<22} {params:<32} median {result['median_s'] * 1000:10.3f} ms  "
+            f"min {result['min_s'] * 1000:10.3f} ms  ({result['runs']} runs)")
+
+
+def save_results(report: dict, out_path: Optional[Path] = None) -> Path:
+    """Write a run to out_path, or to benchmark_dir as <commit>[-dirty].json."""
+    if out_path is None:
+        commit = (report["metadata"].get("commit") or "unknown")[:12]
+        suffix = "-dirty" if report["metadata"].get("dirty") else ""
+        out_path = settings.get_dev_settings().paths.benchmark_dir / f"{commit}{suffix}.json"
+    out_path = Path(out_path)
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(out_path, "w") as f:
+        json.dump(report, f, indent=2)
+    return out_path
+
+
+def load_results(path) -> dict:
+    with open(path) as f:
+        return json.load(f)
+
+
+def compare(baseline: dict, current: dict, threshold: float = 0.10, noise_floor: float = 0.001) -> dict:
+    """
+    Match the cases of two runs and classify each change in median time.
+
+    Args:
+        baseline (dict): The earlier run (e.g. from load_results).
+        current (dict): The later run.
+        threshold (float): Relative slowdown above which a case is a regression
+            (0.10 = 10% slower); a speedup of the same factor is an improvement.
+        noise_floor (float): Cases faster than this many seconds in both runs are
+            never flagged, since their timings are mostly noise.
+
+    Returns:
+        dict: {"rows": [{"benchmark", "params", "baseline_s", "current_s", "ratio", "status"}],
+        "regressions": count, "machine_mismatch": [differing metadata keys]}
+    """
+    old = {_case_key(r): r for r in baseline["results"] if "median_s" in r}
+    new = {_case_key(r): r for r in current["results"] if "median_s" in r}
+    rows = []
+    for key in sorted(old.keys() | new.keys()):
+        before, after = old.get(key), new.get(key)
+        result = before or after
+        row = {"benchmark": result["benchmark"], "params": result["params"],
+               "baseline_s": before["median_s"] if before else None,
+               "current_s": after["median_s"] if after else None, "ratio": None}
+        if before is None or after is None:
+            row["status"] = "new" if before is None else "missing"
+        else:
+            row["ratio"] = after["median_s"] / before["median_s"] if before["median_s"] > 0 else None
+            if max(before["median_s"], after["median_s"]) < noise_floor or row["ratio"] is None:
+                row["status"] = "ok"
+            elif row["ratio"] > 1 + threshold:
+                row["status"] = "regression"
+            elif row["ratio"] < 1 / (1 + threshold):
+                row["status"] = "improvement"
+            else:
+                row["status"] = "ok"
+        rows.append(row)
+
+    mismatch = [k for k in MACHINE_KEYS if baseline["metadata"].get(k) != current["metadata"].get(k)]
+    return {"rows": rows, "regressions": sum(1 for r in rows if r["status"] == "regression"),
+            "machine_mismatch": mismatch}
+
+
+def format_comparison(comparison: dict, baseline: dict, current: dict) -> str:
+    def label(report):
+        meta = report["metadata"]
+        return f"{(meta.get('commit') or 'unknown')[:12]}{' (dirty)' if meta.get('dirty') else ''}"
+
+    lines = [f"baseline {label(baseline)} -> current {label(current)}"]
+    if comparison["machine_mismatch"]:
+        lines.append(f"warning: runs differ in {', '.join(comparison['machine_mismatch'])}; timings may not be comparable")
+    for row in comparison["rows"]:
+        params = " ".join(f"{k}={v}" for k, v in row["params"].items())
+        if row["ratio"] is None:
+            lines.append(f"{row['status']:<12} {row['benchmark']:<22} {params}")
+            continue
+        lines.append(f"{row['status']:<12} {row['benchmark']:<22} {params:<32} "
+                     f"{row['baseline_s'] * 1000:10.3f} ms -> {row['current_s'] * 1000:10.3f} ms  x{row['ratio']:.2f}")
+    lines.append(f"{comparison['regressions']} regression(s)")
+    return "\n".join(lines)
@@ -0,0 +1,198 @@
+'''
+Bulk translation of written system descriptions to system-description JSON.
+
+Descriptions are read from files or directories:
+    - a .txt/.md file holds one description, or several separated by lines
+      containing only ---
+    - a .jsonl file holds one {"name": ..., "description": ...} per line
+    - a directory contributes every .txt, .md and .jsonl file in it
+
+Each description goes through the same ask/validate/repair loop as
+ollama_input.generate_sys_desc, over one ollama.AsyncClient. A semaphore
+keeps at most `parallelism` requests in flight, which should match the
+model server's parallelism (OLLAMA_NUM_PARALLEL); the batch then takes
+about N / parallelism model calls instead of N. Valid documents are
+written to system_description_dir as <name>.json. With [generation]
+warm_up on, the model is loaded before the batch starts, so the load is
+paid once up front rather than by the first `parallelism` requests.
+'''
+
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Iterable, List, Optional, Tuple
+import asyncio
+import json
+import re
+import time
+
+from ollama import AsyncClient
+
+from program_files import ollama_input, settings
+
+TEXT_SUFFIXES = (".txt", ".md")
+_SEPARATOR = re.compile(r"^\s*---\s*$", re.MULTILINE)
+
+# (name, description text)
+Description = Tuple[str, str]
+
+
+@dataclass
+class IngestResult:
+    name: str
+    path: Optional[str] = None
+    attempts: int = 0
+    seconds: float = 0.0
+    error: Optional[str] = None
+
+
+@dataclass
+class IngestSummary:
+    results: List[IngestResult] = field(default_factory=list)
+    seconds: float = 0.0
+    parallelism: int = 1
+    warmup_seconds: Optional[float] = None
+
+    @property
+    def succeeded(self) -> List[IngestResult]:
+        return [r for r in self.results if r.error is None]
+
+    @property
+    def failed(self) -> List[IngestResult]:
+        return [r for r in self.results if r.error is not None]
+
+    @property
+    def throughput(self) -> float:
+        """Descriptions finished per second (valid or not)."""
+        return len(self.results) / self.seconds if self.seconds > 0 else 0.0
+
+    @property
+    def attempts_per_valid_document(self) -> Optional[float]:
+        valid = len(self.succeeded)
+        return sum(r.attempts for r in self.results) / valid if valid else None
+
+    def format(self) -> str:
+        lines = [
+            f"{len(self.succeeded)}/{len(self.results)} descriptions ingested in {self.seconds:.2f}s "
+            f"({self.throughput:.2f}/s, parallelism {self.parallelism})",
+        ]
+        if self.warmup_seconds is not None:
+            lines.append(f"model warm-up {self.warmup_seconds:.2f}s")
+        if self.results:
+            mean = sum(r.seconds for r in self.results) / len(self.results)
+            lines.append(f"mean time per description {mean:.2f}s")
+        if self.attempts_per_valid_document is not None:
+            lines.append(f"attempts per valid document {self.attempts_per_valid_document:.2f}")
+        for r in self.failed:
+            lines.append(f"failed {r.name}: {r.error}")
+        return "\n".join(lines)
+
+
+# ----------------------------
+# Helpers
+# ----------------------------
+def _read_text(path: Path) -> List[Description]:
+    parts = [p.strip() for p in _SEPARATOR.split(path.read_text(encoding="utf-8"))]
+    parts = [p for p in parts if p]
+    if len(parts) == 1:
+        return [(path.stem, parts[0])]
+    return [(f"{path.stem}-{i}", part) for i, part in enumerate(parts, start=1)]
+
+
+def _read_jsonl(path: Path) -> List[Description]:
+    descriptions = []
+    with open(path, encoding="utf-8") as f:
+        for lineno, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            descriptions.append((str(entry.get("name") or f"{path.stem}-{lineno}"), entry["description"]))
+    return descriptions
+
+
+def _read_file(path: Path) -> List[Description]:
+    if path.suffix == ".jsonl":
+        return _read_jsonl(path)
+    return _read_text(path)
+
+
+# ----------------------------
+# Public
+# ----------------------------
+def read_descriptions(paths: Iterable[str]) -> List[Description]:
+    """
+    Collect (name, description) pairs from files and directories.
+
+    Raises:
+        ValueError: If two descriptions would be written to the same name.
+    """
+    descriptions = []
+    for path in paths:
+        path = Path(path)
+        if path.is_dir():
+            files = sorted(p for p in path.iterdir() if p.suffix in TEXT_SUFFIXES + (".jsonl",))
+        else:
+            files = [path]
+        for file in files:
+            descriptions.extend(_read_file(file))
+
+    names = [name for name, _ in descriptions]
+    duplicates = sorted({n for n in names if names.count(n) > 1})
+    if duplicates:
+        raise ValueError(f"duplicate description names: {', '.join(duplicates)}")
+    return descriptions
+
+
+async def ingest(descriptions: List[Description], parallelism: Optional[int] = None,
+                 out_dir: Optional[Path] = None, client: Optional[AsyncClient] = None,
+                 max_attempts: Optional[int] = None) -> IngestSummary:
+    """
+    Translate descriptions concurrently, at most `parallelism` at a time.
+
+    Args:
+        descriptions (list[tuple[str, str]]): (name, text) pairs, e.g. from read_descriptions.
+        parallelism (int): Concurrent model requests (default: [generation] parallelism).
+        out_dir (Path): Output directory (default: system_description_dir).
+        client (AsyncClient): Ollama client to share (default: a new one).
+        max_attempts (int): Attempts per description (default: [generation] max_attempts).
+
+    Returns:
+        IngestSummary: Per-description results, in input order, and batch timing.
+    """
+    dev = settings.get_dev_settings()
+    parallelism = parallelism or dev.generation.parallelism
+    out_dir = Path(out_dir) if out_dir is not None else dev.paths.system_description_dir
+    client = client if client is not None else AsyncClient()
+    semaphore = asyncio.Semaphore(parallelism)
+
+    async def one(name: str, text: str) -> IngestResult:
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                result = await ollama_input.generate_sys_desc_async(
+                    text, client, max_attempts=max_attempts, out_dir=out_dir, name=name)
+            except Exception as e:
+                return IngestResult(name, seconds=time.perf_counter() - start, error=f"{type(e).__name__}: {e}")
+            seconds = time.perf_counter() - start
+            if result.path is None:
+                return IngestResult(name, None, result.attempts, seconds, "; ".join(result.errors) or "no valid JSON")
+            return IngestResult(name, result.path, result.attempts, seconds)
+
+    warmup_seconds = None
+    if dev.generation.warm_up and descriptions:
+        start = time.perf_counter()
+        try:
+            await client.generate(model=ollama_input.MODEL, keep_alive=ollama_input.keep_alive_setting())
+            warmup_seconds = time.perf_counter() - start
+        except Exception:
+            # The first requests will load the model instead
+            pass
+
+    start = time.perf_counter()
+    results = await asyncio.gather(*(one(name, text) for name, text in descriptions))
+    return IngestSummary(list(results), time.perf_counter() - start, parallelism, warmup_seconds)
+
+
+def ingest_paths(paths: Iterable[str], parallelism: Optional[int] = None,
+                 out_dir: Optional[Path] = None, max_attempts: Optional[int] = None) -> IngestSummary:
+    """Synchronous entry point: read descriptions from paths and ingest them."""
+    return asyncio.run(ingest(read_descriptions(paths), parallelism, out_dir, max_attempts=max_attempts))
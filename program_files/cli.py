@@ -0,0 +1,375 @@
+'''
+Non-interactive command line interface for the stress testing pipeline.
+
+    python main.py convert data/system-description/*.json
+    python main.py validate data/queueing-network/*.json
+    python main.py generate data/queueing-network/*.json --jobs 4
+    python main.py analyze linear_queue_data.csv --no-plot
+    python main.py pipeline data/system-description/*.json --jobs 4 --set data_generation.time_points=500
+    python main.py ingest descriptions/ --parallel 4
+    python main.py bench --preset quick
+    python main.py topology powerlaw --size 1000000 --out data/queueing-network/powerlaw_1m.json
+    python main.py bench-compare data/benchmarks/<old>.json data/benchmarks/<new>.json
+
+The pipeline command runs as a DAG with cached stage artifacts (see
+program_files/pipeline.py) and ingest sends many text descriptions to the
+model concurrently (see program_files/bulk_ingest.py); bench and
+bench-compare time program_files itself and flag slowdowns between
+commits (see program_files/benchmark.py); topology writes synthetic
+networks of any size for scale testing (see program_files/topology.py);
+the other commands run once per input.
+Every subcommand takes explicit paths, accepts many inputs at once, can fan
+out across processes with --jobs, and exits with 0 when every input
+succeeded, 1 when any input failed and 2 on bad arguments or config.
+'''
+
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import redirect_stdout
+from pathlib import Path
+from typing import Callable, List, Optional, Tuple
+import argparse
+import io
+import json
+import os
+import sys
+
+from program_files import config, data_conversion, settings, validation
+
+EXIT_OK = 0
+EXIT_FAILED = 1
+EXIT_USAGE = 2
+
+# (input, output, error) for each processed input
+Result = Tuple[str, Optional[str], Optional[str]]
+
+
+# ----------------------------
+# Helpers
+# ----------------------------
+def _doc_kind(doc: dict) -> str:
+    """'queue' for a queueing network document, 'system' for a system description."""
+    if "system" in doc:
+        return "queue"
+    if "system_description" in doc:
+        return "system"
+    raise ValueError("not a queueing network or system description document")
+
+
+def _out_path(out_dir: Optional[str], default_dir_key: str, name: str) -> Path:
+    """Output path named after the input, so parallel runs never collide."""
+    base = Path(out_dir) if out_dir else Path(config.get_config("dev_config.ini").get("paths", default_dir_key))
+    base.mkdir(parents=True, exist_ok=True)
+    return base / name
+
+
+def _quiet(fn: Callable, *args, **kwargs):
+    """Run fn with its progress printing swallowed (used for --quiet and workers)."""
+    with redirect_stdout(io.StringIO()):
+        return fn(*args, **kwargs)
+
+
+def _init_worker(overrides: List[str]) -> None:
+    # Overrides live in process memory, so re-apply them in every worker,
+    # env before --set as in compile_settings
+    settings.apply_env_overrides()
+    settings.apply_cli_overrides(overrides)
+
+
+def _run_task(item: str, args) -> Result:
+    """Run args.task for one input, turning an exception into an error result."""
+    try:
+        if args.quiet or args.jobs > 1:
+            output = _quiet(args.task, item, args)
+        else:
+            output = args.task(item, args)
+        return (item, output, None)
+    except Exception as e:
+        return (item, None, f"{type(e).__name__}: {e}")
+
+
+def _run_all(inputs: List[str], args) -> List[Result]:
+    """Run args.task for every input, in a process pool when --jobs > 1."""
+    if args.jobs <= 1 or len(inputs) <= 1:
+        return [_run_task(item, args) for item in inputs]
+
+    with ProcessPoolExecutor(
+        max_workers=min(args.jobs, len(inputs)),
+        initializer=_init_worker,
+        initargs=(args.set,),
+    ) as pool:
+        return list(pool.map(_run_task, inputs, [args] * len(inputs)))
+
+
+def _report(results: List[Result], as_json: bool) -> int:
+    failed = [r for r in results if r[2] is not None]
+    if as_json:
+        print(json.dumps([{"input": i, "output": o, "error": e} for i, o, e in results], indent=2))
+    else:
+        for item, output, error in results:
+            if error is None:
+                print(f"ok     {item} -> {output}")
+            else:
+                print(f"error  {item}: {error}", file=sys.stderr)
+        print(f"{len(results) - len(failed)}/{len(results)} succeeded", file=sys.stderr)
+    return EXIT_FAILED if failed else EXIT_OK
+
+
+# ----------------------------
+# Tasks (module level so they can be pickled for the process pool)
+# ----------------------------
+def _convert(item: str, args) -> str:
+    with open(item) as f:
+        kind = _doc_kind(json.load(f))
+    stem = Path(item).stem
+    if kind == "system":
+        out = _out_path(args.out_dir, "queueing_network_dir", f"queueing_network_{stem}.json")
+        return data_conversion.system_to_queue(item, out_path=str(out))
+    out = _out_path(args.out_dir, "system_description_dir", f"system_description_{stem}.json")
+    return data_conversion.queue_to_system(item, out_path=str(out))
+
+
+def _validate(item: str, args) -> str:
+    with open(item) as f:
+        doc = json.load(f)
+    cfg = config.get_config("dev_config.ini")
+    kind = _doc_kind(doc)
+    schema = args.schema or cfg.get("paths", "queueing_network_schema" if kind == "queue" else "system_description_schema")
+
+    errors = data_conversion.validate_json(item, schema)
+    if not errors and kind == "queue":
+        result = validation.enforce(doc)
+        errors = result.get("errors", [])
+    if errors:
+        raise ValueError("; ".join(errors))
+    return "valid"
+
+
+def _generate(item: str, args) -> str:
+    from program_files import data_generator
+    out = _out_path(args.out_dir, "processed_data_dir", f"{Path(item).stem}_data.csv")
+    return data_generator.run(item, out_path=str(out), verbose=False)
+
+
+def _analyze(item: str, args) -> str:
+    from program_files import analyzer
+    plot_path = None
+    if args.plot_dir:
+        Path(args.plot_dir).mkdir(parents=True, exist_ok=True)
+        plot_path = str(Path(args.plot_dir) / f"{Path(item).stem}_fit.png")
+    summary = analyzer.run(item, show_plot=args.plot, plot_path=plot_path)
+    return f"max λ_main {summary['max_lambda']:.4f}, bottleneck {summary['bottleneck']}"
+
+
+def _run_pipeline(inputs: List[str], args) -> List[Result]:
+    """Run every input through the cached DAG pipeline, --jobs stages at a time."""
+    from program_files import analyzer, pipeline
+    pipe = pipeline.build_pipeline(inputs, use_cache=args.cache)
+    if args.quiet:
+        stage_results = _quiet(pipe.run, max_workers=args.jobs)
+    else:
+        stage_results = pipe.run(max_workers=args.jobs)
+        print(pipeline.format_timings(stage_results))
+
+    results, plots = [], []
+    for item in inputs:
+        stem = Path(item).stem
+        analysis = stage_results[f"analyze/{stem}"]
+        if analysis.error:
+            # Report the stage that actually failed, not the ones skipped after it
+            branch = [stage_results[f"{stage}/{stem}"] for stage in ("convert", "generate", "analyze")]
+            failed = next(r for r in branch if r.error and not r.error.startswith("skipped"))
+            results.append((item, None, f"{failed.name}: {failed.error}"))
+            continue
+        with open(analysis.output) as f:
+            summary = json.load(f)
+        output = f"{analysis.output} (max λ_main {summary['max_lambda']:.4f}, bottleneck {summary['bottleneck']})"
+        results.append((item, output, None))
+        if args.plot:
+            # Stages ran on worker threads; plots saved there are shown here, on the main thread
+            plots.append(pipeline.extra_path(analysis.output, pipeline.PLOT_SUFFIX))
+
+    for plot_path in plots:
+        analyzer.show_saved_plot(str(plot_path))
+    return results
+
+
+def _run_ingest(inputs: List[str], args) -> List[Result]:
+    """Translate text descriptions to system descriptions, --parallel model requests at a time."""
+    from program_files import bulk_ingest
+    summary = bulk_ingest.ingest_paths(inputs, parallelism=args.parallel, out_dir=args.out_dir)
+    if not args.quiet:
+        print(summary.format(), file=sys.stderr)
+    return [(r.name, r.path, r.error) for r in summary.results]
+
+
+def _run_topology(args) -> int:
+    from program_files import topology
+    try:
+        path = topology.generate(args.shape, args.size, out_path=args.out, fmt=args.format,
+                                 branching=args.branching, fan_in=args.fan_in, width=args.width,
+                                 degree=args.degree, exponent=args.exponent, exit_share=args.exit_share,
+                                 seed=args.seed)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return EXIT_USAGE
+    if path != "-":
+        print(path)
+    return EXIT_OK
+
+
+def _run_bench(args) -> int:
+    from program_files import benchmark
+    try:
+        report = benchmark.run_suite(args.preset, only=args.only, repeat=args.repeat,
+                                     max_seconds=args.max_seconds, verbose=not args.json)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return EXIT_USAGE
+    path = benchmark.save_results(report, args.out)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print(f"results written to {path}", file=sys.stderr)
+    return EXIT_OK
+
+
+def _run_bench_compare(args) -> int:
+    from program_files import benchmark
+    try:
+        baseline, current = benchmark.load_results(args.baseline), benchmark.load_results(args.current)
+    except (OSError, ValueError) as e:
+        print(e, file=sys.stderr)
+        return EXIT_USAGE
+    comparison = benchmark.compare(baseline, current, threshold=args.threshold)
+    if args.json:
+        print(json.dumps(comparison, indent=2))
+    else:
+        print(benchmark.format_comparison(comparison, baseline, current))
+    return EXIT_FAILED if comparison["regressions"] else EXIT_OK
+
+
+# ----------------------------
+# Public
+# ----------------------------
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="main.py", description="IBM stress testing pipeline")
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("inputs", nargs="+", help="input files")
+    common.add_argument("-j", "--jobs", type=int, default=1, help="worker processes (default: 1)")
+    common.add_argument("--set", action="append", default=[], metavar="SECTION.KEY=VALUE",
+                        help="override a dev_config.ini value in memory (repeatable)")
+    common.add_argument("-q", "--quiet", action="store_true", help="suppress per-stage progress output")
+    common.add_argument("--json", action="store_true", help="print results as JSON")
+
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("convert", parents=[common], help="system description <-> queueing network")
+    p.add_argument("--out-dir", help="output directory (default: from dev_config.ini)")
+    p.set_defaults(task=_convert)
+
+    p = sub.add_parser("validate", parents=[common], help="validate documents against their schema")
+    p.add_argument("--schema", help="schema to use (default: detected from the document)")
+    p.set_defaults(task=_validate)
+
+    p = sub.add_parser("generate", parents=[common], help="generate synthetic data for queueing networks")
+    p.add_argument("--out-dir", help="output directory (default: processed_data_dir)")
+    p.set_defaults(task=_generate)
+
+    p = sub.add_parser("analyze", parents=[common], help="fit and analyze processed CSV data")
+    p.add_argument("--plot", action=argparse.BooleanOptionalAction, default=False, help="show the fit plot")
+    p.add_argument("--plot-dir", help="save fit plots to this directory")
+    p.set_defaults(task=_analyze)
+
+    p = sub.add_parser("pipeline", parents=[common], help="system description -> queue network -> data -> analysis")
+    p.add_argument("--plot", action=argparse.BooleanOptionalAction, default=False,
+                   help="show each fit plot once the pipeline has finished")
+    p.add_argument("--cache", action=argparse.BooleanOptionalAction, default=True,
+                   help="reuse stage outputs whose inputs are unchanged (default: on)")
+    p.set_defaults(task=None)
+
+    p = sub.add_parser("ingest", parents=[common], help="text descriptions -> system descriptions via the model")
+    p.add_argument("--parallel", type=int, help="concurrent model requests (default: [generation] parallelism)")
+    p.add_argument("--out-dir", help="output directory (default: system_description_dir)")
+    p.set_defaults(task=None)
+
+    # The topology and benchmark commands take no input documents, so they do not share `common`
+    p = sub.add_parser("topology", help="write a synthetic queueing network or system description")
+    p.add_argument("shape", choices=["chain", "tree", "layered", "random", "powerlaw"])
+    p.add_argument("--size", type=int, required=True, help="number of queues")
+    p.add_argument("--format", choices=["queue", "system"], default="queue",
+                   help="queueing network or system description (default: queue)")
+    p.add_argument("--out", help="output file, - for stdout (default: <shape>_<size>.json in the data directory)")
+    p.add_argument("--branching", type=int, default=2, help="tree: children per queue (default: 2)")
+    p.add_argument("--fan-in", action="store_true", help="tree: merge the leaves back into one exit queue")
+    p.add_argument("--width", type=int, default=10, help="layered: queues per layer (default: 10)")
+    p.add_argument("--degree", type=float, default=3.0,
+                   help="layered: edges per queue; random: mean out-degree (default: 3)")
+    p.add_argument("--exponent", type=float, default=2.5, help="powerlaw: degree exponent, > 2 (default: 2.5)")
+    p.add_argument("--exit-share", type=float, default=0.1,
+                   help="random, powerlaw: share of each queue's traffic leaving the network (default: 0.1)")
+    p.add_argument("--seed", type=int, default=42)
+
+    p = sub.add_parser("bench", help="time program_files hot paths and save the results")
+    p.add_argument("--preset", default="quick", help="sizes to run: quick or full (default: quick)")
+    p.add_argument("--only", action="append", metavar="NAME", help="run only this benchmark (repeatable)")
+    p.add_argument("--repeat", type=int, default=5, help="runs per case (default: 5)")
+    p.add_argument("--max-seconds", type=float, default=10.0, help="stop repeating a case after this long")
+    p.add_argument("--out", help="results file (default: benchmark_dir/<commit>.json)")
+    p.add_argument("--json", action="store_true", help="print results as JSON")
+
+    p = sub.add_parser("bench-compare", help="compare two benchmark results and flag regressions")
+    p.add_argument("baseline", help="earlier results file")
+    p.add_argument("current", help="later results file")
+    p.add_argument("--threshold", type=float, default=0.10,
+                   help="relative slowdown counted as a regression (default: 0.10)")
+    p.add_argument("--json", action="store_true", help="print the comparison as JSON")
+
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.command == "topology":
+        return _run_topology(args)
+    if args.command == "bench":
+        if args.repeat < 1:
+            parser.error("--repeat must be at least 1")
+        return _run_bench(args)
+    if args.command == "bench-compare":
+        # Exits with 1 when any case regressed, so it can gate a commit or CI job
+        return _run_bench_compare(args)
+    if args.jobs < 1:
+        parser.error("--jobs must be at least 1")
+    if args.command == "analyze" and args.jobs > 1 and args.plot:
+        parser.error("--plot cannot be combined with --jobs")
+    if getattr(args, "parallel", None) is not None and args.parallel < 1:
+        parser.error("--parallel must be at least 1")
+    if args.json:
+        # Keep stdout parseable
+        args.quiet = True
+
+    # Fail fast on bad config before any expensive work
+    try:
+        settings.compile_settings(args.set, include_user=False)
+    except settings.SettingsError as e:
+        print(e, file=sys.stderr)
+        return EXIT_USAGE
+
+    inputs = [os.path.abspath(i) if os.path.exists(i) else i for i in args.inputs]
+    if args.command == "pipeline":
+        # Stages run as one DAG (threads), so branches share cached artifacts
+        try:
+            results = _run_pipeline(inputs, args)
+        except (FileNotFoundError, ValueError) as e:
+            print(e, file=sys.stderr)
+            return EXIT_USAGE
+    elif args.command == "ingest":
+        try:
+            results = _run_ingest(inputs, args)
+        except (FileNotFoundError, ValueError) as e:
+            print(e, file=sys.stderr)
+            return EXIT_USAGE
+    else:
+        results = _run_all(inputs, args)
+    return _report(results, args.json)
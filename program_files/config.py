@@ -1,11 +1,34 @@
 from configparser import ConfigParser, ExtendedInterpolation
+from contextlib import contextmanager
+from dataclasses import dataclass
 from pathlib import Path
+from types import MappingProxyType
 from program_files.user_input import UserInput
-from typing import List
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Tuple
+import os
+import tempfile
+import threading
 
 # ----------------------------
 # Helpers
 # ----------------------------
+# Serializes writers inside this process; _config_lock adds a file lock for other processes
+_thread_lock = threading.Lock()
+
+# Parsed configs keyed by file name, reused until the file on disk changes
+_cache: Dict[str, "_CachedConfig"] = {}
+_cache_lock = threading.RLock()
+
+# In-memory (section -> key -> value) overrides layered over each file
+_overrides: Dict[str, Dict[str, Dict[str, str]]] = {}
+
+
+@dataclass
+class _CachedConfig:
+    signature: Tuple[int, int]
+    cfg: ConfigParser
+    views: Dict[Any, Any]
+
 def _project_root() -> Path:
     """Absolute path to the project root (parent of program_files/)."""
     return Path(__file__).resolve().parent.parent
@@ -23,6 +46,46 @@ def _load_config(config_name: str) -> ConfigParser:
     cfg.read(_config_path(config_name))
     return cfg
 
+def _file_signature(path: Path) -> Tuple[int, int]:
+    """(mtime_ns, size) of a file; a change in either triggers a reload."""
+    st = path.stat()
+    return (st.st_mtime_ns, st.st_size)
+
+def _apply_overrides(cfg: ConfigParser, config_name: str) -> None:
+    """Layer the in-memory overrides for config_name on top of the parsed file."""
+    for section, values in _overrides.get(config_name, {}).items():
+        if section not in cfg:
+            cfg.add_section(section)
+        for key, value in values.items():
+            cfg[section][key] = value
+
+def _cached_config(config_name: str) -> _CachedConfig:
+    """Return the cache entry for config_name, re-parsing only if the file changed."""
+    path = _config_path(config_name)
+    signature = _file_signature(path)
+    with _cache_lock:
+        entry = _cache.get(config_name)
+        if entry is None or entry.signature != signature:
+            cfg = _load_config(config_name)
+            _apply_overrides(cfg, config_name)
+            _normalize_paths(cfg)
+            entry = _CachedConfig(signature, cfg, {})
+            _cache[config_name] = entry
+        return entry
+
+def _copy_config(cfg: ConfigParser) -> ConfigParser:
+    """A private copy of a parsed config, so callers can't change the cached one."""
+    copy = ConfigParser(interpolation=ExtendedInterpolation())
+    copy.read_dict({section: dict(cfg.items(section, raw=True)) for section in cfg.sections()})
+    return copy
+
+def _invalidate(config_name: Optional[str] = None) -> None:
+    with _cache_lock:
+        if config_name is None:
+            _cache.clear()
+        else:
+            _cache.pop(config_name, None)
+
 def _normalize_paths(cfg: ConfigParser) -> None:
     """Normalize [paths] section entries to absolute paths from project root."""
     if "paths" not in cfg:
@@ -34,6 +97,102 @@ def _normalize_paths(cfg: ConfigParser) -> None:
             p = (root / p).resolve()
         cfg["paths"][key] = str(p)
 
+def _apply_updates(lines: List[str], pending: Dict[str, Dict[str, str]]) -> List[str]:
+    """Rewrite INI lines with every pending update applied in one pass."""
+    remaining = {section: dict(keys) for section, keys in pending.items()}
+    current_section = None
+    new_lines: List[str] = []
+
+    def flush_section():
+        # Append keys that never appeared inside the section we are leaving
+        keys = remaining.get(current_section)
+        if not keys:
+            return
+        if new_lines and not new_lines[-1].endswith("\n"):
+            new_lines[-1] += "\n"
+        for key, value in keys.items():
+            new_lines.append(f"{key} = {value}\n")
+        keys.clear()
+
+    for line in lines:
+        stripped = line.strip()
+
+        # Detect section headers
+        if stripped.startswith("[") and stripped.endswith("]"):
+            flush_section()
+            current_section = stripped[1:-1]
+            new_lines.append(line)
+            continue
+
+        keys = remaining.get(current_section)
+        if keys:
+            # Check if this line defines a pending key (with or without space around '=')
+            name = stripped.split("=", 1)[0].strip() if "=" in stripped else None
+            if name in keys and not stripped.startswith(("#", ";")):
+                new_lines.append(f"{name} = {keys.pop(name)}\n")
+                continue
+
+        new_lines.append(line)
+
+    flush_section()
+
+    # Sections that never existed are appended at the end
+    for section, keys in remaining.items():
+        if not keys:
+            continue
+        if new_lines and not new_lines[-1].endswith("\n"):
+            new_lines[-1] += "\n"
+        new_lines.append(f"\n[{section}]\n")
+        for key, value in keys.items():
+            new_lines.append(f"{key} = {value}\n")
+
+    return new_lines
+
+
+def _atomic_write(path: Path, lines: List[str]) -> None:
+    """Write to a temp file beside <path>, fsync it, then rename over <path>."""
+    fd, tmp_name = tempfile.mkstemp(prefix=f".{path.name}.", suffix=".tmp", dir=path.parent)
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.writelines(lines)
+            f.flush()
+            os.fsync(f.fileno())
+        # mkstemp creates 0600 files; keep the original permissions
+        os.chmod(tmp_name, path.stat().st_mode & 0o777)
+        os.replace(tmp_name, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_name)
+        except FileNotFoundError:
+            pass
+        raise
+
+
+@contextmanager
+def _config_lock(path: Path):
+    """
+    Exclusive inter-process lock for writers of <path>. Uses a sidecar
+    <name>.lock file so the lock survives the atomic rename of the config.
+    """
+    lock_path = path.with_name(f".{path.name}.lock")
+    with _thread_lock, open(lock_path, "a+b") as lock_file:
+        if os.name == "nt":
+            import msvcrt
+            lock_file.seek(0)
+            msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+            try:
+                yield
+            finally:
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
 # ----------------------------
 # Public
 # ----------------------------
@@ -41,77 +200,107 @@ def get_config(config_name: str) -> ConfigParser:
     """
     Load config/<config_name> and normalize [paths] entries to absolute paths.
     Relative paths are interpreted relative to the project root.
+
+    The parsed config is cached process-wide and only re-read when the file's
+    mtime or size changes. Each call returns a copy of the cached parser, so
+    .set() on it stays local; use set_override() for process-wide changes.
     """
-    cfg = _load_config(config_name)
-    _normalize_paths(cfg)
-    return cfg
+    return _copy_config(_cached_config(config_name).cfg)
 
 
-def set_config_value(config_name: str, section: str, key: str, value: str) -> None:
+def get_section(config_name: str, section: str) -> Mapping[str, str]:
+    """Immutable mapping of one section of config/<config_name>."""
+    return MappingProxyType(dict(_cached_config(config_name).cfg[section]))
+
+
+def set_override(config_name: str, section: str, key: str, value: Any) -> None:
     """
-    Update a value in config/<config_name> while preserving existing comments
-    and formatting. Creates the section/key if they don't exist.
+    Override a value in memory only; get_config() and the typed settings see
+    it but the file on disk is left untouched (useful for parameter sweeps).
     """
-    path = _config_path(config_name)
-    value = str(value)
+    with _cache_lock:
+        _overrides.setdefault(config_name, {}).setdefault(section, {})[key] = str(value)
+        _invalidate(config_name)
 
-    with open(path, "r", encoding="utf-8") as f:
-        lines = f.readlines()
 
-    section_header = f"[{section}]"
-    in_section = False
-    section_found = False
-    key_found = False
-    new_lines: List[str] = []
+def clear_overrides(config_name: Optional[str] = None) -> None:
+    """Drop the in-memory overrides for one config (or all of them)."""
+    with _cache_lock:
+        if config_name is None:
+            _overrides.clear()
+        else:
+            _overrides.pop(config_name, None)
+        _invalidate(config_name)
 
-    for line in lines:
-        stripped = line.strip()
 
-        # Detect section headers
-        if stripped.startswith("[") and stripped.endswith("]"):
-            if in_section and not key_found:
-                new_lines.append(f"{key} = {value}\n")
-                key_found = True
+@contextmanager
+def overrides(config_name: str, values: Mapping[str, Mapping[str, Any]]):
+    """
+    Temporarily apply {section: {key: value}} overrides, restoring the previous
+    overrides on exit. Overrides are process-wide, not per-thread.
 
-            in_section = (stripped == section_header)
-            if in_section:
-                section_found = True
+        with config.overrides("dev_config.ini", {"data_generation": {"alpha": 0.6}}):
+            data_generator.run(network)
+    """
+    with _cache_lock:
+        previous = {sec: dict(vals) for sec, vals in _overrides.get(config_name, {}).items()}
+        for section, items in values.items():
+            for key, value in items.items():
+                set_override(config_name, section, key, value)
+    try:
+        yield
+    finally:
+        with _cache_lock:
+            if previous:
+                _overrides[config_name] = previous
+            else:
+                _overrides.pop(config_name, None)
+            _invalidate(config_name)
 
-            new_lines.append(line)
-            continue
 
-        if in_section:
-            # Check if this line defines the key (with or without space around '=')
-            if stripped.startswith(f"{key}=") or stripped.startswith(f"{key} ="):
-                new_lines.append(f"{key} = {value}\n")
-                key_found = True
-            else:
-                new_lines.append(line)
-        else:
-            new_lines.append(line)
+def set_config_value(config_name: str, section: str, key: str, value: str) -> None:
+    """
+    Update a value in config/<config_name> while preserving existing comments
+    and formatting. Creates the section/key if they don't exist.
+    """
+    set_config_values(config_name, [(section, key, value)])
 
-    # If section never existed, append it and the key at the end
-    if not section_found:
-        if new_lines and not new_lines[-1].endswith("\n"):
-            new_lines[-1] += "\n"
-        new_lines.append(f"\n[{section}]\n")
-        new_lines.append(f"{key} = {value}\n")
 
-    # If section existed but key never appeared, append key at end of that section
-    elif section_found and not key_found:
-        if new_lines and not new_lines[-1].endswith("\n"):
-            new_lines[-1] += "\n"
-        new_lines.append(f"{key} = {value}\n")
+def set_config_values(config_name: str, updates: Iterable[Tuple[str, str, Any]]) -> None:
+    """
+    Apply a batch of (section, key, value) updates to config/<config_name> in a
+    single read/rewrite. Comments and formatting are preserved, missing
+    sections/keys are created, and the file is replaced atomically so readers
+    never observe a half-written config.
+    """
+    path = _config_path(config_name)
+
+    # Later updates to the same key win, but keep first-seen order for appends
+    pending: Dict[str, Dict[str, str]] = {}
+    for section, key, value in updates:
+        pending.setdefault(section, {})[key] = str(value)
 
-    with open(path, "w", encoding="utf-8") as f:
-        f.writelines(new_lines)
+    if not pending:
+        return
+
+    with _config_lock(path):
+        with open(path, "r", encoding="utf-8") as f:
+            lines = f.readlines()
+
+        new_lines = _apply_updates(lines, pending)
+        _atomic_write(path, new_lines)
+
+    # mtime resolution can be coarse, so don't rely on it to spot our own write
+    _invalidate(config_name)
 
 
 def set_user_config(config_name: str, config_settings: UserInput) -> None:
+    """Write every UserInput field into its INI section in one atomic update."""
     prefix_to_section = {
         "test_": "test_system",
         "prod_": "prod_system"
     }
+    updates: List[Tuple[str, str, str]] = []
 
     for key, value in config_settings.model_dump().items():
         value = str(value)
@@ -120,15 +309,17 @@ def set_user_config(config_name: str, config_settings: UserInput) -> None:
         # PATH FIELDS
         if is_path_field:
             if not value.startswith("./"): value = "./" + value.replace("\\", "/")
-            set_config_value(config_name, "paths", key, value)
+            updates.append(("paths", key, value))
             continue
 
         # CONSTRAINT FIELDS
         if not key.startswith(("test_", "prod_")):
-            set_config_value(config_name, "constraints", key, value)
+            updates.append(("constraints", key, value))
 
         # TEST / PROD FIELDS
         for prefix, section in prefix_to_section.items():
             if key.startswith(prefix):
                 ini_key = key[len(prefix):]
-                set_config_value(config_name, section, ini_key, value)
\ No newline at end of file
+                updates.append((section, ini_key, value))
+
+    set_config_values(config_name, updates)
@@ -1,30 +1,57 @@
 import os
 import json
+import threading
 from datetime import datetime
 from pathlib import Path
 from jsonschema import Draft202012Validator
 from program_files import config
 
+# Compiled validators keyed by (schema path, mtime_ns, size), so a schema is
+# read and checked once per version instead of on every validation
+_validators = {}
+_validators_lock = threading.Lock()
+
+
+def get_validator(schema_path) -> Draft202012Validator:
+    """Compiled validator for a JSON Schema file, reused until the file changes."""
+    path = Path(schema_path).resolve()
+    st = path.stat()
+    key = (str(path), st.st_mtime_ns, st.st_size)
+    with _validators_lock:
+        validator = _validators.get(key)
+    if validator is None:
+        with open(path) as f:
+            schema = json.load(f)
+        Draft202012Validator.check_schema(schema)
+        validator = Draft202012Validator(schema)
+        with _validators_lock:
+            _validators[key] = validator
+    return validator
+
+
+def validate_data(instance, schema_path) -> list:
+    """Validate an in-memory JSON document against a JSON Schema.
+       Returns a list of error messages (empty if valid).
+    """
+    errors = sorted(get_validator(schema_path).iter_errors(instance), key=lambda e: list(e.path))
+
+    # Return readable list of messages
+    return [f"at /{'/'.join(map(str, e.path))}: {e.message}" for e in errors]
+
 
 def validate_json(data_path, schema_path) -> list:
     """Validate a JSON file against a JSON Schema.
        Returns a list of error messages (empty if valid).
     """
-    with open(schema_path) as f:
-        schema = json.load(f)
     with open(data_path) as f:
         instance = json.load(f)
+    return validate_data(instance, schema_path)
 
-    validator = Draft202012Validator(schema)
-    errors = sorted(validator.iter_errors(instance), key=lambda e: e.path)
-
-    # Return readable list of messages
-    return [f"at /{'/'.join(map(str, e.path))}: {e.message}" for e in errors]
-
-def system_to_queue(system_path: str) -> str:
+def system_to_queue(system_path: str, out_path: str = None) -> str:
     """
     Convert a System Description JSON → Queueing Network JSON.
-    Save output as queueing_network_{timestamp}.json inside queueing_network_dir.
+    Save output as queueing_network_{timestamp}.json inside queueing_network_dir,
+    or to out_path when given (e.g. to avoid name clashes in parallel runs).
     Returns absolute path to saved file.
     """
     # --- Load config ---
@@ -38,14 +65,13 @@ def system_to_queue(system_path: str) -> str:
     comps = system_doc.get("system_description", [])
 
     # Collect all node IDs 
-    defined_ids = {c["id"] for c in comps}
-    referenced_ids = set()
+    # Ordered (dict keys) rather than a set so the output is identical across runs,
+    # which keeps content-hashed pipeline caching stable
+    all_ids = {c["id"]: None for c in comps}
 
     for c in comps:
         for e in c.get("edges", []):
-            referenced_ids.add(e.get("to"))
-
-    all_ids = defined_ids.union(referenced_ids)
+            all_ids.setdefault(e.get("to"), None)
 
     # Determine entry point
     incoming = {cid: 0 for cid in all_ids}
@@ -103,18 +129,20 @@ def system_to_queue(system_path: str) -> str:
     }
 
     # --- Save file ---
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    out_path = qn_dir / f"queueing_network_{timestamp}.json"
+    if out_path is None:
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        out_path = qn_dir / f"queueing_network_{timestamp}.json"
 
     with open(out_path, "w", encoding="utf-8") as f:
         json.dump(result, f, indent=2)
 
     return str(out_path)
 
-def queue_to_system(queue_path: str) -> str:
+def queue_to_system(queue_path: str, out_path: str = None) -> str:
     """
     Convert a Queueing Network JSON → System Description JSON.
-    Save output as system_description_{timestamp}.json inside system_description_dir.
+    Save output as system_description_{timestamp}.json inside system_description_dir,
+    or to out_path when given (e.g. to avoid name clashes in parallel runs).
     Returns absolute path to saved file.
     """
     # --- Load config ---
@@ -164,8 +192,9 @@ def queue_to_system(queue_path: str) -> str:
     }
 
     # --- Save file ---
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    out_path = sd_dir / f"system_description_{timestamp}.json"
+    if out_path is None:
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        out_path = sd_dir / f"system_description_{timestamp}.json"
 
     with open(out_path, "w", encoding="utf-8") as f:
         json.dump(result, f, indent=2)
@@ -1,7 +1,7 @@
 import json
 import numpy as np
 import pandas as pd
-from program_files import config
+from program_files import config, settings
 from pathlib import Path
 
 """
@@ -43,7 +43,7 @@ of the queue.
 
 
 
-def assign_service_rates(queue_network: dict, seed:int):
+def assign_service_rates(queue_network: dict, rng: np.random.Generator):
     """
     Pick random values for service rate (μ). All of the μ_i should 
     follow the constraint in the queue network. 
@@ -51,7 +51,9 @@ def assign_service_rates(queue_network: dict, seed:int):
     Args:
         queue_network (dict): The incomplete default queue network application
         schema.
-        seed (int): the random seed
+        rng (np.random.Generator): The random generator, e.g.
+        np.random.default_rng(seed). Each run has its own, so concurrent
+        runs (pipeline stages on threads) do not share a random stream.
 
     Returns:
         queue_network (dict): The queue network application will randomly 
@@ -61,8 +63,7 @@ def assign_service_rates(queue_network: dict, seed:int):
     constraint = queue_network["system"]["constraint"]["service_rate_sum"]
     n = len(queues)
 
-    np.random.seed(seed)  # For reproducibility
-    x = np.random.rand(n)
+    x = rng.random(n)
     nums = (x / x.sum()) * constraint  # Normalize to the value of the constraint
     
     for i, q in enumerate(queues):
@@ -114,7 +115,7 @@ def compute_curr_lambda(main_lambdas, k, alpha, C) -> float:
 # print(0.5*0.3+0.1) # k = 2, alpha = 0.5, C = 0.1
 
 # Adding noise to computed main lambda 
-def add_gaussian_noise(value:float, mean:float, std:float):
+def add_gaussian_noise(value:float, mean:float, std:float, rng: np.random.Generator):
     """
     Add Gaussian noise to a numeric value.
 
@@ -122,11 +123,12 @@ def add_gaussian_noise(value:float, mean:float, std:float):
         value (float): original number
         mean (float): mean of Gaussian noise (default = 0)
         std (float): standard deviation of Gaussian noise (default = 0.01)
+        rng (np.random.Generator): the random generator to draw from
 
     Returns:
         float: value + noise
     """
-    noise = np.random.normal(mean, std)
+    noise = rng.normal(mean, std)
     return value + noise
 
 def compute_queue_lambdas(main_lambda, queues, entry_id):
@@ -158,7 +160,8 @@ def compute_queue_lambdas(main_lambda, queues, entry_id):
             lambdas[nxt["id"]] = lambdas.get(nxt["id"], 0) + routed
     return lambdas
 
-def generate_data(queue_network: json, time, main_lambda, k, alpha, C, gaussian_mean:float, gaussian_std:float):
+def generate_data(queue_network: json, time, main_lambda, k, alpha, C, gaussian_mean:float, gaussian_std:float, verbose:bool=True,
+                  rng: np.random.Generator = None):
     """
     Generate synthethic datas. 
 
@@ -169,10 +172,15 @@ def generate_data(queue_network: json, time, main_lambda, k, alpha, C, gaussian_
         k (float): How long is the dependency of λ is. 
         alpha (float): How much λ is dependent on the previous time point.
         C (float): Constant 
+        verbose (bool): Print the values computed at every time point.
+        rng (np.random.Generator): The random generator for the noise
+        (default: a new, unseeded one).
 
     Returns:
         timeline (dict): Synthetic data.  
     """
+    if rng is None:
+        rng = np.random.default_rng()
     system = queue_network["system"]
     queues = system["queues"]
     entry_id = system["entry_points"]
@@ -184,7 +192,7 @@ def generate_data(queue_network: json, time, main_lambda, k, alpha, C, gaussian_
 
     for t in range(time):
         curr_time = t + 1
-        print(f"\nTime: {curr_time}")
+        if verbose: print(f"\nTime: {curr_time}")
 
         # Compute main lambda
         if curr_time == 1: 
@@ -192,10 +200,10 @@ def generate_data(queue_network: json, time, main_lambda, k, alpha, C, gaussian_
             main_lambdas.append(curr_main_lambda)
         else: 
             curr_main_lambda = compute_curr_lambda(main_lambdas, k, alpha, C)
-            curr_main_lambda = add_gaussian_noise(curr_main_lambda,gaussian_mean,gaussian_std)
+            curr_main_lambda = add_gaussian_noise(curr_main_lambda,gaussian_mean,gaussian_std,rng)
             main_lambdas.append(curr_main_lambda)
 
-        print("λ_main =", curr_main_lambda)
+        if verbose: print("λ_main =", curr_main_lambda)
 
         # Compute queue lambdas (main λ + backlog)
         queue_lambdas = {}
@@ -210,7 +218,7 @@ def generate_data(queue_network: json, time, main_lambda, k, alpha, C, gaussian_
             q_id = q["id"]
             queue_lambdas[q_id] += backlog[q_id]
         
-        print("Queue λ values:", queue_lambdas)
+        if verbose: print("Queue λ values:", queue_lambdas)
 
         # Compute delays  
         delays = {}
@@ -235,9 +243,10 @@ def generate_data(queue_network: json, time, main_lambda, k, alpha, C, gaussian_
 
         backlog = new_backlog
 
-        print("Delays:", delays)
-        print("Served:", served)
-        print("Backlog:", backlog)
+        if verbose:
+            print("Delays:", delays)
+            print("Served:", served)
+            print("Backlog:", backlog)
 
         # Record timestep summary
         timeline.append({
@@ -262,39 +271,49 @@ def convert_data_to_csv(data, saved_file_path):
 
 
 
-def run(QUEUE_NETWORK_FILE): # Feed in a queue network file
-    # Load Data Generation Configurations
+def run(QUEUE_NETWORK_FILE, out_path=None, verbose=True): # Feed in a queue network file
+    # Load Data Generation Configurations (validated once and cached by settings)
     cfg = config.get_config("dev_config.ini")
-    data_gen_config = cfg['data_generation']
-    stress_test_config = cfg['stress_test_params']
+    dev_settings = settings.get_dev_settings()
+    params = dev_settings.data_generation
 
     # Extract parameters
-    ALPHA = data_gen_config.getfloat("alpha")
-    K = data_gen_config.getint("k")
-    C = data_gen_config.getfloat("C")
-    STARTING_MAIN_LAMBDA = data_gen_config.getfloat("starting_main_lambda")
-    TIME_POINTS = data_gen_config.getint("time_points")
-    GAUSSIAN_MEAN = data_gen_config.getfloat("gaussian_mean")
-    GAUSSIAN_STD = data_gen_config.getfloat("gaussian_std")
-    SEED = stress_test_config.getint("random_seed")
+    ALPHA = params.alpha
+    K = params.k
+    C = params.C
+    STARTING_MAIN_LAMBDA = params.starting_main_lambda
+    TIME_POINTS = params.time_points
+    GAUSSIAN_MEAN = params.gaussian_mean
+    GAUSSIAN_STD = params.gaussian_std
+    SEED = dev_settings.stress_test_params.random_seed
     # QUEUE_NETWORK_FILE = cfg.get("paths", "queueing_network_file") # Removed
 
     with open(QUEUE_NETWORK_FILE, 'r') as file:
         queue_network = json.load(file)
 
+    # One generator per run, seeded for reproducibility
+    rng = np.random.default_rng(SEED)
+
     # Testing with an example
     # data = generate_data(queue_network, 100, 0.1, k, alpha, 0.05)
     data = generate_data(
-        assign_service_rates(queue_network, SEED),
+        assign_service_rates(queue_network, rng),
         TIME_POINTS,
         STARTING_MAIN_LAMBDA,
         K,
         ALPHA,
         C,
         GAUSSIAN_MEAN,
-        GAUSSIAN_STD
+        GAUSSIAN_STD,
+        verbose,
+        rng
     )
 
+    if out_path is not None:
+        convert_data_to_csv(data, out_path)
+        print("Saved to ",out_path)
+        return str(out_path) # analyzer.run accepts full paths as well as names
+
     queue_file = Path(QUEUE_NETWORK_FILE) 
     queue_name = queue_file.stem # e.g, "queue_diverge_example"
     out_dir = cfg.get("paths", "processed_data_dir")
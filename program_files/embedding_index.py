@@ -0,0 +1,273 @@
+'''
+Embedding cache and similarity search for system-description components.
+
+Each component of every system description is turned into a short text
+(id, type, machine, description, edges) and embedded with Ollama's batch
+embed endpoint, many components per request. Vectors are stored
+L2-normalized in a float32 matrix on disk (vectors.f32) that is
+memory-mapped for search, with one metadata line per row (meta.jsonl).
+Rows are keyed by a hash of (model, text), so re-indexing only embeds
+components that are new or changed.
+
+Search is a blocked matrix-vector product (cosine similarity, since rows
+are normalized) with argpartition for the top k, which stays fast with
+100k+ rows without loading the whole matrix into memory.
+'''
+
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+import hashlib
+import json
+import os
+
+import numpy as np
+
+from program_files import config
+
+DEFAULT_MODEL = "nlip-test-model"
+
+# Rows scored per block during search (bounds temporary memory)
+_BLOCK_ROWS = 65536
+
+EmbedFn = Callable[[List[str]], List[List[float]]]
+
+
+# ----------------------------
+# Helpers
+# ----------------------------
+def _ollama_embed(model: str) -> EmbedFn:
+    def embed(texts: List[str]) -> List[List[float]]:
+        import ollama
+        return ollama.embed(model=model, input=texts).embeddings
+    return embed
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+
+def _default_index_dir() -> Path:
+    return Path(config.get_config("dev_config.ini").get("paths", "embedding_index_dir"))
+
+
+def component_text(component: dict) -> str:
+    """The text embedded for one system-description component."""
+    edges = ", ".join(str(e.get("to")) for e in component.get("edges") or [] if isinstance(e, dict))
+    parts = [
+        f"id: {component.get('id')}",
+        f"type: {component.get('type')}",
+        f"machine: {component.get('machine')}",
+        f"description: {component.get('description')}",
+        f"edges to: {edges or 'none'}",
+    ]
+    return "; ".join(parts)
+
+
+# ----------------------------
+# Public
+# ----------------------------
+class EmbeddingIndex:
+    """
+    Append-only, content-addressed store of normalized embeddings.
+
+    Args:
+        index_dir (Path): Directory holding vectors.f32, meta.jsonl and header.json.
+        model (str): Embedding model; an index only ever holds one model's vectors.
+        embed_fn (callable): embed_fn(texts) -> vectors; defaults to ollama.embed.
+        batch_size (int): Inputs sent per embedding request.
+    """
+
+    def __init__(self, index_dir: Optional[Path] = None, model: str = DEFAULT_MODEL,
+                 embed_fn: Optional[EmbedFn] = None, batch_size: int = 64):
+        self.index_dir = Path(index_dir) if index_dir is not None else _default_index_dir()
+        self.model = model
+        self.embed_fn = embed_fn or _ollama_embed(model)
+        self.batch_size = batch_size
+        self.dims: Optional[int] = None
+        self.meta: List[Dict] = []
+        self.rows: Dict[str, int] = {}
+        self._vectors: Optional[np.memmap] = None
+        self._load()
+
+    @property
+    def _vectors_path(self) -> Path:
+        return self.index_dir / "vectors.f32"
+
+    @property
+    def _meta_path(self) -> Path:
+        return self.index_dir / "meta.jsonl"
+
+    @property
+    def _header_path(self) -> Path:
+        return self.index_dir / "header.json"
+
+    def __len__(self) -> int:
+        return len(self.meta)
+
+    def _key(self, text: str) -> str:
+        return hashlib.sha256(f"{self.model}\0{text}".encode("utf-8")).hexdigest()
+
+    def _load(self) -> None:
+        if not self._header_path.is_file():
+            return
+        with open(self._header_path, encoding="utf-8") as f:
+            header = json.load(f)
+        if header["model"] != self.model:
+            raise ValueError(f"{self.index_dir} holds '{header['model']}' embeddings, not '{self.model}'")
+        self.dims = header["dims"]
+
+        if self._meta_path.is_file():
+            with open(self._meta_path, encoding="utf-8") as f:
+                self.meta = [json.loads(line) for line in f if line.strip()]
+        # Vectors are written before their metadata; drop rows an interrupted add left without any
+        rows = os.path.getsize(self._vectors_path) // (4 * self.dims) if self._vectors_path.is_file() else 0
+        self.meta = self.meta[:rows]
+        if rows > len(self.meta):
+            with open(self._vectors_path, "r+b") as f:
+                f.truncate(len(self.meta) * 4 * self.dims)
+        self.rows = {m["key"]: i for i, m in enumerate(self.meta)}
+        self._vectors = None
+
+    def vectors(self) -> np.ndarray:
+        """All stored vectors as a read-only (n, dims) memory map."""
+        if not self.meta:
+            return np.zeros((0, self.dims or 0), dtype=np.float32)
+        if self._vectors is None or self._vectors.shape[0] != len(self.meta):
+            self._vectors = np.memmap(self._vectors_path, dtype=np.float32, mode="r",
+                                      shape=(len(self.meta), self.dims))
+        return self._vectors
+
+    def add(self, texts: Sequence[str], metas: Optional[Sequence[Dict]] = None) -> int:
+        """
+        Embed and store every text not already in the index.
+
+        Args:
+            texts (list[str]): Texts to embed.
+            metas (list[dict]): Optional metadata stored with each text.
+
+        Returns:
+            int: Number of newly embedded texts.
+        """
+        metas = metas or [{} for _ in texts]
+        pending, seen = [], set()
+        for text, meta in zip(texts, metas):
+            key = self._key(text)
+            if key not in self.rows and key not in seen:
+                seen.add(key)
+                pending.append((key, text, meta))
+        if not pending:
+            return 0
+
+        self.index_dir.mkdir(parents=True, exist_ok=True)
+        for start in range(0, len(pending), self.batch_size):
+            batch = pending[start:start + self.batch_size]
+            vectors = _normalize(np.asarray(self.embed_fn([text for _, text, _ in batch]), dtype=np.float32))
+            if self.dims is None:
+                self.dims = int(vectors.shape[1])
+                with open(self._header_path, "w", encoding="utf-8") as f:
+                    json.dump({"model": self.model, "dims": self.dims}, f)
+            elif vectors.shape[1] != self.dims:
+                raise ValueError(f"Model returned {vectors.shape[1]}-d vectors; index holds {self.dims}-d")
+
+            with open(self._vectors_path, "ab") as f:
+                f.write(vectors.tobytes())
+            with open(self._meta_path, "a", encoding="utf-8") as f:
+                for key, text, meta in batch:
+                    entry = {"key": key, "text": text, **meta}
+                    f.write(json.dumps(entry) + "\n")
+                    self.rows[key] = len(self.meta)
+                    self.meta.append(entry)
+        return len(pending)
+
+    def embed_query(self, text: str) -> np.ndarray:
+        return _normalize(np.asarray(self.embed_fn([text])[0], dtype=np.float32))
+
+    def search(self, query, k: int = 5) -> List[Tuple[float, Dict]]:
+        """
+        The k stored entries most similar to query (a text or a vector).
+
+        Returns:
+            list[tuple[float, dict]]: (cosine similarity, metadata), best first.
+        """
+        if not self.meta:
+            return []
+        q = self.embed_query(query) if isinstance(query, str) else _normalize(np.asarray(query, dtype=np.float32))
+        matrix = self.vectors()
+        k = min(k, matrix.shape[0])
+
+        best_scores = np.empty(0, dtype=np.float32)
+        best_rows = np.empty(0, dtype=np.int64)
+        for start in range(0, matrix.shape[0], _BLOCK_ROWS):
+            scores = np.asarray(matrix[start:start + _BLOCK_ROWS]) @ q
+            top = np.argpartition(scores, -k)[-k:] if scores.shape[0] > k else np.arange(scores.shape[0])
+            best_scores = np.concatenate([best_scores, scores[top]])
+            best_rows = np.concatenate([best_rows, top + start])
+            if best_scores.shape[0] > k:
+                keep = np.argpartition(best_scores, -k)[-k:]
+                best_scores, best_rows = best_scores[keep], best_rows[keep]
+
+        order = np.argsort(-best_scores)
+        return [(float(best_scores[i]), self.meta[int(best_rows[i])]) for i in order]
+
+    def topology_vectors(self) -> Tuple[List[str], np.ndarray]:
+        """One normalized vector per indexed file: the mean of its component vectors."""
+        files = sorted({m.get("file") for m in self.meta if m.get("file")})
+        if not files:
+            return [], np.zeros((0, self.dims or 0), dtype=np.float32)
+        position = {f: i for i, f in enumerate(files)}
+        rows = np.array([i for i, m in enumerate(self.meta) if m.get("file")])
+        groups = np.array([position[self.meta[i]["file"]] for i in rows])
+        sums = np.zeros((len(files), self.dims), dtype=np.float32)
+        np.add.at(sums, groups, np.asarray(self.vectors()[rows]))
+        return files, _normalize(sums)
+
+
+def index_system_descriptions(paths: Iterable[str], index: Optional[EmbeddingIndex] = None) -> EmbeddingIndex:
+    """
+    Add every component of the given system description files (or of every
+    JSON file in the given directories) to the index.
+
+    Args:
+        paths (list[str]): System description files or directories.
+        index (EmbeddingIndex): Index to add to (default: embedding_index_dir).
+
+    Returns:
+        EmbeddingIndex: The updated index.
+    """
+    index = index if index is not None else EmbeddingIndex()
+    texts, metas = [], []
+    for path in paths:
+        path = Path(path)
+        files = sorted(path.glob("*.json")) if path.is_dir() else [path]
+        for file in files:
+            with open(file, encoding="utf-8") as f:
+                doc = json.load(f)
+            for component in doc.get("system_description") or []:
+                texts.append(component_text(component))
+                metas.append({"file": str(file), "id": component.get("id")})
+    index.add(texts, metas)
+    return index
+
+
+def similar_components(text: str, k: int = 5, index: Optional[EmbeddingIndex] = None) -> List[Tuple[float, Dict]]:
+    """The k indexed components closest to a free-text or component_text description."""
+    index = index if index is not None else EmbeddingIndex()
+    return index.search(text, k)
+
+
+def nearest_topologies(system_path: str, k: int = 5, index: Optional[EmbeddingIndex] = None) -> List[Tuple[float, str]]:
+    """
+    Indexed system descriptions most similar to system_path, comparing the
+    mean embedding of each file's components. system_path is indexed first.
+    """
+    index = index_system_descriptions([system_path], index)
+    files, vectors = index.topology_vectors()
+    target = str(Path(system_path))
+    query = vectors[files.index(target)]
+    others = [i for i, f in enumerate(files) if f != target]
+    if not others:
+        return []
+    scores = vectors[others] @ query
+    order = np.argsort(-scores)[:k]
+    return [(float(scores[i]), files[others[i]]) for i in order]
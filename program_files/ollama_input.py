@@ -1,24 +1,355 @@
-from ollama import chat
+from ollama import chat, generate, AsyncClient, ResponseError
 from ollama import ChatResponse
+from dataclasses import dataclass, field
+from typing import List, Optional
+import asyncio
 import json
 import time
 import re
-from program_files.config import _project_root, get_config
-from program_files.data_conversion import validate_json
+import threading
+import httpx
+from program_files.config import get_config
+from program_files.data_conversion import get_validator, validate_data
+from program_files import settings
+from program_files.response_cache import cache_key, get_response_cache
 from pathlib import Path
 
+MODEL = "nlip-test-model"
+
+# Retries of a single model call on transport errors, with exponential backoff
+TRANSPORT_RETRIES = 3
+BACKOFF_SECONDS = 0.5
+# A call whose model load took longer than this counts as a cold start
+COLD_LOAD_SECONDS = 0.5
+
+REPAIR_PROMPT = (
+    "The JSON you produced is not a valid system description:\n{errors}\n\n"
+    "Return the complete corrected JSON, changing only what is needed to fix these errors."
+)
+
+
+@dataclass
+class GenerationResult:
+    content: str
+    path: Optional[str]
+    data: Optional[dict]
+    attempts: int
+    errors: List[str] = field(default_factory=list)
+    structured: bool = False
+
+
+@dataclass
+class GenerationStats:
+    """Running totals over the documents generated in this process."""
+    documents: int = 0
+    valid: int = 0
+    attempts: int = 0
+
+    def record(self, result: GenerationResult) -> None:
+        self.documents += 1
+        self.attempts += result.attempts
+        if result.path is not None:
+            self.valid += 1
+
+    @property
+    def attempts_per_valid_document(self) -> Optional[float]:
+        # Counts the attempts of failed documents too: they are the cost of the valid ones
+        return self.attempts / self.valid if self.valid else None
+
+
+generation_stats = GenerationStats()
+
+
+@dataclass
+class ModelLatency:
+    """Model call latencies, split by whether the call had to load the model first."""
+    cold_calls: int = 0
+    cold_seconds: float = 0.0
+    warm_calls: int = 0
+    warm_seconds: float = 0.0
+
+    def record(self, seconds: float, load_seconds: float) -> None:
+        if load_seconds >= COLD_LOAD_SECONDS:
+            self.cold_calls += 1
+            self.cold_seconds += seconds
+        else:
+            self.warm_calls += 1
+            self.warm_seconds += seconds
+
+    @property
+    def mean_cold(self) -> Optional[float]:
+        return self.cold_seconds / self.cold_calls if self.cold_calls else None
+
+    @property
+    def mean_warm(self) -> Optional[float]:
+        return self.warm_seconds / self.warm_calls if self.warm_calls else None
+
+
+model_latency = ModelLatency()
+
 def extract_json(response: str) -> str:
     sys_desc = re.search(r"```(?:json)?\s*(\{.*?\})\s*```", response, re.DOTALL)
     if not sys_desc:
         return None
     return sys_desc.group(1)
 
+def _schema_path() -> Path:
+    return settings.get_dev_settings().paths.system_description_schema
+
+def _output_format() -> Optional[dict]:
+    """
+    The schema to constrain the model's output with, or None for free text.
+    Taken from the cached validator, so the file is only read when it changes.
+    """
+    if not settings.get_dev_settings().generation.structured_output:
+        return None
+    return get_validator(_schema_path()).schema
+
+def _is_transport_error(e: Exception) -> bool:
+    """Errors worth retrying unchanged: the request never got a usable answer."""
+    if isinstance(e, (ConnectionError, TimeoutError, httpx.TransportError)):
+        return True
+    return isinstance(e, ResponseError) and e.status_code >= 500
+
+def keep_alive_setting():
+    """[generation] keep_alive as Ollama expects it: a duration string, or whole seconds."""
+    value = settings.get_dev_settings().generation.keep_alive.strip()
+    return int(value) if value.lstrip("+-").isdigit() else value
+
+def _request_options(output_format: Optional[dict]) -> dict:
+    options = {'keep_alive': keep_alive_setting()}
+    if output_format is not None:
+        options['format'] = output_format
+    return options
+
+def _record_latency(response, start: float) -> None:
+    load_duration = response.get('load_duration') if hasattr(response, 'get') else None
+    model_latency.record(time.perf_counter() - start, (load_duration or 0) / 1e9)
+
+def warm_up_model() -> Optional[threading.Thread]:
+    """
+        Load the model in a background thread (a generate call with no prompt),
+        so it is resident by the time the first description is sent. Returns the
+        thread, or None when [generation] warm_up is off.
+    """
+    if not settings.get_dev_settings().generation.warm_up:
+        return None
+
+    def load():
+        start = time.perf_counter()
+        try:
+            _record_latency(generate(model=MODEL, keep_alive=keep_alive_setting()), start)
+        except Exception:
+            # Only an optimization: the first real request will load the model instead
+            pass
+
+    thread = threading.Thread(target=load, daemon=True)
+    thread.start()
+    return thread
+
+def _ask_model(messages: list, output_format: Optional[dict] = None) -> str:
+    """Model reply text, retrying only transport errors with exponential backoff."""
+    for retry in range(TRANSPORT_RETRIES + 1):
+        try:
+            start = time.perf_counter()
+            response: ChatResponse = chat(model=MODEL, messages=messages, **_request_options(output_format))
+            _record_latency(response, start)
+            return response['message']['content']
+        except Exception as e:
+            if not _is_transport_error(e) or retry == TRANSPORT_RETRIES:
+                raise
+            time.sleep(BACKOFF_SECONDS * (2 ** retry))
+
+def _normalize(parsed) -> dict:
+    """Coerce the shapes models commonly return into {"system_description": [...]}."""
+    if isinstance(parsed, list):
+        return {"system_description": parsed}
+    if isinstance(parsed, dict):
+        if "system_description" in parsed and isinstance(parsed["system_description"], list):
+            return parsed
+        if parsed.get("id") is not None or parsed.get("edges") is not None:
+            return {"system_description": [parsed]}
+        return parsed
+    return {"system_description": []}
+
+def _fill_defaults(data: dict) -> dict:
+    """Fill null network speeds and message sizes with the user's configured values."""
+    config = get_config("user_config.ini")
+    comps = data.get("system_description") or []
+
+    try:
+        default_msg_size = config.getint('constraints', 'avg_message_size_bytes')
+    except Exception:
+        default_msg_size = None
+
+    for comp in comps:
+        if not isinstance(comp, dict):
+            continue
+        if comp.get("network_speed") in (None, ""):
+            try:
+                comp["network_speed"] = config.getint('test_system', 'network_bandwidth_mbps')
+            except Exception:
+                comp["network_speed"] = None
+
+        msgs = comp.get("messages")
+        if isinstance(msgs, dict):
+            if msgs.get("message_size") in (None, ""):
+                msgs["message_size"] = default_msg_size
+            comp["messages"] = msgs
+        elif isinstance(msgs, list):
+            if not msgs:
+                comp["messages"] = [{"message_size": default_msg_size}] if default_msg_size is not None else []
+            else:
+                for m in msgs:
+                    if isinstance(m, dict):
+                        if m.get("message_size") in (None, ""):
+                            m["message_size"] = default_msg_size
+                comp["messages"] = msgs
+        else:
+            comp["messages"] = {"message_size": default_msg_size} if default_msg_size is not None else {}
+    return data
+
+def parse_sys_desc(content: str) -> tuple:
+    """
+        Turn a model reply into a system description with config defaults filled in,
+        validated in memory. Returns (data or None, list of error messages).
+    """
+    clean_output = extract_json(content)
+    if clean_output is None:
+        # No fenced block: constrained output is bare JSON
+        clean_output = content.strip()
+    try:
+        parsed = json.loads(clean_output)
+    except json.JSONDecodeError as e:
+        return None, [f"the reply did not contain valid JSON ({e.msg} at line {e.lineno} column {e.colno})"]
+
+    data = _fill_defaults(_normalize(parsed))
+    return data, validate_data(data, _schema_path())
+
+def write_sys_desc(data: dict, out_dir: Path = None, name: str = None) -> str:
+    """Write a system description as <name>.json (default: a timestamp) and return its path."""
+    out_dir = Path(out_dir) if out_dir is not None else Path("./data/system-description/")
+    out_dir.mkdir(parents=True, exist_ok=True)
+    name = name or time.strftime('%Y-%m-%d-%H-%M-%S', time.localtime())
+    json_file_path = str(out_dir / (name + ".json"))
+    with open(json_file_path, 'w', encoding='utf-8') as json_file:
+        json.dump(data, json_file, indent=2)
+    return json_file_path
+
+class _Generation:
+    """
+        The state of one description's ask/repair conversation, shared by the
+        sync and async loops: they only differ in how the model is called.
+    """
+    def __init__(self, sys_desc: str, max_attempts: int, out_dir: Path, name: str, verbose: bool):
+        self.log = print if verbose else (lambda *args, **kwargs: None)
+        self.max_attempts = max_attempts or settings.get_dev_settings().generation.max_attempts
+        self.out_dir = out_dir
+        self.name = name
+        self.output_format = _output_format()
+        self.messages = [{'role': 'user', 'content': sys_desc}]
+        self.cache = get_response_cache()
+        self.key = cache_key(MODEL, self.messages, {"format": self.output_format}) if self.cache is not None else None
+        self.from_cache = False
+        self.content, self.errors = "", []
+
+    def cached_reply(self, attempt: int) -> Optional[str]:
+        self.from_cache = False
+        if self.key is not None and attempt == 1:
+            cached = self.cache.get(self.key)
+            if cached is not None:
+                self.from_cache = True
+                self.log("\nUsing cached system description response...\n")
+                return cached
+        self.log("\nGenerating system description JSON...\n")
+        return None
+
+    def check(self, content: str, attempt: int) -> Optional[GenerationResult]:
+        """The result if content is valid; otherwise queue a repair request and return None."""
+        self.content = content
+        data, self.errors = parse_sys_desc(content)
+        if not self.errors:
+            self.log("System Description JSON is Valid...\n")
+            if self.key is not None and not self.from_cache:
+                # Stored under the original prompt, so a rerun skips the repairs too
+                self.cache.put(self.key, content)
+            path = write_sys_desc(data, self.out_dir, self.name)
+            return self._result(GenerationResult(content, path, data, attempt))
+
+        for error in self.errors:
+            self.log(error)
+        self.log("System Description JSON creation failed. Asking the model to repair it...\n")
+        self.messages = self.messages + [
+            {'role': 'assistant', 'content': content},
+            {'role': 'user', 'content': REPAIR_PROMPT.format(errors="\n".join(f"- {e}" for e in self.errors))},
+        ]
+        return None
+
+    def failed(self) -> GenerationResult:
+        self.log("Exited due to too many retries of system description JSON creation...")
+        return self._result(GenerationResult(self.content, None, None, self.max_attempts, self.errors))
+
+    def _result(self, result: GenerationResult) -> GenerationResult:
+        result.structured = self.output_format is not None
+        generation_stats.record(result)
+        return result
+
+def generate_sys_desc(sys_desc: str, max_attempts: int = None, out_dir: Path = None,
+                      verbose: bool = True, name: str = None) -> GenerationResult:
+    """
+        Translate a text system description to JSON without any prompting.
+        With [generation] structured_output on, the model is constrained to the
+        system description schema (Ollama's format parameter), so it emits bare,
+        schema-shaped JSON. Each invalid reply is sent back to the model with its
+        validation errors (a targeted repair) instead of asking again from scratch.
+        The JSON is written to disk once, when it is valid; on failure path is None.
+    """
+    gen = _Generation(sys_desc, max_attempts, out_dir, name, verbose)
+    for attempt in range(1, gen.max_attempts + 1):
+        content = gen.cached_reply(attempt)
+        if content is None:
+            content = _ask_model(gen.messages, gen.output_format)
+        result = gen.check(content, attempt)
+        if result is not None:
+            return result
+    return gen.failed()
+
+async def _ask_model_async(client: AsyncClient, messages: list, output_format: Optional[dict] = None) -> str:
+    """_ask_model for an AsyncClient; the backoff sleeps don't block other requests."""
+    for retry in range(TRANSPORT_RETRIES + 1):
+        try:
+            start = time.perf_counter()
+            response: ChatResponse = await client.chat(model=MODEL, messages=messages, **_request_options(output_format))
+            _record_latency(response, start)
+            return response['message']['content']
+        except Exception as e:
+            if not _is_transport_error(e) or retry == TRANSPORT_RETRIES:
+                raise
+            await asyncio.sleep(BACKOFF_SECONDS * (2 ** retry))
+
+async def generate_sys_desc_async(sys_desc: str, client: AsyncClient = None, max_attempts: int = None,
+                                  out_dir: Path = None, verbose: bool = False, name: str = None) -> GenerationResult:
+    """generate_sys_desc over an ollama.AsyncClient, so many descriptions can be in flight at once."""
+    client = client if client is not None else AsyncClient()
+    gen = _Generation(sys_desc, max_attempts, out_dir, name, verbose)
+    for attempt in range(1, gen.max_attempts + 1):
+        content = gen.cached_reply(attempt)
+        if content is None:
+            content = await _ask_model_async(client, gen.messages, gen.output_format)
+        result = gen.check(content, attempt)
+        if result is not None:
+            return result
+    return gen.failed()
+
 def ask_sys_desc():
     """
-        Asks user for a system description and uses an Ollama model to translate 
+        Asks user for a system description and uses an Ollama model to translate
         that description to JSON, fills in certain null values with config defaults,
-        writes JSON to file and validates it, and returns the original model response. 
+        validates it and writes it to file, and returns the final model response
+        and the file path (None if no valid JSON was produced).
     """
+    # Load the model while the user is typing
+    warm_up_model()
     sys_desc_check = True
     while sys_desc_check:
         sys_desc = input("Input your system description (At least 10 words):\n")
@@ -26,86 +357,14 @@ def ask_sys_desc():
             sys_desc_check = False
         else:
             print("\nThe system description you inputted does not have enough information to be accurate. Please retype your system description and provide more information about it.\n")
-    json_check = True
-    loop_count = 0
-
-    while json_check and loop_count < 5:
-        print("\nGenerating system description JSON in data/system-description folder...\n")
-        time.sleep(1)
-        response: ChatResponse = chat(model="nlip-test-model", messages=[
-            {
-                'role': 'user',
-                'content': sys_desc
-            }
-        ])
-        clean_output = extract_json(response['message']['content'])
-        parsed = json.loads(clean_output)
-
-        if isinstance(parsed, list):
-            data = {"system_description": parsed}
-        elif isinstance(parsed, dict):
-            if "system_description" in parsed and isinstance(parsed["system_description"], list):
-                data = parsed
-            elif parsed.get("id") is not None or parsed.get("edges") is not None:
-                data = {"system_description": [parsed]}
-            else:
-                data = parsed
-        else:
-            data = {"system_description": []}
-
-        # Get user-defined values for system and input them in generated JSON
-        config = get_config("user_config.ini")
-        comps = data.get("system_description") or []
-
-        try:
-            default_msg_size = config.getint('constraints', 'avg_message_size_bytes')
-        except Exception:
-            default_msg_size = None
-
-        for comp in comps:
-            if comp.get("network_speed") in (None, ""):
-                try:
-                    comp["network_speed"] = config.getint('test_system', 'network_bandwidth_mbps')
-                except Exception:
-                    comp["network_speed"] = None
-
-            msgs = comp.get("messages")
-            if isinstance(msgs, dict):
-                if msgs.get("message_size") in (None, ""):
-                    msgs["message_size"] = default_msg_size
-                comp["messages"] = msgs
-            elif isinstance(msgs, list):
-                if not msgs:
-                    comp["messages"] = [{"message_size": default_msg_size}] if default_msg_size is not None else []
-                else:
-                    for m in msgs:
-                        if isinstance(m, dict):
-                            if m.get("message_size") in (None, ""):
-                                m["message_size"] = default_msg_size
-                    comp["messages"] = msgs
-            else:
-                comp["messages"] = {"message_size": default_msg_size} if default_msg_size is not None else {}
-
-        out_dir = Path("./data/system-description/")
-        out_dir.mkdir(parents=True, exist_ok=True)
-        json_file_path = str(out_dir / (time.strftime('%Y-%m-%d-%H-%M-%S', time.localtime()) + ".json"))
-
-        # Write file
-        with open(json_file_path, 'w', encoding='utf-8') as json_file:
-            json.dump(data, json_file, indent=2)
-
-        # Validate using schema
-        schema_path = _project_root() / "data" / "schemas" / "system_description.schema.json"
-        results = validate_json(json_file_path, schema_path)
-        for result in results:
-            print(result)
-        if len(results) == 0:
-            print("System Description JSON is Valid...\n")
-            json_check = False
-        else:
-            print("System Description JSON creation failed. Trying again...\n")
-            loop_count += 1
 
-    if (json_check):
-        print("Exited due to too many retries of system description JSON creation...")
-    return response, json_file_path
\ No newline at end of file
+    result = generate_sys_desc(sys_desc)
+    if result.path is not None:
+        print(f"Wrote {result.path} after {result.attempts} attempt(s)\n")
+    if generation_stats.valid:
+        print(f"Attempts per valid document: {generation_stats.attempts_per_valid_document:.2f}\n")
+    if model_latency.cold_calls:
+        print(f"Model calls: {model_latency.cold_calls} cold (mean {model_latency.mean_cold:.2f}s), "
+              f"{model_latency.warm_calls} warm\n")
+    response = {'message': {'role': 'assistant', 'content': result.content}}
+    return response, result.path
@@ -0,0 +1,335 @@
+'''
+DAG-based pipeline runner with content-addressed stage caching.
+
+Each Stage declares the stages (or input files) it depends on, the
+parameters that affect its result and a function that writes one output
+file. A stage's cache key is a hash of its name, version, parameters, the
+source of the modules its code lives in and the *contents* of its inputs,
+and its output is stored under
+pipeline_cache_dir/<stage>/<key>. When the key is unchanged the stored
+artifact is reused, so e.g. re-running after editing only the analyzer
+skips conversion and data generation. Stages whose dependencies are
+satisfied run concurrently, which lets several networks built from one set
+of system descriptions proceed in parallel.
+'''
+
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional
+import hashlib
+import importlib.util
+import inspect
+import json
+import os
+import threading
+import time
+
+from program_files import config, settings
+
+# Bump to invalidate every cached artifact after a change in output format
+CACHE_VERSION = "1"
+
+_CHUNK = 1 << 20
+
+# The analyze stage saves its fit plot beside the summary JSON
+PLOT_SUFFIX = ".png"
+
+
+@dataclass
+class Stage:
+    """
+    One node of the pipeline DAG.
+
+    Args:
+        name (str): Unique stage name (also the cache subdirectory).
+        fn (callable): fn(inputs, out_path) -> None. inputs maps each
+        dependency name to its output path; fn must write out_path.
+        deps (list[str]): Names of upstream stages or input files (paths).
+        params (dict): JSON-serializable values that affect the output.
+        suffix (str): Extension of the output artifact.
+        version (str): Bump to invalidate cached outputs after a change the
+        source digest cannot see (e.g. an upgraded library).
+        exclusive (bool): Never run concurrently with other exclusive stages
+        (e.g. stages using matplotlib, which is not thread-safe).
+        extras (list[str]): Suffixes of further artifacts fn writes beside
+        out_path, at extra_path(out_path, suffix); cached with the output.
+        code (list[str]): Dotted names of further modules fn's output
+        depends on. Their source, and that of fn's own module, is part of
+        the cache key, so editing them reruns the stage.
+    """
+    name: str
+    fn: Callable[[Dict[str, Path], Path], None]
+    deps: List[str] = field(default_factory=list)
+    params: Dict[str, Any] = field(default_factory=dict)
+    suffix: str = ""
+    version: str = "1"
+    exclusive: bool = False
+    extras: List[str] = field(default_factory=list)
+    code: List[str] = field(default_factory=list)
+
+
+@dataclass
+class StageResult:
+    name: str
+    key: Optional[str]
+    output: Optional[Path]
+    cached: bool
+    seconds: float
+    error: Optional[str] = None
+
+
+# ----------------------------
+# Helpers
+# ----------------------------
+def _file_digest(path: Path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(_CHUNK), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _code_paths(stage: Stage) -> Dict[str, Path]:
+    """Source files of fn's module and the stage's code modules, by module name."""
+    paths = {}
+    fn_source = inspect.getsourcefile(stage.fn)
+    if fn_source is not None:
+        paths[stage.fn.__module__] = Path(fn_source)
+    for module in stage.code:
+        spec = importlib.util.find_spec(module)
+        if spec is None or not spec.has_location:
+            raise ModuleNotFoundError(f"Stage '{stage.name}' depends on module '{module}' with no source file")
+        paths[module] = Path(spec.origin)
+    return paths
+
+
+def _default_cache_dir() -> Path:
+    return Path(config.get_config("dev_config.ini").get("paths", "pipeline_cache_dir"))
+
+
+# ----------------------------
+# Public
+# ----------------------------
+def extra_path(out_path: Path, suffix: str) -> Path:
+    """Where a stage's extra artifact with this suffix lives, beside its output (e.g. <key>.json.png)."""
+    out_path = Path(out_path)
+    return out_path.with_name(out_path.name + suffix)
+
+
+class Pipeline:
+    def __init__(self, cache_dir: Optional[Path] = None, use_cache: bool = True):
+        self.cache_dir = Path(cache_dir) if cache_dir is not None else _default_cache_dir()
+        self.use_cache = use_cache
+        self.stages: Dict[str, Stage] = {}
+        self._digests: Dict[Path, str] = {}
+        self._digest_lock = threading.Lock()
+        self._exclusive_lock = threading.Lock()
+        # Successful results of earlier run() calls, reused by later ones
+        self._done: Dict[str, StageResult] = {}
+
+    def add_stage(self, stage: Stage) -> Stage:
+        if stage.name in self.stages:
+            raise ValueError(f"Duplicate stage name '{stage.name}'")
+        self.stages[stage.name] = stage
+        return stage
+
+    def _digest(self, path: Path) -> str:
+        # Each file is hashed once per run; outputs are hashed right after they are produced
+        with self._digest_lock:
+            digest = self._digests.get(path)
+        if digest is None:
+            digest = _file_digest(path)
+            with self._digest_lock:
+                self._digests[path] = digest
+        return digest
+
+    def _stage_key(self, stage: Stage, inputs: Dict[str, Path]) -> str:
+        payload = {
+            "cache_version": CACHE_VERSION,
+            "stage": stage.name,
+            "version": stage.version,
+            "params": stage.params,
+            "code": {module: self._digest(path) for module, path in sorted(_code_paths(stage).items())},
+            "inputs": {dep: self._digest(path) for dep, path in sorted(inputs.items())},
+        }
+        return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+
+    def _order(self) -> List[str]:
+        """Stage names in topological order; raises on unknown deps or cycles."""
+        order, state = [], {}
+
+        def visit(name, trail):
+            if state.get(name) == "done":
+                return
+            if state.get(name) == "visiting":
+                raise ValueError(f"Pipeline has a cycle: {' -> '.join(trail + [name])}")
+            state[name] = "visiting"
+            for dep in self.stages[name].deps:
+                if dep in self.stages:
+                    visit(dep, trail + [name])
+                elif not Path(dep).is_file():
+                    raise FileNotFoundError(f"Stage '{name}' depends on unknown stage or file '{dep}'")
+            state[name] = "done"
+            order.append(name)
+
+        for name in self.stages:
+            visit(name, [])
+        return order
+
+    def _run_stage(self, stage: Stage, results: Dict[str, StageResult]) -> StageResult:
+        start = time.perf_counter()
+        inputs = {
+            dep: results[dep].output if dep in self.stages else Path(dep).resolve()
+            for dep in stage.deps
+        }
+        key = self._stage_key(stage, inputs)
+        # Stage names like "generate/<stem>" become nested cache directories
+        out_path = self.cache_dir / stage.name / f"{key[:16]}{stage.suffix}"
+
+        cached = (self.use_cache and out_path.is_file()
+                  and all(extra_path(out_path, suffix).is_file() for suffix in stage.extras))
+        if not cached:
+            out_path.parent.mkdir(parents=True, exist_ok=True)
+            # Write beside the final path and rename, so an interrupted stage never looks cached
+            tmp_path = out_path.with_name(f".{out_path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+            tmp_paths = [tmp_path] + [extra_path(tmp_path, suffix) for suffix in stage.extras]
+            try:
+                if stage.exclusive:
+                    with self._exclusive_lock:
+                        stage.fn(inputs, tmp_path)
+                else:
+                    stage.fn(inputs, tmp_path)
+                # Extras first: a present output then implies its extras are there too
+                for suffix in stage.extras:
+                    os.replace(extra_path(tmp_path, suffix), extra_path(out_path, suffix))
+                os.replace(tmp_path, out_path)
+            finally:
+                for path in tmp_paths:
+                    if path.exists():
+                        path.unlink()
+
+        return StageResult(stage.name, key, out_path, cached, time.perf_counter() - start)
+
+    def _upstream(self, names: Iterable[str]) -> set:
+        """The named stages and every stage they depend on."""
+        wanted, stack = set(), list(names)
+        while stack:
+            name = stack.pop()
+            if name not in self.stages:
+                raise ValueError(f"Unknown stage '{name}'")
+            if name not in wanted:
+                wanted.add(name)
+                stack.extend(d for d in self.stages[name].deps if d in self.stages)
+        return wanted
+
+    def run(self, max_workers: int = 1, only: Optional[Iterable[str]] = None) -> Dict[str, StageResult]:
+        """
+        Run every stage whose inputs changed, at most max_workers at a time.
+        Returns StageResults (output path, cache hit, wall time) by stage name.
+        A failing stage records its error and its dependents are skipped;
+        independent branches keep running.
+
+        With only, run just those stages and what they depend on. Stages that
+        succeeded in an earlier run() of this Pipeline are not run again, so a
+        caller can step through the DAG one stage at a time.
+        """
+        order = self._order()
+        if only is not None:
+            wanted = self._upstream(only)
+            order = [name for name in order if name in wanted]
+        results: Dict[str, StageResult] = {name: self._done[name] for name in order if name in self._done}
+        pending = {
+            name: set(d for d in self.stages[name].deps if d in self.stages and d not in results)
+            for name in order if name not in results
+        }
+
+        def finish(name: str, result: StageResult):
+            results[name] = result
+            if result.error is None:
+                self._done[name] = result
+            for deps in pending.values():
+                deps.discard(name)
+
+        with ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+            running = {}
+            while pending or running:
+                for name in [n for n in order if n in pending and not pending[n]]:
+                    del pending[name]
+                    failed = [d for d in self.stages[name].deps if d in results and results[d].error]
+                    if failed:
+                        finish(name, StageResult(name, None, None, False, 0.0, f"skipped: '{failed[0]}' failed"))
+                    else:
+                        running[pool.submit(self._run_stage, self.stages[name], results)] = name
+
+                if not running:
+                    continue
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    try:
+                        finish(name, future.result())
+                    except Exception as e:
+                        finish(name, StageResult(name, None, None, False, 0.0, f"{type(e).__name__}: {e}"))
+        return results
+
+
+# ----------------------------
+# Stage functions for the stress testing pipeline
+# ----------------------------
+def _convert_stage(inputs: Dict[str, Path], out_path: Path) -> None:
+    from program_files import data_conversion
+    (system_path,) = inputs.values()
+    data_conversion.system_to_queue(str(system_path), out_path=str(out_path))
+
+
+def _generate_stage(inputs: Dict[str, Path], out_path: Path) -> None:
+    from program_files import data_generator
+    (queue_path,) = inputs.values()
+    data_generator.run(str(queue_path), out_path=str(out_path), verbose=False)
+
+
+def _analyze_stage(inputs: Dict[str, Path], out_path: Path) -> None:
+    from program_files import analyzer
+    (csv_path,) = inputs.values()
+    # Stages run on worker threads, so the fit plot is saved here and shown by the caller
+    summary = analyzer.run(str(csv_path), show_plot=False, plot_path=str(extra_path(out_path, PLOT_SUFFIX)))
+    with open(out_path, "w", encoding="utf-8") as f:
+        json.dump(summary, f, indent=2)
+
+
+def build_pipeline(system_descriptions: List[str], cache_dir: Optional[Path] = None, use_cache: bool = True) -> Pipeline:
+    """
+    System description -> queue network -> generated data -> analysis, one
+    independent branch per description. Stage names are <stage>/<file stem>.
+    """
+    dev = settings.get_dev_settings()
+    generation_params = {
+        **dev.data_generation.model_dump(),
+        "random_seed": dev.stress_test_params.random_seed,
+    }
+
+    pipe = Pipeline(cache_dir=cache_dir, use_cache=use_cache)
+    for path in system_descriptions:
+        stem = Path(path).stem
+        convert = pipe.add_stage(Stage(f"convert/{stem}", _convert_stage, deps=[str(path)], suffix=".json",
+                                       code=["program_files.data_conversion"]))
+        generate = pipe.add_stage(Stage(f"generate/{stem}", _generate_stage, deps=[convert.name],
+                                        params=generation_params, suffix=".csv", version="2",
+                                        code=["program_files.data_generator"]))
+        pipe.add_stage(Stage(f"analyze/{stem}", _analyze_stage, deps=[generate.name],
+                             suffix=".json", exclusive=True, extras=[PLOT_SUFFIX],
+                             code=["program_files.analyzer"]))
+    return pipe
+
+
+def format_timings(results: Dict[str, StageResult]) -> str:
+    """One line per stage: wall time, cache hit / run / failure, and the artifact path or error."""
+    lines = []
+    for result in results.values():
+        if result.error:
+            lines.append(f"{result.name:<40} {'failed':<7} {result.seconds:8.3f}s  {result.error}")
+            continue
+        status = "cached" if result.cached else "ran"
+        lines.append(f"{result.name:<40} {status:<7} {result.seconds:8.3f}s  {result.output}")
+    return "\n".join(lines)
@@ -0,0 +1,66 @@
+'''
+Opt-in cache for model responses.
+
+Identical requests to the model (same model, prompt, options and seed) are
+answered from a two-tier cache instead of re-running inference: an
+in-memory LRU for the current process and a directory of JSON files that
+survives between runs, so re-running the pipeline on the same text
+description skips the model entirely. Entries can expire after a TTL, and
+the disk tier is trimmed (oldest first) once it exceeds its size budget.
+
+The cache is the chat servers' (nlip_web/response_cache.py, via
+program_files.shared); this module only configures it from dev_config.ini.
+Enabled with [response_cache] enabled = true (or
+STRESS_RESPONSE_CACHE_ENABLED=true).
+'''
+
+from typing import Optional
+import threading
+
+from program_files import settings
+from program_files.shared import response_cache as _shared
+
+ResponseCache = _shared.ResponseCache
+cache_key = _shared.cache_key
+
+
+# ----------------------------
+# Public
+# ----------------------------
+def from_settings(dev: settings.DevSettings) -> Optional[ResponseCache]:
+    """
+    A cache configured from validated dev settings.
+
+    Args:
+        dev (DevSettings): The compiled dev_config.ini.
+
+    Returns:
+        ResponseCache: The cache, or None when [response_cache] enabled is false.
+    """
+    if not dev.response_cache.enabled:
+        return None
+    return ResponseCache(
+        cache_dir=dev.paths.response_cache_dir,
+        max_entries=dev.response_cache.max_entries,
+        max_disk_bytes=int(dev.response_cache.max_disk_mb * 1024 * 1024),
+        ttl=dev.response_cache.ttl_seconds,
+    )
+
+
+_default_cache: Optional[ResponseCache] = None
+_default_lock = threading.Lock()
+
+
+def get_response_cache() -> Optional[ResponseCache]:
+    """
+    The process-wide cache configured in dev_config.ini, or None when
+    [response_cache] enabled is false.
+    """
+    global _default_cache
+    dev = settings.get_dev_settings()
+    if not dev.response_cache.enabled:
+        return None
+    with _default_lock:
+        if _default_cache is None:
+            _default_cache = from_settings(dev)
+        return _default_cache
@@ -0,0 +1,255 @@
+'''
+Typed, validated views of config/dev_config.ini and config/user_config.ini.
+
+The INI files are parsed and cached by program_files.config; this module turns
+them into frozen pydantic models once per version of each file so a bad value
+(e.g. alpha = abc or time_points = 0) is reported at startup instead of deep
+inside data generation. Environment variables and command-line overrides are
+layered on through config.set_override, so they are validated the same way.
+'''
+
+from pathlib import Path
+from typing import Annotated, Dict, Iterable, List, Optional
+import os
+
+from pydantic import BaseModel, ConfigDict, Field, ValidationError, field_validator
+
+from program_files import config
+from program_files.shared import env
+from program_files.user_input import UserInput
+
+DEV_CONFIG = "dev_config.ini"
+USER_CONFIG = "user_config.ini"
+
+# STRESS_<SECTION>_<KEY>=value, e.g. STRESS_DATA_GENERATION_ALPHA=0.5
+ENV_PREFIX = "STRESS_"
+
+
+class SettingsError(ValueError):
+    """Raised when a config file (plus overrides) does not match its schema."""
+
+    def __init__(self, config_name: str, errors: List[str]):
+        self.config_name = config_name
+        self.errors = errors
+        super().__init__(f"Invalid {config_name}:\n" + "\n".join(f" - {e}" for e in errors))
+
+
+# ----------------------------
+# dev_config.ini schema
+# ----------------------------
+class _Section(BaseModel):
+    model_config = ConfigDict(frozen=True, extra="forbid")
+
+
+class PathsSettings(_Section):
+    schemas_dir: Path
+    queueing_network_dir: Path
+    system_description_dir: Path
+    processed_data_dir: Path
+    pipeline_cache_dir: Path
+    response_cache_dir: Path
+    embedding_index_dir: Path
+    benchmark_dir: Path
+    queueing_network_schema: Path
+    system_description_schema: Path
+    queueing_network_file: Optional[Path] = None
+
+
+class DataGenerationSettings(_Section):
+    alpha: Annotated[float, Field(gt=0, lt=1)]
+    k: Annotated[int, Field(ge=1)]
+    C: Annotated[float, Field(ge=0)]
+    time_points: Annotated[int, Field(gt=0)]
+    starting_main_lambda: Annotated[float, Field(ge=0)]
+    gaussian_mean: float
+    gaussian_std: Annotated[float, Field(ge=0)]
+
+
+class TranslationSettings(_Section):
+    cpu_scale_factor: Annotated[float, Field(gt=0)]
+    storage_scale_factor: Annotated[float, Field(gt=0)]
+    network_scale_factor: Annotated[float, Field(gt=0)]
+
+
+class StressTestSettings(_Section):
+    num_iterations: Annotated[int, Field(gt=0)]
+    random_seed: Annotated[int, Field(ge=0)]
+
+
+class ResponseCacheSettings(_Section):
+    enabled: bool = False
+    max_entries: Annotated[int, Field(ge=1)] = 256
+    max_disk_mb: Annotated[float, Field(ge=0)] = 256
+    ttl_seconds: Annotated[float, Field(ge=0)] = 0
+
+
+class GenerationSettings(_Section):
+    structured_output: bool = True
+    max_attempts: Annotated[int, Field(ge=1)] = 5
+    parallelism: Annotated[int, Field(ge=1)] = 4
+    warm_up: bool = True
+    keep_alive: str = "30m"
+
+
+class DevSettings(_Section):
+    paths: PathsSettings
+    data_generation: DataGenerationSettings
+    translation_params: TranslationSettings
+    stress_test_params: StressTestSettings
+    response_cache: ResponseCacheSettings = ResponseCacheSettings()
+    generation: GenerationSettings = GenerationSettings()
+
+
+# ----------------------------
+# user_config.ini schema
+# ----------------------------
+class UserSettings(UserInput):
+    """
+    UserInput as read from user_config.ini. Reading settings has no side
+    effects: the directories are checked as paths only and are created by
+    whoever writes to them, not here.
+    """
+    test_system_path: Path
+    prod_system_path: Path
+    test_results_path: Path
+    temp_dir: Path = Path("./tmp")
+
+    @field_validator("test_system_path", "prod_system_path", "test_results_path", "temp_dir", mode="before")
+    def create_dirs(cls, v):
+        return v
+
+
+# Parser for each field type, shared by env-var and CLI overrides
+_PARSERS = {
+    int: env.parse_int,
+    float: env.parse_float,
+}
+
+
+# ----------------------------
+# Helpers
+# ----------------------------
+def _section_dict(cfg, section_model: type, section: str) -> Dict[str, str]:
+    """Raw INI values for a section, with keys matched case-insensitively to the model."""
+    if section not in cfg:
+        return {}
+    by_lower = {name.lower(): name for name in section_model.model_fields}
+    return {by_lower.get(key, key): value for key, value in cfg[section].items()}
+
+
+def _format_errors(e: ValidationError) -> List[str]:
+    return [f"{'.'.join(str(x) for x in err['loc'])}: {err['msg']}" for err in e.errors()]
+
+
+def _user_input_data(cfg) -> Dict[str, str]:
+    """Map user_config.ini sections back onto UserInput field names (inverse of set_user_config)."""
+    data: Dict[str, str] = {}
+    for section, prefix in (("paths", ""), ("constraints", ""), ("test_system", "test_"), ("prod_system", "prod_")):
+        if section in cfg:
+            for key, value in cfg[section].items():
+                data[prefix + key] = value
+    return data
+
+
+def _parse_override(config_name: str, section: str, key: str, raw: str) -> str:
+    """Check an override with the env helpers before it reaches the config cache."""
+    model = DevSettings.model_fields.get(section) if config_name == DEV_CONFIG else None
+    field = None
+    if model is not None:
+        fields = {name.lower(): info for name, info in model.annotation.model_fields.items()}
+        field = fields.get(key.lower())
+    parser = _PARSERS.get(field.annotation) if field is not None else None
+    if parser is not None and parser(raw) is None:
+        raise SettingsError(config_name, [f"{section}.{key}: could not parse {raw!r}"])
+    return env.parse_string(raw)
+
+
+# ----------------------------
+# Public
+# ----------------------------
+def get_dev_settings(config_name: str = DEV_CONFIG) -> DevSettings:
+    """
+    Validated dev_config.ini, compiled once per version of the file (and of
+    its overrides). Raises SettingsError listing every invalid value.
+    """
+    entry = config._cached_config(config_name)
+    with config._cache_lock:
+        settings = entry.views.get(DevSettings)
+        if settings is None:
+            data = {
+                name: _section_dict(entry.cfg, info.annotation, name)
+                for name, info in DevSettings.model_fields.items()
+            }
+            try:
+                settings = DevSettings.model_validate(data)
+            except ValidationError as e:
+                raise SettingsError(config_name, _format_errors(e)) from None
+            entry.views[DevSettings] = settings
+        return settings
+
+
+def get_user_settings(config_name: str = USER_CONFIG) -> UserSettings:
+    """
+    user_config.ini validated through the UserInput rules, compiled once per
+    version of the file. Missing directories are not created.
+    """
+    entry = config._cached_config(config_name)
+    with config._cache_lock:
+        settings = entry.views.get(UserSettings)
+        if settings is None:
+            try:
+                settings = UserSettings.model_validate(_user_input_data(entry.cfg))
+            except ValidationError as e:
+                raise SettingsError(config_name, _format_errors(e)) from None
+            entry.views[UserSettings] = settings
+        return settings
+
+
+def apply_env_overrides(environ: Optional[Dict[str, str]] = None) -> List[str]:
+    """
+    Apply STRESS_<SECTION>_<KEY> environment variables to dev_config.ini as
+    in-memory overrides. Returns the "section.key" names that were applied.
+    """
+    environ = os.environ if environ is None else environ
+    applied = []
+    sections = sorted(DevSettings.model_fields, key=len, reverse=True)
+    for var, raw in environ.items():
+        if not var.startswith(ENV_PREFIX):
+            continue
+        rest = var[len(ENV_PREFIX):].lower()
+        section = next((s for s in sections if rest.startswith(s + "_")), None)
+        if section is None:
+            continue
+        key = rest[len(section) + 1:]
+        config.set_override(DEV_CONFIG, section, key, _parse_override(DEV_CONFIG, section, key, raw))
+        applied.append(f"{section}.{key}")
+    return applied
+
+
+def apply_cli_overrides(items: Iterable[str], config_name: str = DEV_CONFIG) -> List[str]:
+    """
+    Apply "section.key=value" strings (e.g. from --set) as in-memory overrides.
+    Returns the "section.key" names that were applied.
+    """
+    applied = []
+    for item in items:
+        name, sep, raw = item.partition("=")
+        section, dot, key = name.strip().partition(".")
+        if not sep or not dot or not key:
+            raise SettingsError(config_name, [f"override {item!r} must look like section.key=value"])
+        config.set_override(config_name, section, key, _parse_override(config_name, section, key, raw))
+        applied.append(f"{section}.{key}")
+    return applied
+
+
+def compile_settings(cli_overrides: Iterable[str] = (), include_user: bool = True) -> DevSettings:
+    """
+    Apply env and CLI overrides, then validate every config up front so batch
+    jobs fail before doing any expensive work. Returns the dev settings.
+    """
+    apply_env_overrides()
+    apply_cli_overrides(cli_overrides)
+    dev = get_dev_settings()
+    if include_user:
+        get_user_settings()
+    return dev
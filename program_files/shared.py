@@ -0,0 +1,21 @@
+'''
+Modules shared with the chat servers in nlip/nlip_web.
+
+program_files runs from the repository root without being installed, so the
+nlip_web package is not importable on its own. This puts nlip/nlip_web on
+sys.path (after any installed copy, which then wins) and re-exports the
+shared modules, so there is one implementation to fix:
+
+    from program_files.shared import env, response_cache
+'''
+
+from pathlib import Path
+import sys
+
+_NLIP_WEB_DIR = str(Path(__file__).resolve().parent.parent / "nlip" / "nlip_web")
+if _NLIP_WEB_DIR not in sys.path:
+    sys.path.append(_NLIP_WEB_DIR)
+
+from nlip_web import env, response_cache  # noqa: E402
+
+__all__ = ["env", "response_cache"]
@@ -1,9 +1,13 @@
 """Wrote by CHATGPT for testing validation function"""
 import json
+from pathlib import Path
 from validation import enforce
 
+# Relative to this file, so the script works from any directory
+EXAMPLE = Path(__file__).resolve().parent.parent / "data" / "queueing-network" / "queue_diverge_example.json"
+
 # Open a sample queueing network JSON file and validate it
-with open("../data/queueing-network/queue_diverge_example.json") as f:
+with open(EXAMPLE) as f:
     doc = json.load(f)
 
 result = enforce(doc)
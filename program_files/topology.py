@@ -0,0 +1,334 @@
+'''
+Synthetic queueing-network topologies of any size, for scale testing.
+
+Shapes (queue Q1 is always the single entry point):
+    chain     Q1 -> Q2 -> ... -> Qn -> External
+    tree      a fan-out tree, `branching` children per queue; leaves exit.
+              With fan_in, the second half of the queues is a mirrored
+              fan-in tree that merges the leaves back into one exit queue.
+    layered   a DAG of layers `width` queues wide; each queue routes to
+              `degree` queues of the next layer, the last layer exits
+    random    a random graph with cycles: Poisson out-degrees (mean
+              `degree`), uniformly chosen targets
+    powerlaw  a random graph with cycles whose out-degrees follow a Zipf
+              law with `exponent` and whose targets are chosen by
+              power-law popularity (the static model), so in-degrees are
+              power-law too
+
+In the random shapes the first edge of every queue Qi goes to Qi+1 (a
+backbone that keeps every queue reachable from Q1) and the others to
+random queues; every queue also sends `exit_share` of its traffic to
+External, so the network is open and its traffic equations have a
+solution despite the cycles. Nothing routes back into Q1.
+
+Routing is split in integer units of 1/1024 of a queue's traffic, so the
+percentages (units * 100/1024) and system-description weights
+(units/1024) are exact binary fractions: they sum to exactly 100 (and 1),
+which validation.validate checks with equality. A queue therefore has at
+most 1024 outgoing edges.
+
+A shape is a generator of (queue id, [(next id, units), ...]) produced a
+chunk at a time with numpy, and the writers stream it straight to JSON, so
+million-queue networks never exist in memory as Python objects:
+
+    python main.py topology powerlaw --size 1000000 --out big.json
+    python main.py topology layered --size 5000 --width 50 --format system
+
+Queueing networks leave service_rate null (data_generator assigns it).
+System descriptions express exit edges of queues that also route
+elsewhere as edges to an extra component, "Exit", with no edges of its
+own, which data_conversion.system_to_queue turns back into External.
+'''
+
+from pathlib import Path
+from typing import IO, Iterator, List, Optional, Tuple
+import contextlib
+import io
+import itertools
+import json
+import math
+import sys
+
+import numpy as np
+
+from program_files import settings
+
+UNITS = 1024
+EXTERNAL = "External"
+SYSTEM_EXIT = "Exit"
+SHAPES = ("chain", "tree", "layered", "random", "powerlaw")
+# Queues whose random numbers are drawn at once
+_CHUNK = 65536
+_SEPARATOR = ",\n"
+
+# (queue id, [(next queue id, units of 1/UNITS), ...])
+Node = Tuple[str, List[Tuple[str, int]]]
+
+
+# ----------------------------
+# Helpers
+# ----------------------------
+def _qid(i: int) -> str:
+    return f"Q{i + 1}"
+
+
+def _split(total: int, k: int) -> List[int]:
+    """total units in k near-equal integer parts."""
+    base, extra = divmod(total, k)
+    return [base + 1 if j < extra else base for j in range(k)]
+
+
+def _route(targets: List[int], total: int = UNITS) -> List[Tuple[str, int]]:
+    """Split total units evenly over target indices, merging repeated targets."""
+    merged = {}
+    for target, units in zip(targets, _split(total, len(targets))):
+        merged[target] = merged.get(target, 0) + units
+    return [(_qid(t), u) for t, u in merged.items()]
+
+
+def _heap_leaves(size: int, branching: int) -> range:
+    # In heap order (children of i are b*i+1 .. b*i+b) the leaves are a contiguous tail
+    return range(math.ceil((size - 1) / branching) if size > 1 else 0, size)
+
+
+def _check(n: int, **positive):
+    if n < 1:
+        raise ValueError("size must be at least 1")
+    for name, value in positive.items():
+        if value is not None and value < 1:
+            raise ValueError(f"{name} must be at least 1")
+
+
+# ----------------------------
+# Shapes
+# ----------------------------
+def chain(n: int) -> Iterator[Node]:
+    _check(n)
+    for i in range(n - 1):
+        yield _qid(i), [(_qid(i + 1), UNITS)]
+    yield _qid(n - 1), [(EXTERNAL, UNITS)]
+
+
+def tree(n: int, branching: int = 2, fan_in: bool = False) -> Iterator[Node]:
+    _check(n, branching=branching)
+    branching = min(branching, UNITS)
+    out_size = (n + 1) // 2 if fan_in and n > 1 else n
+    in_size = n - out_size
+
+    in_leaves = _heap_leaves(in_size, branching)
+    out_leaves = _heap_leaves(out_size, branching)
+
+    def fan_in_id(h: int) -> str:
+        # Fan-in heap index h (0 = the exit queue) laid out in reverse, so the exit queue is last
+        return _qid(out_size + in_size - 1 - h)
+
+    for i in range(out_size):
+        children = list(range(branching * i + 1, min(branching * i + branching + 1, out_size)))
+        if children:
+            yield _qid(i), [(_qid(c), u) for c, u in zip(children, _split(UNITS, len(children)))]
+        elif in_size:
+            # Spread the fan-out leaves evenly over the fan-in leaves
+            ordinal = i - out_leaves.start
+            h = in_leaves.start + ordinal * len(in_leaves) // len(out_leaves)
+            yield _qid(i), [(fan_in_id(h), UNITS)]
+        else:
+            yield _qid(i), [(EXTERNAL, UNITS)]
+
+    for k in range(in_size):
+        h = in_size - 1 - k
+        yield fan_in_id(h), [(fan_in_id((h - 1) // branching), UNITS)] if h else [(EXTERNAL, UNITS)]
+
+
+def layered(n: int, width: int = 10, degree: int = 2, seed: int = 42) -> Iterator[Node]:
+    _check(n, width=width, degree=degree)
+    rng = np.random.default_rng(seed)
+    # Layer 0 is the entry queue alone; the rest are `width` wide (the last may be narrower)
+    starts = [0] + list(range(1, n, width)) + [n]
+
+    for layer in range(len(starts) - 1):
+        start, end = starts[layer], starts[layer + 1]
+        if layer + 2 >= len(starts):
+            for i in range(start, end):
+                yield _qid(i), [(EXTERNAL, UNITS)]
+            continue
+        next_start, next_end = starts[layer + 1], starts[layer + 2]
+        next_width = next_end - next_start
+        if layer == 0:
+            # The entry feeds the whole first layer (up to UNITS queues of it)
+            step = max(next_width / UNITS, 1)
+            yield _qid(0), _route([next_start + int(j * step) for j in range(min(next_width, UNITS))])
+            continue
+        k = min(degree, next_width, UNITS)
+        extra = rng.integers(0, next_width, (end - start, k - 1)) if k > 1 else None
+        for p, i in enumerate(range(start, end)):
+            # The same position in the next layer keeps every queue reachable; the rest are random
+            targets = [next_start + p % next_width]
+            if extra is not None:
+                targets.extend(int(next_start + x) for x in extra[p])
+            yield _qid(i), _route(targets)
+
+
+def random_graph(n: int, degree: float = 3.0, exponent: Optional[float] = None, exit_share: float = 0.1,
+                 seed: int = 42) -> Iterator[Node]:
+    """
+    A random graph with cycles. Without exponent, out-degrees are Poisson with mean `degree`
+    and targets uniform; with exponent (> 2), out-degrees are Zipf(exponent) and targets are
+    drawn with weight rank^(-1/(exponent - 1)), giving power-law in-degrees too.
+    """
+    _check(n)
+    if not 0 < exit_share <= 1:
+        raise ValueError("exit_share must be in (0, 1]")
+    if exponent is not None and exponent <= 2:
+        raise ValueError("exponent must be greater than 2")
+    rng = np.random.default_rng(seed)
+    exit_units = max(1, round(UNITS * exit_share))
+    max_degree = min(UNITS - exit_units, n - 1)
+
+    cdf = None
+    if exponent is not None and n > 1:
+        # Popularity of Q2..Qn, highest first; Q1 (the entry) is never a target
+        weights = np.arange(1, n, dtype=float) ** (-1.0 / (exponent - 1.0))
+        cdf = np.cumsum(weights)
+        cdf /= cdf[-1]
+
+    for chunk in range(0, n, _CHUNK):
+        size = min(_CHUNK, n - chunk)
+        # Edges besides the backbone edge to the next queue
+        if max_degree < 1:
+            extra = np.zeros(size, dtype=np.int64)
+        elif exponent is None:
+            extra = np.clip(rng.poisson(max(degree - 1, 0), size), 0, max_degree - 1)
+        else:
+            extra = np.minimum(rng.zipf(exponent, size), max_degree) - 1
+        total = int(extra.sum())
+        if cdf is not None:
+            targets = np.searchsorted(cdf, rng.random(total), side="right") + 1
+            targets = np.minimum(targets, n - 1)
+        else:
+            targets = rng.integers(1, max(n, 2), total)
+        offsets = np.concatenate(([0], np.cumsum(extra)))
+
+        for j in range(size):
+            i = chunk + j
+            picked = targets[offsets[j]:offsets[j + 1]].tolist()
+            if i + 1 < n and max_degree >= 1:
+                picked.insert(0, i + 1)
+            # No self-loops: move them to the next queue (never Q1)
+            picked = [t if t != i else i % (n - 1) + 1 for t in picked]
+            picked = [t for t in picked if t != i]  # only possible with n == 2
+            if not picked:
+                yield _qid(i), [(EXTERNAL, UNITS)]
+                continue
+            yield _qid(i), _route(picked, UNITS - exit_units) + [(EXTERNAL, exit_units)]
+
+
+def nodes(shape: str, size: int, branching: int = 2, fan_in: bool = False, width: int = 10, degree: float = 3.0,
+          exponent: float = 2.5, exit_share: float = 0.1, seed: int = 42) -> Iterator[Node]:
+    """The queues of a shape; options that do not apply to the shape are ignored."""
+    if shape == "chain":
+        return chain(size)
+    if shape == "tree":
+        return tree(size, branching, fan_in)
+    if shape == "layered":
+        return layered(size, width, int(degree), seed)
+    if shape == "random":
+        return random_graph(size, degree, None, exit_share, seed)
+    if shape == "powerlaw":
+        return random_graph(size, degree, exponent, exit_share, seed)
+    raise ValueError(f"unknown shape {shape!r} (choose from {', '.join(SHAPES)})")
+
+
+# ----------------------------
+# Writers
+# ----------------------------
+def write_queueing_network(topology: Iterator[Node], f: IO[str]) -> int:
+    """Stream a queueing-network document to f; returns the number of queues."""
+    f.write('{"system": {"lambda": null, "beta": null, "entry_points": "Q1", '
+            '"constraint": {"service_rate_sum": 1.0}, "queues": [\n')
+    count = 0
+    for qid, routes in topology:
+        edges = ", ".join(f'{{"id": "{to}", "probability": {units * 100 / UNITS!r}}}' for to, units in routes)
+        f.write(f'{_SEPARATOR if count else ""}{{"id": "{qid}", "service_rate": null, "next_queue": [{edges}]}}')
+        count += 1
+    f.write("\n]}}\n")
+    return count
+
+
+def write_system_description(topology: Iterator[Node], f: IO[str]) -> int:
+    """Stream a system-description document to f; returns the number of components."""
+    f.write('{"system_description": [\n')
+    count, needs_exit = 0, False
+    for qid, routes in topology:
+        edges = []
+        for to, units in routes:
+            if to == EXTERNAL:
+                if len(routes) == 1:
+                    # Only exits: no edges, which system_to_queue reads as External
+                    continue
+                to, needs_exit = SYSTEM_EXIT, True
+            edges.append(f'{{"to": "{to}", "weight": {units / UNITS!r}}}')
+        kind = "connection" if count == 0 else "service"
+        f.write(f'{_SEPARATOR if count else ""}{{"id": "{qid}", "type": "{kind}", "machine": "synthetic", '
+                f'"description": "", "delay": null, "network_speed": null, "messages": [], '
+                f'"edges": [{", ".join(edges)}]}}')
+        count += 1
+    if needs_exit:
+        f.write(f',\n{{"id": "{SYSTEM_EXIT}", "type": "service", "machine": "synthetic", "description": "", '
+                f'"delay": null, "network_speed": null, "messages": [], "edges": []}}')
+        count += 1
+    f.write('\n], "metadata": [{"generator": "program_files.topology"}]}\n')
+    return count
+
+
+@contextlib.contextmanager
+def _open_out(out_path):
+    if str(out_path) == "-":
+        yield sys.stdout
+        return
+    out_path = Path(out_path)
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    # A large buffer: the documents are written in many small pieces
+    with open(out_path, "w", encoding="utf-8", buffering=1 << 20) as f:
+        yield f
+
+
+# ----------------------------
+# Public
+# ----------------------------
+def generate(shape: str, size: int, out_path=None, fmt: str = "queue", **options) -> str:
+    """
+    Write a synthetic topology as JSON.
+
+    Args:
+        shape (str): One of SHAPES.
+        size (int): Number of queues.
+        out_path (str | Path): Output file, or "-" for stdout (default: <shape>_<size>.json in
+            queueing_network_dir or system_description_dir).
+        fmt (str): "queue" for a queueing network, "system" for a system description.
+        **options: Shape options for nodes() (branching, fan_in, width, degree, exponent,
+            exit_share, seed).
+
+    Returns:
+        str: The output path.
+    """
+    if fmt not in ("queue", "system"):
+        raise ValueError("fmt must be 'queue' or 'system'")
+    if out_path is None:
+        paths = settings.get_dev_settings().paths
+        out_dir = paths.queueing_network_dir if fmt == "queue" else paths.system_description_dir
+        out_path = out_dir / f"{shape}_{size}.json"
+    topology = nodes(shape, size, **options)
+    # Shapes check their arguments when first advanced: do that before creating the file
+    topology = itertools.chain([next(topology)], topology)
+    writer = write_queueing_network if fmt == "queue" else write_system_description
+    with _open_out(out_path) as f:
+        writer(topology, f)
+    return str(out_path)
+
+
+def build(shape: str, size: int, fmt: str = "queue", **options) -> dict:
+    """A synthetic topology as an in-memory document (for sizes that fit comfortably in memory)."""
+    buffer = io.StringIO()
+    writer = write_queueing_network if fmt == "queue" else write_system_description
+    writer(nodes(shape, size, **options), buffer)
+    return json.loads(buffer.getvalue())
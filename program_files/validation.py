@@ -55,10 +55,10 @@ def validate(model: Dict[str, Any]) -> List[str]:
 
     queues = model.get("queues", [])
 
-    queue_ids = [q["id"] for q in queues] # Collect queue IDs
+    queue_ids = {q["id"] for q in queues} # Collect queue IDs (a set, so lookups stay fast on large networks)
 
     # Check if duplicate queue IDs exist
-    if len(queue_ids) != len(set(queue_ids)):
+    if len(queue_ids) != len(queues):
         errors.append("Duplicate queue IDs found")
 
     # Check if entry queue IDs are valid